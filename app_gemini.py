@@ -1,14 +1,38 @@
 import mysql.connector
 import config
 import google.generativeai as genai
-from flask import Flask, render_template, request, jsonify, Response
-import json
+from flask import Flask, g, render_template, request, jsonify, Response
 from decimal import Decimal
-from datetime import datetime, date
+from datetime import datetime, timedelta
+import math
 import os
 import re
-import unicodedata
+import time
 from dotenv import load_dotenv
+from src.background import BackgroundTasks
+from src.catalog_aggregates import CatalogAggregates, compute_aggregates
+from src.conversation_store import ConversationStore, resolve_session_id
+from src.db_pool import ConnectionPool, PoolTimeoutError
+from src.geo_index import GeoIndex
+from src.intent_router import IntentRouter, detect_category_name
+from src.http_cache import (MIN_COMPRESS_SIZE, choose_encoding, compress, decode_cursor, encode_cursor,
+                            etag_for_encoding, etag_matches, make_etag)
+from src.markdown_render import MarkdownStream, render_markdown
+from src.metrics import Metrics
+from src.place_repository import fetch_places, format_ubicacion
+from src.place_catalog import PlaceCatalog
+from src.place_matcher import PlaceMatcher
+from src.place_index import PlaceIndex
+from src.place_search import PlaceSearchIndex
+from src.place_retrieval import PlaceRetriever, RetrievedContext, estimate_tokens
+from src.quota import QuotaExceededError, QuotaManager
+from src.response_cache import LRUTTLCache
+from src.response_validator import ResponseValidator
+from src.semantic_cache import SemanticCache
+from src.sse import SSEWriter, encode_event
+from src.state_backend import SQLiteBackend, create_backend
+from src.singleflight import SingleFlight
+from src.text_normalization import normalize_text, tokenize
 
 # Configurar Flask
 app = Flask(__name__)
@@ -41,19 +65,43 @@ model = genai.GenerativeModel(
     generation_config=generation_config
 )
 
+# Preguntas idénticas en curso comparten una sola llamada a Gemini
+gemini_flights = SingleFlight()
+# La cuota se descuenta a quien inicia la llamada: si la suya está agotada, las peticiones
+# que esperaban (de otros usuarios) no heredan el error y repiten la llamada con la suya
+LEADER_ERRORS = (QuotaExceededError,)
+# Equivalente asíncrono, presente solo al servir en modo ASGI (lo asigna asgi_gemini.py)
+async_gemini_flights = None
+
 # Configurar base de datos MySQL
+def _create_mysql_connection():
+    """Abrir una conexión física nueva a la base de datos MySQL de XAMPP"""
+    return mysql.connector.connect(
+        host=config.DB_HOST,
+        port=config.DB_PORT,
+        user=config.DB_USER,
+        password=config.DB_PASSWORD,
+        database=config.DB_NAME,
+        charset='utf8mb4',
+        autocommit=True  # Evitar que una conexión reutilizada lea un snapshot viejo
+    )
+
+# Pool compartido: las conexiones se abren bajo demanda y se reutilizan entre peticiones
+db_pool = ConnectionPool(
+    _create_mysql_connection,
+    max_size=config.DB_POOL_SIZE,
+    timeout=config.DB_POOL_TIMEOUT,
+    max_uses=config.DB_POOL_MAX_USES,
+    health_check_interval=config.DB_POOL_HEALTH_CHECK_INTERVAL
+)
+
 def get_db_connection():
-    """Conectar a la base de datos MySQL de XAMPP"""
+    """Obtener una conexión del pool de MySQL (close() la devuelve al pool)"""
     try:
-        connection = mysql.connector.connect(
-            host=config.DB_HOST,
-            port=config.DB_PORT,
-            user=config.DB_USER,
-            password=config.DB_PASSWORD,
-            database=config.DB_NAME,
-            charset='utf8mb4'
-        )
-        return connection
+        return db_pool.acquire()
+    except PoolTimeoutError as e:
+        print(f"Pool de MySQL saturado: {e}")
+        return None
     except mysql.connector.Error as e:
         print(f"Error al conectar a MySQL: {e}")
         return None
@@ -80,22 +128,117 @@ def get_db_connection_with_fallback():
     print("❌ No se pudo conectar a MySQL - Verifica que XAMPP esté ejecutándose")
     return None, 'none'
 
-# Caché para el contexto de la base de datos
-context_cache = None
-cache_timestamp = None
-CACHE_DURATION = 300  # 5 minutos en segundos
+# Catálogo de lugares en memoria (se refresca en segundo plano cuando cambia la BD)
+catalog = PlaceCatalog(get_db_connection, refresh_interval=config.CATALOG_REFRESH_INTERVAL)
+
+# Conteos del catálogo para /api/stats y el dashboard (uno por versión)
+_catalog_aggregates = None
+
+def _update_catalog_aggregates(snapshot) -> CatalogAggregates:
+    """Recalcular los agregados para una foto nueva del catálogo"""
+    global _catalog_aggregates
+    aggregates = compute_aggregates(snapshot)
+    _catalog_aggregates = aggregates
+    return aggregates
+
+# Cada refresco del catálogo recalcula los agregados en el mismo momento en que se publica
+catalog.on_refresh(_update_catalog_aggregates)
+
+def get_catalog_aggregates() -> CatalogAggregates:
+    """Agregados de la versión vigente del catálogo (O(1) salvo tras un cambio de versión)"""
+    snapshot = catalog.snapshot()
+    aggregates = _catalog_aggregates
+    if aggregates is not None and aggregates.version == snapshot.version:
+        return aggregates
+    return _update_catalog_aggregates(snapshot)
+
+# Lugares conocidos en Huancayo (se complementan con los del catálogo)
+LUGARES_CONOCIDOS = [
+    "Plaza Constitución", "Plaza Huamanmarca", "Parque de la Identidad", 
+    "Cerrito de la Libertad", "Parque Inmaculada", "Torre Torre",
+    "Real Plaza", "Open Plaza", "Mall Center", "Plaza Vea",
+    "Catedral de Huancayo", "Feria Dominical", "Nevado Huaytapallana",
+    "Wariwillka", "Estadio Huancayo"
+]
 
-# Caché para respuestas de IA (para reducir llamadas al API)
-response_cache = {}
+# Buscador de nombres de lugares compilado: (versión del catálogo, PlaceMatcher)
+_place_matcher = None
+
+# Índice tipado de lugares: (versión del catálogo, PlaceIndex)
+_place_index = None
+
+# Validador de respuestas compilado: (versión del catálogo, ResponseValidator)
+_response_validator = None
+
+# Índice de relevancia para el contexto del prompt: (versión del catálogo, PlaceRetriever)
+_place_retriever = None
+
+# Índice de búsqueda de /api/places: (versión del catálogo, PlaceSearchIndex)
+_place_search = None
+
+# Índice espacial de /api/places/nearby y de las preguntas "cerca de": (versión del catálogo, GeoIndex)
+_geo_index = None
+
+# Estado compartido entre workers (caché de respuestas, cuota diaria y conversaciones).
+# Con STATE_BACKEND=sqlite o redis todos los procesos ven los mismos datos.
+shared_state = create_backend(
+    config.STATE_BACKEND,
+    sqlite_path=config.STATE_SQLITE_PATH,
+    redis_url=config.STATE_REDIS_URL
+)
+print(f"Estado compartido: {shared_state.describe()}")
+
+# Caché para respuestas de IA (para reducir llamadas al API), acotada en entradas y bytes.
+# Con un backend compartido funciona como primer nivel local delante de él.
 RESPONSE_CACHE_DURATION = 3600  # 1 hora en segundos
+response_cache = LRUTTLCache(
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+    ttl=RESPONSE_CACHE_DURATION
+)
+
+# Segundo nivel de caché: preguntas equivalentes ("¿Qué parques hay?" / "que parques hay")
+semantic_cache = SemanticCache(
+    max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=RESPONSE_CACHE_DURATION,
+    threshold=config.SEMANTIC_CACHE_THRESHOLD
+)
+
+# Cuota de consultas a Gemini, global y por usuario (en el estado compartido)
+quota = QuotaManager(
+    shared_state,
+    daily_limit=config.QUOTA_DAILY_LIMIT,
+    per_minute=config.QUOTA_PER_MINUTE,
+    user_daily_limit=config.QUOTA_USER_DAILY_LIMIT,
+    user_per_minute=config.QUOTA_USER_PER_MINUTE,
+    low_fraction=config.QUOTA_LOW_FRACTION
+)
 
-# Contador de requests para manejar límites
-daily_requests = 0
-MAX_DAILY_REQUESTS = 45  # Un poco menos del límite de 50 para tener margen
+# Mensaje al usuario según el límite agotado
+QUOTA_MESSAGES = {
+    'user_minute': '⏳ Estás enviando muchas consultas seguidas. Espera un minuto e inténtalo de nuevo.',
+    'global_minute': '⏳ Hay muchas consultas en este momento. Por favor, intenta nuevamente en un minuto.',
+    'user_day': '⚠️ Alcanzaste tu límite diario de consultas. Puedes seguir preguntando por categorías o lugares concretos, o volver mañana.',
+    'global_day': '⚠️ Hemos alcanzado el límite diario de consultas. Por favor, intenta nuevamente mañana o prueba con preguntas similares que ya hayan sido respondidas.',
+}
 
-# Memoria conversacional por usuario
-conversation_memory = {}  # {user_id: [mensajes]}
+# Memoria conversacional por sesión (cookie o encabezado X-Session-Id)
 MAX_CONVERSATION_LENGTH = 10  # Máximo 10 mensajes en memoria
+CONVERSATION_TTL = 24 * 3600  # Olvidar conversaciones inactivas después de un día
+SESSION_COOKIE = 'chat_session'
+SESSION_HEADER = 'X-Session-Id'
+
+# Con un backend compartido las conversaciones viven en él (todos los workers las ven);
+# si no, en memoria del proceso con desalojo opcional a un archivo SQLite
+conversation_store = ConversationStore(
+    max_messages=MAX_CONVERSATION_LENGTH,
+    max_tokens=config.CONVERSATION_MAX_TOKENS,
+    max_bytes=config.CONVERSATION_MAX_BYTES,
+    idle_ttl=CONVERSATION_TTL,
+    spill=shared_state if shared_state.shared else (
+        SQLiteBackend(config.CONVERSATION_SPILL_PATH) if config.CONVERSATION_SPILL_PATH else None),
+    write_through=shared_state.shared
+)
 
 # Información del sistema para el dashboard
 system_info = {
@@ -103,38 +246,26 @@ system_info = {
     'total_requests': 0,
     'cached_responses_count': 0,
     'avg_response_time': 0,
-    'response_times': []
+    'prompts': 0,
+    'prompt_tokens': 0
 }
 
-def detect_simple_message(message):
-    """Detectar mensajes simples que no requieren contexto de base de datos"""
-    # Desactivamos la detección de mensajes simples para usar siempre la API de Gemini
-    # y evitar respuestas predefinidas
-    return None
-    
-    # Código original comentado:
-    """
-    message_lower = message.lower().strip()
-    
-    # Saludos comunes
-    greetings = ['hola', 'hello', 'hi', 'hey', 'buenos días', 'buenas tardes', 'buenas noches']
-    # Respuestas simples
-    simple_responses = ['gracias', 'thanks', 'ok', 'vale', 'perfecto', 'entendido']
-    # Despedidas
-    farewells = ['adiós', 'hasta luego', 'chao', 'bye', 'nos vemos']
-    
-    # Detectar tipo de mensaje
-    if any(greet in message_lower for greet in greetings):
-        return 'greeting'
-    elif any(resp in message_lower for resp in simple_responses):
-        return 'response'
-    elif any(farewell in message_lower for farewell in farewells):
-        return 'farewell'
-    elif len(message.split()) <= 2 and ('?' not in message):
-        return 'simple'
-    
-    return None
-    """
+# Latencias (histogramas de memoria fija) y contadores, expuestos en el dashboard y en /metrics
+metrics = Metrics()
+metrics.describe('chat_seconds', 'Duración de /api/chat hasta la respuesta completa, por tipo de respuesta')
+metrics.describe('stage_seconds', 'Duración de cada etapa del pipeline del chat')
+metrics.describe('http_request_seconds', 'Duración de las rutas Flask hasta armar la respuesta')
+metrics.describe('cache_lookups_total', 'Búsquedas en cada nivel de caché de respuestas')
+metrics.describe('time_to_first_card_seconds', 'Desde que llega /api/chat hasta la primera tarjeta de lugar en streaming')
+metrics.describe('place_cards_streamed_total', 'Tarjetas de lugares enviadas durante el streaming')
+metrics.describe('background_tasks_total', 'Tareas en segundo plano terminadas, por resultado')
+metrics.describe('background_wait_seconds', 'Espera en cola de las tareas en segundo plano')
+metrics.describe('background_task_seconds', 'Duración de las tareas en segundo plano')
+metrics.describe('validation_problems_total', 'Problemas detectados al validar respuestas de Gemini, por tipo')
+
+# Trabajo posterior a la respuesta (escritura en la caché) fuera del camino del usuario
+background_tasks = BackgroundTasks(workers=config.BACKGROUND_WORKERS, max_pending=config.BACKGROUND_MAX_PENDING,
+                                   metrics=metrics)
 
 def get_simple_response(message_type, original_message):
     """Obtener respuesta simple para mensajes básicos"""
@@ -165,292 +296,245 @@ def get_simple_response(message_type, original_message):
     return random.choice(responses.get(message_type, ['¿En qué te puedo ayudar?']))
 
 def get_user_id():
-    """Obtener un ID único para el usuario (basado en IP por simplicidad)"""
+    """Obtener un ID único para el usuario (basado en IP, para la cuota)"""
     return request.remote_addr or 'anonymous'
 
-def get_conversation_context(user_id):
-    """Obtener el contexto de la conversación actual"""
-    if user_id not in conversation_memory:
-        return ""
-    
-    # Obtener los últimos 5 mensajes para el contexto
-    recent_messages = conversation_memory[user_id][-5:]
-    context = "CONVERSACIÓN RECIENTE:\n"
-    
-    for msg in recent_messages:
-        try:
-            role = "Usuario" if msg.get('is_user', False) else "Asistente"
-            text = msg.get('text', '') or msg.get('message', '')  # Manejar ambas claves por compatibilidad
-            if text:  # Solo agregar si hay texto
-                context += f"{role}: {text}\n"
-        except Exception as e:
-            print(f"Error procesando mensaje de conversación: {e}, msg: {msg}")
-            continue  # Saltar mensajes con errores
-    
-    return context
+def get_session_id():
+    """ID de la sesión de chat (encabezado, cookie o cuerpo); si no hay, se crea y se envía en una cookie"""
+    if 'session_id' not in g:
+        body = request.get_json(silent=True) if request.is_json else None
+        g.session_id, g.new_session = resolve_session_id(
+            request.headers.get(SESSION_HEADER),
+            request.cookies.get(SESSION_COOKIE),
+            body.get('session_id') if isinstance(body, dict) else None
+        )
+    return g.session_id
 
-def add_to_conversation(user_id, message, is_user):
-    """Agrega un mensaje a la memoria conversacional"""
-    if user_id not in conversation_memory:
-        conversation_memory[user_id] = []
-    
-    conversation_memory[user_id].append({
-        'text': message,  # Cambiado de 'message' a 'text' para consistencia
-        'is_user': is_user,
-        'timestamp': datetime.now()
-    })
-    
-    # Mantener solo los últimos mensajes
-    if len(conversation_memory[user_id]) > MAX_CONVERSATION_LENGTH:
-        conversation_memory[user_id] = conversation_memory[user_id][-MAX_CONVERSATION_LENGTH:]
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """Duración de cada ruta hasta armar la respuesta (en streaming, hasta el primer byte)"""
+    started = g.get('request_started')
+    if started is not None:
+        rule = request.url_rule.rule if request.url_rule else 'other'
+        metrics.observe('http_request_seconds', time.perf_counter() - started, route=rule)
+    return response
+
+@app.after_request
+def set_session_cookie(response):
+    """Enviar la cookie de sesión cuando la petición creó una sesión nueva"""
+    if g.get('new_session'):
+        response.set_cookie(SESSION_COOKIE, g.session_id, max_age=CONVERSATION_TTL, httponly=True, samesite='Lax')
+    return response
+
+def get_daily_requests():
+    """Consultas a Gemini realizadas hoy (compartido entre todos los workers)"""
+    return quota.used_today()
+
+def generate_gemini_text(prompt, user_id):
+    """Respuesta completa de Gemini (descuenta una consulta de la cuota o lanza QuotaExceededError)"""
+    quota.acquire(user_id)
+    return model.generate_content(prompt).text
+
+def generate_gemini_stream(prompt, user_id):
+    """Fragmentos de texto de Gemini en streaming (descuenta una consulta de la cuota)"""
+    quota.acquire(user_id)
+    for chunk in model.generate_content(prompt, stream=True):
+        if chunk.text:
+            yield chunk.text
+
+def get_conversation_context(session_id):
+    """Resumen de la conversación más la última vuelta, dentro del presupuesto de tokens"""
+    return conversation_store.context(session_id)
+
+def add_to_conversation(session_id, message, is_user):
+    """Agrega un mensaje a la memoria conversacional (se guarda compactado)"""
+    conversation_store.append(session_id, message, is_user)
 
 def format_response(text):
     """Formatea la respuesta con mejor presentación visual, incluyendo imágenes"""
-    if not text:
-        return text
-    
-    # Reemplazar asteriscos por negritas HTML
-    import re
-    
-    # Convertir imágenes Markdown (![alt](url)) a etiquetas HTML img
-    text = re.sub(r'!\[([^\]]*)\]\(([^\)]+)\)', r'<img src="\2" alt="\1" style="max-width: 100%; height: auto; border-radius: 8px; margin: 10px 0; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">', text)
-    
-    # Manejar listas con viñetas
-    # Convertir líneas que comienzan con * o - en listas HTML
-    lines = text.split('\n')
-    formatted_lines = []
-    in_list = False
+    # Una sola pasada: listas, títulos, negritas e imágenes (ver src/markdown_render.py)
+    return render_markdown(text)
+
+# Mapear categorías en español
+CATEGORY_MAP = {
+    'parques': 'parque',
+    'plazas': 'plaza',
+    'miradores': 'mirador',
+    'centros-comerciales': 'centro comercial'
+}
+
+def get_place_index(snapshot=None) -> PlaceIndex:
+    """Lugares del catálogo por id, nombre normalizado y categoría (uno por versión; la de `snapshot` o la vigente)"""
+    global _place_index
+    snapshot = snapshot or catalog.snapshot()
+    cached = _place_index
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1]
     
-    for line in lines:
-        # Detectar líneas de lista
-        if re.match(r'^\s*[*\-]\s+', line):
-            if not in_list:
-                formatted_lines.append('<ul>')
-                in_list = True
-            content = re.sub(r'^\s*[*\-]\s+', '', line)
-            # Aplicar negritas dentro del contenido de la lista
-            content = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', content)
-            # Procesar imágenes dentro de listas
-            content = re.sub(r'!\[([^\]]*)\]\(([^\)]+)\)', r'<img src="\2" alt="\1" style="max-width: 100%; height: auto; border-radius: 8px; margin: 10px 0; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">', content)
-            formatted_lines.append(f'<li>{content}</li>')
-        else:
-            if in_list:
-                formatted_lines.append('</ul>')
-                in_list = False
-            
-            # Aplicar negritas a texto entre asteriscos dobles
-            line = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', line)
-            
-            # Procesar imágenes en líneas normales
-            line = re.sub(r'!\[([^\]]*)\]\(([^\)]+)\)', r'<img src="\2" alt="\1" style="max-width: 100%; height: auto; border-radius: 8px; margin: 10px 0; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">', line)
-            
-            # Manejar títulos con ### o ## al inicio
-            if re.match(r'^###\s+', line):
-                content = re.sub(r'^###\s+', '', line)
-                formatted_lines.append(f'<h4>{content}</h4>')
-            elif re.match(r'^##\s+', line):
-                content = re.sub(r'^##\s+', '', line)
-                formatted_lines.append(f'<h3>{content}</h3>')
-            elif re.match(r'^#\s+', line):
-                content = re.sub(r'^#\s+', '', line)
-                formatted_lines.append(f'<h2>{content}</h2>')
-            else:
-                formatted_lines.append(line)
+    index = PlaceIndex.from_rows(snapshot.places, snapshot.images)
+    _place_index = (snapshot.version, index)
+    return index
+
+def get_place_retriever() -> PlaceRetriever:
+    """Índice de relevancia de lugares; solo se reconstruye cuando cambia el catálogo"""
+    global _place_retriever
+    snapshot = catalog.snapshot()
+    cached = _place_retriever
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1]
     
-    if in_list:
-        formatted_lines.append('</ul>')
+    retriever = PlaceRetriever(get_place_index())
+    _place_retriever = (snapshot.version, retriever)
+    return retriever
+
+def get_place_search(snapshot=None) -> PlaceSearchIndex:
+    """Índice de búsqueda de /api/places de `snapshot` (o de la versión vigente); solo se reconstruye cuando cambia"""
+    global _place_search
+    snapshot = snapshot or catalog.snapshot()
+    cached = _place_search
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1]
     
-    # Unir líneas y mantener saltos de línea como <br>
-    result = '\n'.join(formatted_lines)
-    result = result.replace('\n', '<br>')
+    search_index = PlaceSearchIndex(get_place_index(snapshot))
+    _place_search = (snapshot.version, search_index)
+    return search_index
+
+def get_geo_index(snapshot=None) -> GeoIndex:
+    """Índice espacial de lugares de `snapshot` (o de la versión vigente); solo se reconstruye cuando cambia"""
+    global _geo_index
+    snapshot = snapshot or catalog.snapshot()
+    cached = _geo_index
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1]
     
-    return result
+    geo_index = GeoIndex(get_place_index(snapshot))
+    _geo_index = (snapshot.version, geo_index)
+    return geo_index
+
+# Frases de proximidad ("cerca de", "alrededor de", ...) sobre el texto sin tildes
+NEARBY_PATTERN = re.compile(r'\b(cerca|cercanos?|cercanas?|alrededor|proximos? a|proximas? a|junto a)\b')
+
+def detect_nearby_intent(text: str) -> bool:
+    """True si el usuario pregunta por lugares cercanos a otro"""
+    return bool(text) and NEARBY_PATTERN.search(normalize_text(text)) is not None
 
-def get_database_context(category=None, place_name=None):
-    """Obtener TODA la información real de la base de datos MySQL con caché"""
-    global context_cache, cache_timestamp
+def get_nearby_context(place_name, category_es=None, top_k=config.CONTEXT_TOP_K):
+    """
+    Contexto de lugares cercanos a un lugar del catálogo, con distancias ya calculadas.
+    Devuelve None si el lugar no está en el catálogo, no tiene coordenadas o no tiene vecinos.
+    """
+    anchor = get_place_index().find(place_name)
+    if anchor is None:
+        return None
+    top_k = top_k or config.CONTEXT_TOP_K
+    # Con filtro de categoría se piden más vecinos para que queden suficientes tras filtrar
+    neighbors = get_geo_index().nearby_place(anchor, k=top_k * 4 if category_es else top_k,
+                                             radius_m=config.NEARBY_RADIUS_M)
+    if category_es:
+        neighbors = [(lugar, d) for lugar, d in neighbors
+                     if category_es in str(lugar.categoria or '').lower() or category_es in lugar.nombre.lower()]
+    if not neighbors:
+        return None
+    return get_place_retriever().build_nearby_context(anchor, neighbors[:top_k], max_tokens=config.CONTEXT_MAX_TOKENS)
+
+def get_relevant_context(user_message, category=None, place_name=None, top_k=config.CONTEXT_TOP_K):
+    """
+    Contexto compacto para el prompt: solo los lugares más relevantes para el mensaje
+    (top_k=None incluye todos los que quepan en el presupuesto de tokens)
+    """
+    snapshot = catalog.snapshot()
     
-    # No usar caché cuando se filtra por nombre específico
-    import time
-    if not place_name and context_cache and cache_timestamp and (time.time() - cache_timestamp) < CACHE_DURATION:
-        return context_cache
+    if snapshot.status == 'sin_mysql':
+        # Devolver contexto predeterminado cuando no hay conexión MySQL
+        return RetrievedContext("HUANCAYO: Sin conexión a MySQL.")
+    if snapshot.status == 'error_mysql':
+        return RetrievedContext("HUANCAYO: Error en MySQL.")
     
-    try:
-        conn = get_db_connection()
-        if not conn:
-            # Devolver contexto predeterminado cuando no hay conexión MySQL
-            context_cache = "HUANCAYO: Sin conexión a MySQL."
-            cache_timestamp = time.time()
-            return context_cache
-            
-        cursor = conn.cursor()
-        
-        # Construir consulta con filtros
-        query = "SELECT * FROM locaciones"
-        params = []
-        conditions = []
-        
-        if category:
-            # Mapear categorías en español
-            category_map = {
-                'parques': 'parque',
-                'plazas': 'plaza',
-                'miradores': 'mirador',
-                'centros-comerciales': 'centro comercial'
-            }
-            
-            category_es = category_map.get(category, category)
-            conditions.append("(LOWER(categoria) LIKE LOWER(%s) OR LOWER(nombre) LIKE LOWER(%s))")
-            params.extend([f'%{category_es}%', f'%{category_es}%'])
-        
-
-        
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY nombre"
-        
-        cursor.execute(query, params)
-        lugares = cursor.fetchall()
-        
-        # Obtener información de las columnas para entender la estructura
-        cursor.execute("DESCRIBE locaciones")
-        columnas_info = cursor.fetchall()
-        nombres_columnas = [col[0] for col in columnas_info]
-        
-        conn.close()
-        
-        # Construir contexto con TODA la información real
-        context = f"BASE DE DATOS HUANCAYO - {len(lugares)} lugares encontrados:\n\n"
-        
-        if lugares:
-            for lugar in lugares:
-                # Construir información completa de cada lugar
-                info_lugar = []
-                nombre_lugar = None
-                
-                # Primero extraer el nombre para usarlo como referencia
-                for i, valor in enumerate(lugar):
-                    if valor is not None and nombres_columnas[i] == 'nombre':
-                        nombre_lugar = valor
-                        info_lugar.append(f"LUGAR: {valor}")
-                        break
-                
-                # Luego procesar el resto de columnas
-                for i, valor in enumerate(lugar):
-                    if valor is not None:  # Solo incluir datos no nulos
-                        nombre_columna = nombres_columnas[i]
-                        
-                        if nombre_columna == 'nombre':
-                            continue  # Ya procesado arriba
-                        elif nombre_columna == 'descripcion':
-                            info_lugar.append(f"DESCRIPCIÓN: {valor}")
-                        elif nombre_columna == 'latitud':
-                            # Buscar longitud
-                            longitud_idx = nombres_columnas.index('longitud') if 'longitud' in nombres_columnas else -1
-                            if longitud_idx >= 0 and longitud_idx < len(lugar):
-                                info_lugar.append(f"UBICACIÓN: {valor}, {lugar[longitud_idx]}")
-                        elif nombre_columna == 'longitud':
-                            # Ya procesado con latitud
-                            continue
-                        elif nombre_columna == 'categoria':
-                            info_lugar.append(f"CATEGORÍA: {valor}")
-                        else:
-                            # Cualquier otra columna con información relevante
-                            info_lugar.append(f"{nombre_columna.upper()}: {valor}")
-                
-                # Unir toda la información del lugar
-                if info_lugar:
-                    context += " | ".join(info_lugar) + "\n"
-        else:
-            # Cuando no hay lugares, proporcionar un contexto útil pero vacío
-            context += "No se encontraron lugares en la categoría especificada."
-            if category:
-                context += f" (Búsqueda: {category})"
-            context += "\n"
-        
-        # Agregar información de las imágenes si existen
-        try:
-            conn = get_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                
-                # Obtener información detallada de imágenes por lugar
-                cursor.execute("""
-                    SELECT l.nombre, li.url_imagen, li.descripcion 
-                    FROM locacion_imagenes li
-                    JOIN locaciones l ON li.locacion_id = l.id
-                    ORDER BY l.nombre
-                """)
-                imagenes = cursor.fetchall()
-                
-                if imagenes:
-                    context += f"\nIMÁGENES DISPONIBLES: {len(imagenes)} imágenes asociadas a lugares.\n"
-                    
-                    # Agrupar imágenes por lugar
-                    imagenes_por_lugar = {}
-                    for nombre, url_imagen, descripcion in imagenes:
-                        if nombre not in imagenes_por_lugar:
-                            imagenes_por_lugar[nombre] = []
-                        imagenes_por_lugar[nombre].append({
-                            'url': url_imagen,
-                            'descripcion': descripcion or 'Imagen del lugar'
-                        })
-                    
-                    # Agregar información de imágenes al contexto
-                    for lugar, imgs in imagenes_por_lugar.items():
-                        context += f"IMAGENES_{lugar.upper().replace(' ', '_')}: "
-                        for img in imgs:
-                            context += f"[URL: {img['url']}, DESC: {img['descripcion']}] "
-                        context += "\n"
-                
-                conn.close()
-        except Exception as e:
-            print(f"Error al obtener imágenes: {e}")
-            pass  # Si hay error con las imágenes, continuar sin ellas
-        
-        # Guardar en caché
-        context_cache = context
-        cache_timestamp = time.time()
-        
-        return context
-        
-    except Exception as e:
-        # Devolver contexto predeterminado cuando hay errores
-        print(f"Error al obtener contexto de BD: {e}")
-        context_cache = "HUANCAYO: Error en MySQL."
-        cache_timestamp = time.time()
-        return context_cache
+    category_es = CATEGORY_MAP.get(category, category).lower() if category else None
+    boost_name = place_name or detect_place_name(user_message)
+    if boost_name and detect_nearby_intent(user_message):
+        # "¿Qué hay cerca de X?": vecinos por distancia real en vez de por parecido de texto
+        nearby = get_nearby_context(boost_name, category_es, top_k)
+        if nearby is not None:
+            return nearby
+    
+    return get_place_retriever().build_context(
+        user_message,
+        category=category_es,
+        boost_name=boost_name,
+        top_k=top_k,
+        max_tokens=config.CONTEXT_MAX_TOKENS
+    )
 
 def get_cached_response(message):
     """Obtener respuesta del caché si existe"""
-    import time
     cache_key = message.lower().strip()
-    if cache_key in response_cache:
-        cached_data = response_cache[cache_key]
-        if time.time() - cached_data['timestamp'] < RESPONSE_CACHE_DURATION:
-            return cached_data['response']
-    return None
+    cached = response_cache.get(cache_key)
+    metrics.incr('cache_lookups_total', tier='exact', result='miss' if cached is None else 'hit')
+    if cached is None and shared_state.shared:
+        # Respuesta generada por otro worker
+        cached = shared_state.get(f"resp:{cache_key}")
+        metrics.incr('cache_lookups_total', tier='shared', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            response_cache.set(cache_key, cached)
+    return cached
 
-def cache_response(message, response):
-    """Guardar respuesta en caché"""
-    import time
+def cache_response(message, response, scope=None):
+    """Guardar respuesta en caché (exacta y semántica dentro del ámbito indicado)"""
     cache_key = message.lower().strip()
-    response_cache[cache_key] = {
-        'response': response,
-        'timestamp': time.time()
-    }
+    response_cache.set(cache_key, response)
+    semantic_cache.set(message, response, scope)
+    if shared_state.shared:
+        shared_state.set(f"resp:{cache_key}", response, ttl=RESPONSE_CACHE_DURATION)
 
 @app.route('/')
 def index():
     return render_template('chat_gemini.html')
 
+# Si el cuerpo de cada ETag alcanza MIN_COMPRESS_SIZE: el 304 debe llevar el mismo ETag
+# (con o sin sufijo de codificación) que el 200 de esa representación
+_compressible_bodies = LRUTTLCache(max_entries=2048, max_bytes=1024 * 1024, ttl=RESPONSE_CACHE_DURATION)
+
+def cacheable_json(etag, build_payload):
+    """
+    Respuesta JSON condicional: 304 sin construir nada si el cliente ya tiene esta versión
+    (If-None-Match); si no, el JSON comprimido con brotli/gzip según Accept-Encoding.
+    """
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = Response(status=304)
+        compressible = _compressible_bodies.get(etag)
+        if compressible is None and encoding:
+            # Otro worker sirvió el 200: medir el cuerpo una vez para elegir el mismo ETag
+            compressible = len(jsonify(build_payload()).get_data()) >= MIN_COMPRESS_SIZE
+            _compressible_bodies.set(etag, compressible)
+        if not compressible:
+            encoding = None
+    else:
+        response = jsonify(build_payload())
+        body = response.get_data()
+        _compressible_bodies.set(etag, len(body) >= MIN_COMPRESS_SIZE)
+        if encoding and len(body) >= MIN_COMPRESS_SIZE:
+            response.set_data(compress(body, encoding))
+            response.headers['Content-Encoding'] = encoding
+        else:
+            encoding = None
+    response.headers['ETag'] = etag_for_encoding(etag, encoding)
+    # no-cache: el navegador guarda la respuesta pero la revalida siempre con el ETag
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 @app.route('/api/stats')
 def stats():
-    """Obtener estadísticas REALES de la base de datos"""
+    """Obtener estadísticas REALES de la base de datos (agregados precalculados del catálogo)"""
     try:
-        conn = get_db_connection()
-        if not conn:
+        aggregates = get_catalog_aggregates()
+        if aggregates.status == 'sin_mysql':
             return jsonify({
                 'error': 'No hay conexión a la base de datos',
                 'total_lugares': 0,
@@ -458,60 +542,12 @@ def stats():
                 'categorias': [],
                 'estado': 'sin_mysql'
             })
-            
-        cursor = conn.cursor()
-        
-        # Contar lugares
-        cursor.execute("SELECT COUNT(*) FROM locaciones")
-        total_lugares = cursor.fetchone()[0]
+        if aggregates.status == 'error_mysql':
+            raise RuntimeError('No se pudo leer el catálogo de lugares')
         
-        # Contar imágenes
-        cursor.execute("SELECT COUNT(*) FROM locacion_imagenes")
-        total_imagenes = cursor.fetchone()[0]
-        
-        # Obtener todos los nombres de lugares para análisis
-        cursor.execute("SELECT nombre FROM locaciones")
-        nombres_lugares = [row[0] for row in cursor.fetchall()]
-        
-        # Analizar patrones en los nombres para categorizar
-        categorias_reales = {}
-        
-        for nombre in nombres_lugares:
-            nombre_lower = nombre.lower()
-            
-            # Categorizar basado en palabras clave en los nombres
-            if any(palabra in nombre_lower for palabra in ['parque', 'bosque', 'montaña', 'laguna', 'cascada', 'río']):
-                categoria = 'Naturaleza'
-            elif any(palabra in nombre_lower for palabra in ['plaza', 'iglesia', 'templo', 'museo', 'monumento']):
-                categoria = 'Cultura'
-            elif any(palabra in nombre_lower for palabra in ['ruinas', 'pirámide', 'fortaleza', 'cerro']):
-                categoria = 'Historia'
-            elif any(palabra in nombre_lower for palabra in ['mercado', 'restaurante', 'comida', 'picantería']):
-                categoria = 'Gastronomía'
-            elif any(palabra in nombre_lower for palabra in ['mirador', 'sendero', 'camino', 'trekking']):
-                categoria = 'Aventura'
-            else:
-                categoria = 'Otros'
-            
-            categorias_reales[categoria] = categorias_reales.get(categoria, 0) + 1
-        
-        # Convertir a lista de categorías con conteos
-        categorias_lista = []
-        for cat, count in categorias_reales.items():
-            categorias_lista.append(f"{cat} ({count})")
-        
-        # Si no se encontraron categorías, usar las básicas
-        if not categorias_lista:
-            categorias_lista = ['Naturaleza', 'Cultura', 'Historia', 'Gastronomía', 'Aventura']
-        
-        conn.close()
-        
-        return jsonify({
-            'total_lugares': total_lugares,
-            'total_imagenes': total_imagenes,
-            'categorias': categorias_lista,
-            'estado': 'con_mysql'
-        })
+        # El contenido solo cambia con la versión del catálogo: los refrescos
+        # periódicos del sidebar reciben 304 sin tocar MySQL
+        return cacheable_json(make_etag(aggregates.version, 'stats'), lambda: aggregates.stats_payload)
         
     except Exception as e:
         print(f"Error en stats: {e}")
@@ -551,6 +587,30 @@ def detect_category_intent(text: str) -> str | None:
             return cat
     return None
 
+def get_place_matcher() -> PlaceMatcher:
+    """Buscador de lugares compilado; solo se reconstruye cuando cambia el catálogo"""
+    global _place_matcher
+    snapshot = catalog.snapshot()
+    cached = _place_matcher
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1]
+    
+    matcher = PlaceMatcher(LUGARES_CONOCIDOS + list(snapshot.names))
+    _place_matcher = (snapshot.version, matcher)
+    return matcher
+
+def get_response_validator() -> ResponseValidator:
+    """Validador de respuestas compilado; solo se reconstruye cuando cambia el catálogo"""
+    global _response_validator
+    snapshot = catalog.snapshot()
+    cached = _response_validator
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1]
+    
+    validator = ResponseValidator(snapshot.names)
+    _response_validator = (snapshot.version, validator)
+    return validator
+
 def detect_place_name(text: str) -> str | None:
     """
     Detecta si el usuario menciona un nombre específico de lugar.
@@ -559,31 +619,26 @@ def detect_place_name(text: str) -> str | None:
     if not text:
         return None
     
-    # Lista de lugares conocidos en Huancayo
-    lugares_conocidos = [
-        "Plaza Constitución", "Plaza Huamanmarca", "Parque de la Identidad", 
-        "Cerrito de la Libertad", "Parque Inmaculada", "Torre Torre",
-        "Real Plaza", "Open Plaza", "Mall Center", "Plaza Vea",
-        "Catedral de Huancayo", "Feria Dominical", "Nevado Huaytapallana",
-        "Wariwillka", "Estadio Huancayo"
-    ]
-    
-    # Normalizar texto
-    t = text.lower()
-    
-    # Buscar menciones de lugares conocidos
-    for lugar in lugares_conocidos:
-        lugar_lower = lugar.lower()
-        # Verificar si el nombre del lugar está en el texto como palabra completa
-        if lugar_lower in t:
-            # Verificar si es una palabra completa o parte de otra palabra
-            # Buscar el índice donde aparece el lugar
-            idx = t.find(lugar_lower)
-            # Verificar si es una palabra completa (está al inicio, al final, o rodeada de espacios)
-            if (idx == 0 or not t[idx-1].isalnum()) and (idx + len(lugar_lower) == len(t) or not t[idx + len(lugar_lower)].isalnum()):
-                return lugar
-    
-    return None
+    # Buscar menciones de lugares conocidos como palabras completas (sin importar tildes)
+    return get_place_matcher().find_first(text)
+
+def place_card(lugar, categoria=None) -> dict:
+    """Tarjeta de un lugar del catálogo para el frontend"""
+    return {
+        'nombre': lugar.nombre,
+        'descripcion': lugar.descripcion or '',
+        'categoria': categoria or lugar.categoria,
+        'imagen_url': lugar.imagenes[0][0] if lugar.imagenes else None,
+        'ubicacion': lugar.ubicacion
+    }
+
+# Respuestas deterministas desde el catálogo para los mensajes más comunes. Los listados
+# solo se enrutan por el nombre de la categoría, no por los alias de detect_category_intent
+intent_router = IntentRouter(detect_category_name, detect_place_name, get_simple_response)
+
+def route_chat_message(user_message, category=None):
+    """Respuesta del enrutador local, o None si el mensaje necesita a Gemini"""
+    return intent_router.route(user_message, get_place_index(), get_place_search(), category)
 
 def extract_places_from_response(response_text: str) -> list:
     """
@@ -593,276 +648,70 @@ def extract_places_from_response(response_text: str) -> list:
     if not response_text:
         return []
     
-    # Lista de lugares conocidos en Huancayo
-    lugares_conocidos = [
-        "Plaza Constitución", "Plaza Huamanmarca", "Parque de la Identidad", 
-        "Cerrito de la Libertad", "Parque Inmaculada", "Torre Torre",
-        "Real Plaza", "Open Plaza", "Mall Center", "Plaza Vea",
-        "Catedral de Huancayo", "Feria Dominical", "Nevado Huaytapallana",
-        "Wariwillka", "Estadio Huancayo"
-    ]
-    
-    # Obtener todos los lugares de la base de datos para una detección más completa
-    try:
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT DISTINCT nombre FROM locaciones")
-            lugares_db = cursor.fetchall()
-            conn.close()
-            
-            # Agregar lugares de la base de datos a la lista de lugares conocidos
-            for lugar_db in lugares_db:
-                if lugar_db[0] and lugar_db[0] not in lugares_conocidos:
-                    lugares_conocidos.append(lugar_db[0])
-    except Exception as e:
-        print(f"Error al obtener lugares de la base de datos: {str(e)}")
-    
-    # Normalizar texto
-    t = response_text.lower()
-    
-    # Lista para almacenar los lugares encontrados
-    lugares_encontrados = []
-    
-    # Buscar menciones de lugares conocidos
-    for lugar in lugares_conocidos:
-        lugar_lower = lugar.lower()
-        # Verificar si el nombre del lugar está en el texto como palabra completa
-        if lugar_lower in t:
-            # Verificar si es una palabra completa o parte de otra palabra
-            # Buscar todas las ocurrencias del lugar
-            start_idx = 0
-            while True:
-                idx = t.find(lugar_lower, start_idx)
-                if idx == -1:
-                    break
-                    
-                # Verificar si es una palabra completa (está al inicio, al final, o rodeada de espacios o puntuación)
-                is_word_boundary_before = (idx == 0 or not t[idx-1].isalnum())
-                is_word_boundary_after = (idx + len(lugar_lower) == len(t) or not t[idx + len(lugar_lower)].isalnum())
-                
-                if is_word_boundary_before and is_word_boundary_after:
-                    if lugar not in lugares_encontrados:
-                        lugares_encontrados.append(lugar)
-                        break  # Una vez encontrado, no necesitamos más ocurrencias del mismo lugar
-                
-                start_idx = idx + 1
-    
-    return lugares_encontrados
+    # Una sola pasada sobre el texto con el autómata de todos los lugares conocidos
+    return get_place_matcher().find_all(response_text)
 
 
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    global daily_requests
-    start_time = datetime.now()
-    user_message = request.json.get('message', '')
-    stream_mode = request.json.get('stream', False)
-    category = request.json.get('category', None)  # Filtro de categoría
-    auto_filter = request.json.get('auto_filter', False)  # Nuevo parámetro para filtrado automático
-    
-    # Detectar intenciones si no se proporcionan explícitamente o si se solicita filtrado automático
-    if category is None or auto_filter:
-        category = detect_category_intent(user_message)
-    
-    # Detectar nombre de lugar si se solicita filtrado automático
-    place_name = None
-    if auto_filter:
-        place_name = detect_place_name(user_message)
-    
-    # Obtener ID del usuario
-    user_id = get_user_id()
-    
-    # Verificar límite diario
-    if daily_requests >= MAX_DAILY_REQUESTS:
-        response_time = (datetime.now() - start_time).total_seconds()
-        system_info['total_requests'] += 1
-        system_info['response_times'].append(response_time)
-        places = []
-        return jsonify({'response': '⚠️ Hemos alcanzado el límite diario de consultas. Por favor, intenta nuevamente mañana o prueba con preguntas similares que ya hayan sido respondidas.', 'places': places})
-    
-    # Detectar mensajes simples y responder directamente
-    message_type = detect_simple_message(user_message)
-    if message_type:
-        simple_response = get_simple_response(message_type, user_message)
-        response_time = (datetime.now() - start_time).total_seconds()
-        system_info['total_requests'] += 1
-        system_info['response_times'].append(response_time)
-        
-        # Agregar a la conversación
-        add_to_conversation(user_id, user_message, True)
-        add_to_conversation(user_id, simple_response, False)
-        
-        if stream_mode:
-            # Devolver respuesta simple en modo streaming
-            def generate_simple():
-                words = simple_response.split()
-                for word in words:
-                    json_data = json.dumps({'chunk': word + ' ', 'done': False})
-                    yield f"data: {json_data}\n\n"
-                # Extraer lugares mencionados en la respuesta
-                lugares_mencionados = extract_places_from_response(simple_response)
-                
-                # Si se encontraron lugares en la respuesta, usarlos directamente para filtrar
-                if lugares_mencionados:
-                    places = get_places_filtered(category, None, lugares_mencionados)
-                    # Usar el primer lugar mencionado como place_name para la UI
-                    place_name = lugares_mencionados[0] if not place_name else place_name
-                else:
-                    # Si no hay lugares mencionados, usar el filtrado normal
-                    places = get_places_filtered(category, place_name)
-                
-                yield f"data: {json.dumps({'chunk': '', 'done': True, 'places': places, 'category': category, 'place_name': place_name, 'lugares_mencionados': lugares_mencionados})}\n\n"
-            return Response(generate_simple(), mimetype='text/event-stream')
-        else:
-            # Extraer lugares mencionados en la respuesta
-            lugares_mencionados = extract_places_from_response(simple_response)
-            
-            # Si se encontraron lugares en la respuesta, usarlos directamente para filtrar
-            if lugares_mencionados:
-                places = get_places_filtered(category, None, lugares_mencionados)
-                # Usar el primer lugar mencionado como place_name para la UI
-                place_name = lugares_mencionados[0] if not place_name else place_name
-            else:
-                # Si no hay lugares mencionados, usar el filtrado normal
-                places = get_places_filtered(category, place_name)
-                
-            return jsonify({'response': simple_response, 'places': places, 'category': category, 'place_name': place_name, 'lugares_mencionados': lugares_mencionados})
-    
-    # Verificar si tenemos una respuesta en caché
-    cached_response = get_cached_response(user_message)
-    if cached_response:
-        response_time = (datetime.now() - start_time).total_seconds()
-        system_info['total_requests'] += 1
-        system_info['cached_responses_count'] += 1
-        system_info['response_times'].append(response_time)
-        
-        # Agregar a la conversación
-        add_to_conversation(user_id, user_message, True)
-        add_to_conversation(user_id, cached_response, False)
-        
-        # Extraer lugares mencionados en la respuesta en caché
-        lugares_mencionados = extract_places_from_response(cached_response)
-        
-        if stream_mode:
-            # Devolver respuesta en caché en modo streaming
-            def generate_cached():
-                chunks = cached_response.split()
-                for chunk in chunks:
-                    json_data = json.dumps({'chunk': chunk + ' ', 'done': False})
-                    yield f"data: {json_data}\n\n"
-                    
-                # Si se encontraron lugares en la respuesta, usarlos directamente para filtrar
-                if lugares_mencionados:
-                    places = get_places_filtered(category, None, lugares_mencionados)
-                    # Usar el primer lugar mencionado como place_name para la UI
-                    place_name_final = lugares_mencionados[0] if not place_name else place_name
-                else:
-                    # Si no hay lugares mencionados, usar el filtrado normal
-                    places = get_places_filtered(category, place_name)
-                    place_name_final = place_name
-                    
-                yield f"data: {json.dumps({'chunk': '', 'done': True, 'places': places, 'category': category, 'place_name': place_name_final, 'lugares_mencionados': lugares_mencionados})}\n\n"
-            return Response(generate_cached(), mimetype='text/event-stream')
-        else:
-            # Si se encontraron lugares en la respuesta, usarlos directamente para filtrar
-            if lugares_mencionados:
-                places = get_places_filtered(category, None, lugares_mencionados)
-                # Usar el primer lugar mencionado como place_name para la UI
-                place_name_final = lugares_mencionados[0] if not place_name else place_name
-            else:
-                # Si no hay lugares mencionados, usar el filtrado normal
-                places = get_places_filtered(category, place_name)
-                place_name_final = place_name
-                
-            return jsonify({'response': cached_response, 'places': places, 'category': category, 'place_name': place_name_final, 'lugares_mencionados': lugares_mencionados})
-    
-    # Detectar si el usuario quiere ver todos los lugares
-    mostrar_todos = False
-    if any(frase in user_message.lower() for frase in ['todos los lugares', 'mostrar todos', 'todos los sitios', 'ver todos']):
-        mostrar_todos = True
-        category = None  # Eliminar filtro de categoría
-    
-    # Obtener contexto real de la base de datos y conversación (con filtros)
-    db_context = get_database_context(category, place_name)
-    conversation_context = get_conversation_context(user_id)
-    
-    # Extraer lugares reales del contexto para validación
-    lugares_reales = []
-    for linea in db_context.split('\n'):
-        if 'LUGAR:' in linea:
-            # Extraer el nombre del lugar
-            partes = linea.split('LUGAR:')
-            if len(partes) > 1:
-                lugar = partes[1].split('|')[0].strip()
-                lugares_reales.append(lugar)
-    
-    # Si no hay datos reales disponibles, proporcionar una respuesta útil
-    if not lugares_reales:
-        # Verificar si es un problema de conexión o simplemente no hay datos
-        if "Sin conexión" in db_context or "Error" in db_context:
-            safe_msg = (
-                'En este momento no tengo datos listos para mostrar. Ahora contamos con la columna de categoría para filtrar mejor. '
-                'Dime una categoría (por ejemplo: Parques, Patrimonio, Naturaleza, Centro Comercial, Estadio) '
-                'o escribe "mostrar todos" para ver todo el listado.'
-            )
-        else:
-            # No hay lugares en la categoría especificada
-            if mostrar_todos:
-                # El usuario solicitó todos los lugares pero no hay ninguno
-                safe_msg = (
-                    'Actualmente no tengo lugares registrados en mi base de datos. '
-                    'Te sugiero probar con estas categorías populares:\n'
-                    '* Parques\n'
-                    '* Plazas\n'
-                    '* Miradores\n'
-                    '* Iglesias\n'
-                    '* Museos\n'
-                    '* Mercados\n'
-                    '¿Qué tipo de lugar te gustaría conocer?'
-                )
-            elif category:
-                # Buscar categorías similares o alternativas
-                safe_msg = (
-                    f'No encontré lugares en la categoría "{category}" en mi base de datos actual. '
-                    'Te sugiero probar con estas categorías populares:\n'
-                    '* Parques\n'
-                    '* Plazas\n'
-                    '* Miradores\n'
-                    '* Iglesias\n'
-                    '* Museos\n'
-                    '* Mercados\n'
-                    '¿Te gustaría que busque en alguna de estas categorías?'
-                )
-            else:
-                safe_msg = (
-                    'Actualmente no tengo lugares registrados en mi base de datos. '
-                    'Te sugiero probar con estas categorías populares:\n'
-                    '* Parques\n'
-                    '* Plazas\n'
-                    '* Miradores\n'
-                    '* Iglesias\n'
-                    '* Museos\n'
-                    '* Mercados\n'
-                    '¿Qué tipo de lugar te gustaría conocer?'
-                )
-        
-        add_to_conversation(user_id, user_message, True)
-        add_to_conversation(user_id, safe_msg, False)
-        if stream_mode:
-            def generate_no_data():
-                for chunk in safe_msg.split():
-                    json_data = json.dumps({'chunk': chunk + ' ', 'done': False})
-                    yield f"data: {json_data}\n\n"
-                places = get_places_filtered(category, place_name)
-                yield f"data: {json.dumps({'chunk': '', 'done': True, 'places': places, 'category': category, 'place_name': place_name})}\n\n"
-            return Response(generate_no_data(), mimetype='text/event-stream')
-        else:
-            places = get_places_filtered(category, place_name)
-            return jsonify({'response': safe_msg, 'places': places, 'category': category, 'place_name': place_name})
+class ChatTurn:
+    """Estado de una consulta de /api/chat mientras recorre el pipeline"""
+
+    def __init__(self, user_message, stream_mode, category, place_name, user_id, session_id=None):
+        self.user_message = user_message
+        self.stream_mode = stream_mode
+        self.category = category
+        self.place_name = place_name
+        self.user_id = user_id
+        self.session_id = session_id or user_id
+        self.started = time.perf_counter()
+        self.kind = None            # 'limite', 'local', 'cache', 'sin_datos' o 'gemini'
+        self.response = None        # Texto ya resuelto (todos los tipos salvo 'gemini')
+        self.intent = None          # Regla del enrutador que resolvió la consulta ('local')
+        self.places = None          # Tarjetas armadas desde el catálogo ('local')
+        self.streamed_places = 0    # Tarjetas ya enviadas durante el streaming
+        self.prompt = None
+        self.prompt_tokens = 0      # Tamaño estimado del prompt enviado a Gemini
+        self.lugares_reales = PlaceIndex()  # Lugares incluidos en el contexto del prompt
+        self.cache_scope = None
+        self.flight_key = None
+
+def record_chat_latency(turn, kind=None):
+    """Registrar la duración de una consulta ya respondida (kind: tipo distinto del del turno, p. ej. 'error')"""
+    metrics.observe('chat_seconds', time.perf_counter() - turn.started, kind=kind or turn.kind)
+    system_info['total_requests'] += 1
+
+def _no_data_message(db_context, category, mostrar_todos):
+    """Respuesta útil cuando no hay lugares reales para armar el contexto"""
+    # Verificar si es un problema de conexión o simplemente no hay datos
+    if "Sin conexión" in db_context or "Error" in db_context:
+        return (
+            'En este momento no tengo datos listos para mostrar. Ahora contamos con la columna de categoría para filtrar mejor. '
+            'Dime una categoría (por ejemplo: Parques, Patrimonio, Naturaleza, Centro Comercial, Estadio) '
+            'o escribe "mostrar todos" para ver todo el listado.'
+        )
+    sugerencias = (
+        'Te sugiero probar con estas categorías populares:\n'
+        '* Parques\n'
+        '* Plazas\n'
+        '* Miradores\n'
+        '* Iglesias\n'
+        '* Museos\n'
+        '* Mercados\n'
+    )
+    if category and not mostrar_todos:
+        # Buscar categorías similares o alternativas
+        return (
+            f'No encontré lugares en la categoría "{category}" en mi base de datos actual. '
+            + sugerencias + '¿Te gustaría que busque en alguna de estas categorías?'
+        )
+    return (
+        'Actualmente no tengo lugares registrados en mi base de datos. '
+        + sugerencias + '¿Qué tipo de lugar te gustaría conocer?'
+    )
 
-    # Crear prompt con contexto de conversación - MUY IMPORTANTE: USAR SOLO DATOS REALES
-    prompt = f"""CONTEXTO DE BASE DE DATOS HUANCAYO (USAR SOLO ESTA INFORMACIÓN):
+def build_chat_prompt(db_context, conversation_context, user_message):
+    """Prompt para Gemini - MUY IMPORTANTE: USAR SOLO DATOS REALES"""
+    return f"""CONTEXTO DE BASE DE DATOS HUANCAYO (USAR SOLO ESTA INFORMACIÓN):
 {db_context}
 
 HISTORIAL DE CONVERSACIÓN:
@@ -900,102 +749,386 @@ INSTRUCCIONES DE FORMATO:
 
 RESPONDE ÚNICAMENTE BASÁNDOTE EN LOS DATOS REALES DEL CONTEXTO. IMPORTANTE: NO MENCIONES PROBLEMAS TÉCNICOS NI DE CONEXIÓN."""
 
-    try:
-        daily_requests += 1
+def prepare_chat_turn(data, user_id, session_id=None):
+    """
+    Primera etapa de /api/chat (bloqueante: caché, cuota y base de datos).
+    Resuelve la consulta sin Gemini cuando se puede; si no, deja listo el prompt.
+    La comparten el servidor Flask y el modo ASGI (asgi_gemini.py).
+    user_id identifica al cliente para la cuota; session_id, su conversación.
+    """
+    user_message = data.get('message', '')
+    stream_mode = data.get('stream', False)
+    category = data.get('category', None)  # Filtro de categoría
+    auto_filter = data.get('auto_filter', False)  # Nuevo parámetro para filtrado automático
+    
+    # Detectar intenciones si no se proporcionan explícitamente o si se solicita filtrado automático
+    if category is None or auto_filter:
+        category = detect_category_intent(user_message)
+    
+    # Detectar nombre de lugar si se solicita filtrado automático
+    place_name = None
+    if auto_filter:
+        place_name = detect_place_name(user_message)
+    
+    turn = ChatTurn(user_message, stream_mode, category, place_name, user_id, session_id)
+    
+    # Saludos y preguntas que el catálogo responde solo ("¿qué parques hay?", "¿dónde queda X?"):
+    # sin Gemini, así que tampoco gastan ni dependen de la cuota diaria
+    routed = route_chat_message(user_message, category)
+    if routed is not None:
+        turn.intent = routed.intent
+        turn.category = routed.category or turn.category
+        turn.place_name = routed.place_name or turn.place_name
+        return _finish_local_turn(turn, routed.text, zip(routed.records, routed.categories))
+    
+    # Saldo de cuota (sin descontar): con poco saldo se degrada en orden caché -> catálogo -> rechazo
+    quota_status = quota.check(user_id)
+    
+    # Ámbito de la caché semántica: preguntas parecidas solo comparten respuesta
+    # si se refieren a la misma categoría y al mismo lugar
+    turn.cache_scope = (category, place_name or detect_place_name(user_message))
+    
+    # Verificar si tenemos una respuesta en caché
+    cached_response = get_cached_response(user_message)
+    if not cached_response:
+        # Segundo nivel: una pregunta equivalente ya respondida no gasta cuota de Gemini
+        # (con poco saldo basta con que sea parecida)
+        relaxed = quota_status.low or not quota_status.allowed
+        cached_response = semantic_cache.get(user_message, turn.cache_scope,
+                                             config.SEMANTIC_CACHE_RELAXED_THRESHOLD if relaxed else None)
+        metrics.incr('cache_lookups_total', tier='semantic', result='hit' if cached_response else 'miss')
+    if cached_response:
+        turn.kind = 'cache'
+        turn.response = cached_response
+        system_info['cached_responses_count'] += 1
+        if not quota_status.allowed:
+            quota.record_degraded('cache')
+        add_to_conversation(turn.session_id, user_message, True)
+        add_to_conversation(turn.session_id, cached_response, False)
+        return turn
+    
+    # Detectar si el usuario quiere ver todos los lugares
+    mostrar_todos = False
+    if any(frase in user_message.lower() for frase in ['todos los lugares', 'mostrar todos', 'todos los sitios', 'ver todos']):
+        mostrar_todos = True
+        category = turn.category = None  # Eliminar filtro de categoría
+    
+    # Contexto real de la base de datos (solo los lugares relevantes) y de la conversación
+    with metrics.timer('stage_seconds', stage='db_context'):
+        context = get_relevant_context(user_message, category, place_name, top_k=None if mostrar_todos else config.CONTEXT_TOP_K)
+        conversation_context = get_conversation_context(turn.session_id)
+    
+    # Lugares reales incluidos en el contexto, para validar la respuesta
+    turn.lugares_reales = context.index
+    
+    # Si no hay datos reales disponibles, proporcionar una respuesta útil
+    if not turn.lugares_reales:
+        turn.kind = 'sin_datos'
+        turn.response = _no_data_message(context.text, category, mostrar_todos)
+        add_to_conversation(turn.session_id, user_message, True)
+        add_to_conversation(turn.session_id, turn.response, False)
+        return turn
+    
+    if not quota_status.allowed:
+        if mostrar_todos or any(turn.cache_scope):
+            # Pregunta sobre una categoría o un lugar concreto: responder solo con el catálogo
+            quota.record_degraded('local')
+            turn.intent = 'catalog_fallback'
+            return _finish_local_turn(turn, generar_respuesta_solo_datos_reales(turn.lugares_reales, None),
+                                      ((lugar, None) for lugar in turn.lugares_reales))
+        quota.record_degraded('refused')
+        turn.kind = 'limite'
+        turn.response = QUOTA_MESSAGES[quota_status.reason]
+        return turn
+    
+    turn.kind = 'gemini'
+    with metrics.timer('stage_seconds', stage='prompt_build'):
+        turn.prompt = build_chat_prompt(context.text, conversation_context, user_message)
+        turn.prompt_tokens = estimate_tokens(turn.prompt)
+    system_info['prompts'] += 1
+    system_info['prompt_tokens'] += turn.prompt_tokens
+    print(f"📏 Prompt: ~{turn.prompt_tokens} tokens | contexto ~{context.tokens} tokens con "
+          f"{len(context.index)}/{context.total_places} lugares (catálogo completo ~{context.full_tokens} tokens) | "
+          f"conversación ~{estimate_tokens(conversation_context)} tokens")
+    # Clave de coalescencia: misma pregunta normalizada, categoría y lugar
+    turn.flight_key = (' '.join(tokenize(user_message)),) + turn.cache_scope
+    return turn
+
+def _finish_local_turn(turn, text, places):
+    """Cerrar una consulta respondida desde el catálogo: texto y tarjetas (lugar, categoría mostrada)"""
+    turn.kind = 'local'
+    if turn.stream_mode:
+        with metrics.timer('stage_seconds', stage='formatting'):
+            text = format_response(text)
+    turn.response = text
+    with metrics.timer('stage_seconds', stage='place_lookup'):
+        turn.places = [place_card(lugar, categoria) for lugar, categoria in places]
+    add_to_conversation(turn.session_id, turn.user_message, True)
+    add_to_conversation(turn.session_id, turn.response, False)
+    return turn
+
+def build_chat_payload(turn, response_text, mention_places=True):
+    """
+    Respuesta final de /api/chat: texto, tarjetas de lugares y filtros aplicados.
+    Con mention_places=False no se buscan lugares mencionados en el texto.
+    """
+    with metrics.timer('stage_seconds', stage='place_lookup'):
+        return _chat_payload(turn, response_text, mention_places)
+
+def _chat_payload(turn, response_text, mention_places):
+    """Cuerpo de build_chat_payload (medido como la etapa 'place_lookup')"""
+    if turn.places is not None:
+        # Respuesta del enrutador local: las tarjetas ya salieron del catálogo
+        return {'response': response_text, 'places': turn.places, 'category': turn.category,
+                'place_name': turn.place_name, 'intent': turn.intent}
+    
+    if not mention_places:
+        places = get_places_filtered(turn.category, turn.place_name)
+        return {'response': response_text, 'places': places, 'category': turn.category, 'place_name': turn.place_name}
+    
+    # Extraer lugares mencionados en la respuesta
+    lugares_mencionados = extract_places_from_response(response_text)
+    
+    # Si se encontraron lugares en la respuesta, usarlos directamente para filtrar
+    if lugares_mencionados:
+        places = get_places_filtered(turn.category, None, lugares_mencionados)
+        # Usar el primer lugar mencionado como place_name para la UI
+        place_name = lugares_mencionados[0] if not turn.place_name else turn.place_name
+    else:
+        # Si no hay lugares mencionados, usar el filtrado normal
+        places = get_places_filtered(turn.category, turn.place_name)
+        place_name = turn.place_name
+    
+    return {'response': response_text, 'places': places, 'category': turn.category,
+            'place_name': place_name, 'lugares_mencionados': lugares_mencionados}
+
+def build_stream_payload(turn, response_text, html):
+    """
+    Respuesta final del streaming resuelta en el catálogo en memoria (sin consultar MySQL):
+    tarjetas de los lugares mencionados o, si no hay, de la categoría o el lugar pedidos.
+    Los lugares se buscan en el texto de Gemini, no en el HTML escapado ("Café &amp; Bar").
+    """
+    with metrics.timer('stage_seconds', stage='place_lookup'):
+        index = get_place_index()
+        lugares_mencionados = extract_places_from_response(response_text)
+        places = [place_card(lugar) for lugar in map(index.find, lugares_mencionados) if lugar is not None]
+        if not places:
+            result = get_place_search().search(turn.place_name or '', turn.category)
+            places = [place_card(lugar, categoria) for lugar, categoria in zip(result.records, result.categories)]
+    place_name = turn.place_name or (lugares_mencionados[0] if lugares_mencionados else None)
+    return {'response': html, 'places': places, 'category': turn.category,
+            'place_name': place_name, 'lugares_mencionados': lugares_mencionados}
+
+def _persist_turn(turn, respuesta):
+    """
+    Guardar la vuelta. La conversación se escribe en el hilo de la petición (es local y
+    barata, y la próxima pregunta de la sesión debe verla); la caché, en segundo plano.
+    """
+    add_to_conversation(turn.session_id, turn.user_message, True)
+    add_to_conversation(turn.session_id, respuesta, False)
+    background_tasks.submit('cache_response', cache_response, turn.user_message, respuesta, turn.cache_scope)
+
+def finish_gemini_turn(turn, texto_respuesta, rendered=None):
+    """
+    Última etapa: validar la respuesta de Gemini, guardarla y armar la respuesta final.
+    texto_respuesta es siempre el texto de Gemini tal cual (la validación compara los
+    marcadores [[...]] sin escapar); rendered, el HTML ya enviado durante el streaming.
+    """
+    # Validar que la respuesta use solo datos reales (una pasada sobre el texto)
+    with metrics.timer('stage_seconds', stage='validation'):
+        respuesta_validada = validar_respuesta_real(texto_respuesta, turn.lugares_reales)
+    
+    if turn.stream_mode:
+        with metrics.timer('stage_seconds', stage='formatting'):
+            if rendered is None:
+                rendered = format_response(texto_respuesta)
+            # Se guarda en HTML, igual que lo que vio el usuario
+            respuesta_validada = format_response(respuesta_validada)
+        # El usuario ya vio el texto: las tarjetas salen del catálogo en memoria
+        payload = build_stream_payload(turn, texto_respuesta, rendered)
+        _persist_turn(turn, respuesta_validada)
+        return payload
+    
+    _persist_turn(turn, respuesta_validada)
+    return build_chat_payload(turn, respuesta_validada)
+
+# Máximo de fragmentos de Gemini reenviados por respuesta (límite para respuestas completas sin cortes)
+MAX_STREAM_CHUNKS = 500
+
+def sse_writer():
+    """Escritor SSE con la agrupación configurada (SSE_COALESCE_CHARS y SSE_COALESCE_MS)"""
+    return SSEWriter(config.SSE_COALESCE_CHARS, config.SSE_COALESCE_MS / 1000)
+
+def sse_frame(data):
+    """Evento SSE con un objeto JSON"""
+    return encode_event(data)
+
+def sse_text_frames(text):
+    """Respuesta ya resuelta en una sola escritura: uno o pocos eventos, con sus saltos de línea"""
+    writer = sse_writer()
+    writer.text(text)
+    return writer.flush()
+
+# Tarjetas de lugares que se envían como máximo mientras Gemini escribe
+MAX_STREAM_PLACE_CARDS = 10
+
+def place_card_events(turn, names, index):
+    """
+    Eventos con la tarjeta de cada lugar recién mencionado en el streaming
+    (nombres del buscador incremental, resueltos en el catálogo en memoria)
+    """
+    events = []
+    for name in names:
+        if turn.streamed_places >= MAX_STREAM_PLACE_CARDS:
+            break
+        lugar = index.find(name)
+        if lugar is None:
+            continue
+        if not turn.streamed_places:
+            metrics.observe('time_to_first_card_seconds', time.perf_counter() - turn.started)
+        turn.streamed_places += 1
+        metrics.incr('place_cards_streamed_total')
+        events.append({'chunk': '', 'place': place_card(lugar), 'done': False})
+    return events
+
+def done_event(payload):
+    """Evento final con las tarjetas de lugares"""
+    done = {'chunk': '', 'done': True}
+    done.update((k, v) for k, v in payload.items() if k != 'response')
+    return done
+
+class StreamSession:
+    """
+    Una respuesta de Gemini en streaming, de los fragmentos de texto a los eventos SSE.
+    Flask (generador síncrono) y ASGI (generador asíncrono) solo recorren los fragmentos:
+
+        session = StreamSession(turn)
+        for text in fragmentos: yield session.feed(text)
+        yield session.close()   # o session.error(e) si falla
+    """
+
+    __slots__ = ('turn', 'started', 'chunks', 'raw', 'renderer', 'rendered', 'render_time',
+                 'mentions', 'index', 'writer')
+
+    def __init__(self, turn):
+        self.turn = turn
+        self.started = time.perf_counter()
+        self.chunks = 0
+        self.raw = []  # Texto de Gemini sin renderizar: es el que se valida
+        # Cada fragmento sale ya como HTML; no queda formato pendiente al final
+        self.renderer = MarkdownStream()
+        self.rendered = []
+        self.render_time = 0.0
+        # Tarjetas de lugares en cuanto se completa su nombre, sin esperar al final
+        self.mentions = get_place_matcher().stream()
+        self.index = get_place_index()
+        # Texto y tarjetas de cada fragmento salen en una sola escritura
+        self.writer = sse_writer()
+
+    def _write(self, html, names):
+        self.rendered.append(html)
+        self.writer.text(html)
+        for event in place_card_events(self.turn, names, self.index):
+            self.writer.event(event)
+
+    def feed(self, text):
+        """Eventos SSE listos para enviar después de este fragmento ('' si quedan retenidos)"""
+        if self.chunks == 0:
+            metrics.observe('stage_seconds', time.perf_counter() - self.started, stage='gemini_first_token')
+        if self.chunks >= MAX_STREAM_CHUNKS:
+            return ''
+        self.chunks += 1
+        self.raw.append(text)
+        t0 = time.perf_counter()
+        html = self.renderer.feed(text)
+        self.render_time += time.perf_counter() - t0
+        self._write(html, self.mentions.feed(text))
+        return self.writer.drain()
+
+    def close(self):
+        """Final del texto, tarjetas pendientes y evento de cierre en una sola escritura"""
+        self._write(self.renderer.close(), self.mentions.close())
+        metrics.observe('stage_seconds', time.perf_counter() - self.started, stage='gemini_total')
+        metrics.observe('stage_seconds', self.render_time, stage='formatting')
         
-        if stream_mode:
+        self.writer.event(done_event(finish_gemini_turn(self.turn, ''.join(self.raw), ''.join(self.rendered))))
+        frames = self.writer.flush()
+        record_chat_latency(self.turn)
+        return frames
+
+    def error(self, e):
+        """Mensaje de error y cierre del stream"""
+        record_chat_latency(self.turn, 'error')
+        return (sse_frame({'chunk': gemini_error_message(e, True), 'done': False})
+                + sse_frame({'chunk': '', 'done': True}))
+
+def gemini_error_message(e, stream_mode):
+    """Mensaje para el usuario cuando falla la llamada a Gemini"""
+    detalle = str(e).lower()
+    if stream_mode:
+        if "quota" in detalle or "429" in detalle:
+            return "⚠️ Límite de consultas alcanzado. Intenta con preguntas similares a las anteriores o vuelve mañana."
+        if "timeout" in detalle or "deadline" in detalle:
+            return "Error: La respuesta está tomando demasiado tiempo. Intenta con una pregunta más específica."
+        return f"Error: {str(e)}"
+    if "quota" in detalle or "429" in detalle:
+        return '⚠️ Límite de consultas alcanzado. Intenta con preguntas similares a las anteriores.'
+    if "timeout" in detalle or "deadline" in str(e):
+        return '⏰ La respuesta está tomando demasiado tiempo. Intenta con una pregunta más específica.'
+    if "api" in detalle:
+        return '🔧 Problema con la conexión a la API de Gemini. Por favor, intenta nuevamente en unos momentos.'
+    return '❌ Error al procesar tu mensaje. Por favor, intenta nuevamente o reformula tu pregunta.'
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    turn = prepare_chat_turn(request.json, get_user_id(), get_session_id())
+    
+    if turn.kind == 'limite':
+        record_chat_latency(turn)
+        return jsonify({'response': turn.response, 'places': []})
+    
+    if turn.kind != 'gemini':
+        # Respuesta resuelta sin Gemini (enrutador local, caché o sin datos)
+        mention_places = turn.kind != 'sin_datos'
+        if turn.stream_mode:
+            def generate_ready():
+                yield sse_text_frames(turn.response)
+                yield sse_frame(done_event(build_chat_payload(turn, turn.response, mention_places)))
+                record_chat_latency(turn)
+            return Response(generate_ready(), mimetype='text/event-stream')
+        payload = build_chat_payload(turn, turn.response, mention_places)
+        record_chat_latency(turn)
+        return jsonify(payload)
+    
+    try:
+        if turn.stream_mode:
             # Modo streaming con mejor manejo de tiempos
             def generate():
+                session = StreamSession(turn)
                 try:
-                    response_stream = model.generate_content(prompt, stream=True)
-                    chunk_count = 0
-                    max_chunks = 500  # Máximo límite para respuestas completas sin cortes
-                    full_response = ""
-                    
-                    for chunk in response_stream:
-                        if chunk.text and chunk_count < max_chunks:
-                            # Acumular el texto para formatear al final
-                            full_response += chunk.text
-                            
-                            # Para el streaming, enviar el texto con saltos de línea reales
-                            escaped_text = chunk.text.replace('\\', '\\\\').replace('"', '\\"').replace('\r', '\\r').replace('\t', '\\t')
-                            # No escapar \n, dejar que los saltos de línea lleguen como caracteres reales
-                            json_data = json.dumps({'chunk': escaped_text, 'done': False})
-                            yield f"data: {json_data}\n\n"
-                            
-                            chunk_count += 1
-                    
-                    # Guardar respuesta completa en caché y en memoria conversacional
-                    formatted_response = format_response(full_response)
-                    
-                    # Validar que la respuesta use solo datos reales
-                    respuesta_validada = validar_respuesta_real(formatted_response, lugares_reales)
-                    
-                    # Extraer lugares mencionados en la respuesta
-                    lugares_mencionados = extract_places_from_response(respuesta_validada)
-                    
-                    cache_response(user_message, respuesta_validada)
-                    add_to_conversation(user_id, user_message, True)
-                    add_to_conversation(user_id, respuesta_validada, False)
-                    
-                    # Si se encontraron lugares en la respuesta, usarlos directamente para filtrar
-                    if lugares_mencionados:
-                        places = get_places_filtered(category, None, lugares_mencionados)
-                        # Usar el primer lugar mencionado como place_name para la UI
-                        place_name = lugares_mencionados[0] if not place_name else place_name
-                    else:
-                        # Si no hay lugares mencionados, usar el filtrado normal
-                        places = get_places_filtered(category, place_name)
-                        
-                    yield f"data: {json.dumps({'chunk': '', 'done': True, 'places': places, 'category': category, 'place_name': place_name, 'lugares_mencionados': lugares_mencionados})}\n\n"
+                    # Si otra petición idéntica ya está generando, recibir sus mismos fragmentos
+                    for text in gemini_flights.stream(turn.flight_key, lambda: generate_gemini_stream(turn.prompt, turn.user_id),
+                                                      retry_on=LEADER_ERRORS):
+                        frames = session.feed(text)
+                        if frames:
+                            yield frames
+                    yield session.close()
                 except Exception as e:
-                    error_msg = f"Error: {str(e)}"
-                    if "quota" in str(e).lower() or "429" in str(e):
-                        error_msg = "⚠️ Límite de consultas alcanzado. Intenta con preguntas similares a las anteriores o vuelve mañana."
-                    elif "timeout" in str(e).lower() or "deadline" in str(e).lower():
-                        error_msg = "Error: La respuesta está tomando demasiado tiempo. Intenta con una pregunta más específica."
-                    yield f"data: {json.dumps({'chunk': error_msg, 'done': False})}\n\n"
-                    yield f"data: {json.dumps({'chunk': '', 'done': True})}\n\n"
+                    yield session.error(e)
             
             return Response(generate(), mimetype='text/event-stream')
         else:
-            # Modo normal (no streaming) con timeout implícito
-            response = model.generate_content(prompt)
-            
-            # Validar que la respuesta use solo datos reales
-            respuesta_validada = validar_respuesta_real(response.text, lugares_reales)
-            
-            # Extraer lugares mencionados en la respuesta
-            lugares_mencionados = extract_places_from_response(respuesta_validada)
-            
-            cache_response(user_message, respuesta_validada)
-            
-            # Guardar en memoria conversacional
-            add_to_conversation(user_id, user_message, True)
-            add_to_conversation(user_id, respuesta_validada, False)
-            
-            # Si se encontraron lugares en la respuesta, usarlos directamente para filtrar
-            if lugares_mencionados:
-                places = get_places_filtered(category, None, lugares_mencionados)
-                # Usar el primer lugar mencionado como place_name para la UI
-                place_name = lugares_mencionados[0] if not place_name else place_name
-            else:
-                # Si no hay lugares mencionados, usar el filtrado normal
-                places = get_places_filtered(category, place_name)
-                
-            return jsonify({'response': respuesta_validada, 'places': places, 'category': category, 'place_name': place_name, 'lugares_mencionados': lugares_mencionados})
+            # Modo normal (no streaming) con timeout implícito; las preguntas
+            # idénticas concurrentes esperan el resultado de una sola llamada
+            with metrics.timer('stage_seconds', stage='gemini_total'):
+                texto_respuesta, _ = gemini_flights.do(turn.flight_key, lambda: generate_gemini_text(turn.prompt, turn.user_id),
+                                                       retry_on=LEADER_ERRORS)
+            payload = finish_gemini_turn(turn, texto_respuesta)
+            record_chat_latency(turn)
+            return jsonify(payload)
     except Exception as e:
-        error_msg = f'Error al procesar la consulta: {str(e)}'
-        if "quota" in str(e).lower() or "429" in str(e):
-            error_msg = '⚠️ Límite de consultas alcanzado. Intenta con preguntas similares a las anteriores.'
-        elif "timeout" in str(e).lower() or "deadline" in str(e):
-            error_msg = '⏰ La respuesta está tomando demasiado tiempo. Intenta con una pregunta más específica.'
-        elif "api" in str(e).lower():
-            error_msg = '🔧 Problema con la conexión a la API de Gemini. Por favor, intenta nuevamente en unos momentos.'
-        else:
-            error_msg = '❌ Error al procesar tu mensaje. Por favor, intenta nuevamente o reformula tu pregunta.'
-        places = []
-        return jsonify({'response': error_msg, 'places': places})
+        record_chat_latency(turn, 'error')
+        return jsonify({'response': gemini_error_message(e, False), 'places': []})
 
 def get_places_filtered(category=None, place_name=None, lugares_mencionados=None):
     """Obtener lugares filtrados por categoría, nombre o lista de lugares mencionados"""
@@ -1014,75 +1147,58 @@ def get_places_filtered(category=None, place_name=None, lugares_mencionados=None
         
         for lugar in lugares_mencionados:
             # Buscar coincidencias exactas primero (prioridad alta)
-            conditions.append("(nombre = %s OR nombre LIKE %s OR nombre LIKE %s OR nombre LIKE %s)")
+            conditions.append("(l.nombre = %s OR l.nombre LIKE %s OR l.nombre LIKE %s OR l.nombre LIKE %s)")
             params.extend([lugar, f"{lugar}%", f"% {lugar}", f"%{lugar}%"])
         
         # Unir condiciones con OR
         where_clause = " OR ".join(conditions)
-        query = f"SELECT nombre, descripcion, latitud, longitud, categoria FROM locaciones WHERE {where_clause}"
         
         # Agregar filtro de categoría si existe
         if category:
-            query += " AND categoria LIKE %s"
+            where_clause += " AND l.categoria LIKE %s"
             params.append(f"%{category}%")
             
         # Ordenar por relevancia (coincidencia exacta primero)
-        query += " ORDER BY CASE WHEN nombre IN ("
-        query += ", ".join(["%s"] * len(lugares_mencionados))
-        query += ") THEN 0 ELSE 1 END, nombre"
+        order_by = "CASE WHEN l.nombre IN ("
+        order_by += ", ".join(["%s"] * len(lugares_mencionados))
+        order_by += ") THEN 0 ELSE 1 END, l.nombre"
         params.extend(lugares_mencionados)
-        
-        cursor.execute(query, params)
     else:
         # Construir la consulta base (comportamiento original mejorado)
-        base_query = "SELECT nombre, descripcion, latitud, longitud, categoria FROM locaciones WHERE 1=1"
+        conditions = []
         params = []
+        order_by = None
         
         # Agregar filtro de categoría si existe
         if category:
-            base_query += " AND categoria LIKE %s"
+            conditions.append("l.categoria LIKE %s")
             params.append(f"%{category}%")
         
         # Agregar filtro de nombre si existe con búsqueda mejorada
         if place_name:
-            base_query += " AND (nombre = %s OR nombre LIKE %s OR nombre LIKE %s OR nombre LIKE %s)"
+            conditions.append("(l.nombre = %s OR l.nombre LIKE %s OR l.nombre LIKE %s OR l.nombre LIKE %s)")
             params.extend([place_name, f"{place_name}%", f"% {place_name}", f"%{place_name}%"])
             # Ordenar por relevancia (coincidencia exacta primero)
-            base_query += " ORDER BY CASE WHEN nombre = %s THEN 0 ELSE 1 END, nombre"
+            order_by = "CASE WHEN l.nombre = %s THEN 0 ELSE 1 END, l.nombre"
             params.append(place_name)
         
-        # Ejecutar la consulta
-        if params:
-            cursor.execute(base_query, params)
-        else:
-            cursor.execute(base_query.replace("WHERE 1=1", ""))
+        where_clause = " AND ".join(conditions) if conditions else None
     
-    lugares = cursor.fetchall()
-    places = []
+    # Lugares e imagen principal en una sola consulta (sin una consulta extra por lugar)
+    lugares = fetch_places(cursor, where=where_clause, params=params, order_by=order_by)
+    conn.close()
     
+    places = []
     for l in lugares:
-        nombre = l[0]
-        # Obtener imagen del lugar
-        cursor.execute("""
-            SELECT url_imagen 
-            FROM locacion_imagenes 
-            WHERE locacion_id = (SELECT id FROM locaciones WHERE nombre = %s LIMIT 1) 
-            ORDER BY id 
-            LIMIT 1
-        """, (nombre,))
-        imagen = cursor.fetchone()
-        imagen_url = imagen[0] if imagen else None
-        
         place = {
-            'nombre': nombre,
-            'descripcion': l[1],
-            'categoria': l[4],
-            'imagen_url': imagen_url,
-            'ubicacion': f"{l[2]}, {l[3]}" if l[2] and l[3] else None
+            'nombre': l['nombre'],
+            'descripcion': l['descripcion'],
+            'categoria': l['categoria'],
+            'imagen_url': l['imagen_url'],
+            'ubicacion': format_ubicacion(l['latitud'], l['longitud'])
         }
         places.append(place)
     
-    conn.close()
     return places
 
 def get_places_by_category(category):
@@ -1092,6 +1208,10 @@ def get_places_by_category(category):
 def validar_respuesta_real(respuesta, lugares_reales):
     """Validar que la respuesta use solo lugares reales de la base de datos.
     También verifica que cualquier nombre entre [[...]] exista en la BD y limpia los marcadores antes de responder.
+    
+    Args:
+        respuesta: Texto generado por Gemini
+        lugares_reales: PlaceIndex con los lugares incluidos en el contexto
     """
     if not lugares_reales:
         return (
@@ -1099,128 +1219,48 @@ def validar_respuesta_real(respuesta, lugares_reales):
             'Intenta más tarde o pregunta nuevamente cuando el catálogo esté disponible.'
         )
 
-    # Normalizar utilidades
-    def _normalize(txt: str) -> str:
-        if not isinstance(txt, str):
-            txt = str(txt)
-        txt = unicodedata.normalize('NFD', txt)
-        txt = ''.join(c for c in txt if unicodedata.category(c) != 'Mn')  # quitar acentos
-        return txt.lower().strip()
-
-    lugares_norm = {_normalize(l) for l in lugares_reales}
-
-    # Convertir respuesta a minúsculas para algunas detecciones
-    respuesta_lower = respuesta.lower()
-
-    problemas_detectados = []
-
-    # Buscar menciones de problemas técnicos (ampliado)
-    technical_phrases = [
-        'problemas de conexión', 'sin conexión', 'base de datos completa', 'problemas técnicos',
-        'base de datos está fallando', 'base de datos fallando', 'mi base de datos está fallando', 'mi base de datos fallando',
-        'no tengo acceso a la base de datos', 'no puedo acceder a la base de datos'
-    ]
-    if any(frase in respuesta_lower for frase in technical_phrases):
-        problemas_detectados.append('problemas_tecnicos')
-
-    # Detectar respuestas demasiado genéricas
-    generic_markers = ['ideas generales', 'recomendaciones generales', 'de forma general', 'en general puedo']
-    if any(g in respuesta_lower for g in generic_markers):
-        problemas_detectados.append('generico_sin_datos')
-
-    # Validación estricta de marcadores [[...]]
-    marcados = re.findall(r"\[\[(.+?)\]\]", respuesta)
-    for m in marcados:
-        if _normalize(m) not in lugares_norm:
-            problemas_detectados.append(f'lugar_inventado_o_fuera_de_contexto: {m}')
-
-    # Heurística mínima para lugares genéricos comunes que no estén en BD (mantener lógica previa)
-    lugares_comunes = ['laguna de paca', 'parque nacional de huayllay', 'distrito de chupaca', 'concepción']
-    for lugar_generico in lugares_comunes:
-        if lugar_generico in respuesta_lower:
-            if all(lugar_generico not in _normalize(lr) for lr in lugares_reales):
-                problemas_detectados.append(f'lugar_inventado: {lugar_generico}')
-
+    # Una sola pasada: frases técnicas y genéricas, lugares comunes y marcadores [[...]]
+    # (ver src/response_validator.py); el texto ya viene sin marcadores
+    resultado = get_response_validator().validate(respuesta, lugares_reales)
+    problemas_detectados = resultado.problems
+    
     if problemas_detectados:
         print(f"ALERTA: Respuesta contiene problemas: {problemas_detectados}")
+        for problema in problemas_detectados:
+            metrics.incr('validation_problems_total', problem=problema.split(':', 1)[0])
         # Si hay pocos lugares en la base de datos, ser más permisivo
         if len(lugares_reales) < 3:
             print("INFO: Pocos lugares en BD, usando respuesta original con marcadores limpios")
-            # Limpiar marcadores y devolver la respuesta original
-            respuesta_limpia = re.sub(r"\[\[(.*?)\]\]", r"\1", respuesta)
-            return respuesta_limpia
+            return resultado.text
         else:
             return generar_respuesta_solo_datos_reales(lugares_reales, respuesta)
-
-    # Si pasa validaciones, limpiar los marcadores [[...]] antes de devolver
-    respuesta_limpia = re.sub(r"\[\[(.*?)\]\]", r"\1", respuesta)
-    return respuesta_limpia
+    
+    return resultado.text
 
 def generar_respuesta_solo_datos_reales(lugares_reales, respuesta_original):
     """Generar respuesta usando solo datos reales cuando se detecta información inventada"""
     
     # Crear una respuesta completamente nueva basada solo en datos reales
     respuesta_real = "¡Perfecto! Te puedo recomendar estos lugares específicos que tenemos registrados en Huancayo:\n\n"
-    
-    # Obtener el contexto completo con detalles
-    db_context = get_database_context()
-    
-    # Extraer información de lugares de forma más robusta
-    lugares_info = {}
-    
-    # Parsear el contexto línea por línea
-    for linea in db_context.split('\n'):
-        linea = linea.strip()
-        if 'LUGAR:' in linea:
-            # Extraer nombre del lugar
-            partes = linea.split('LUGAR:')
-            if len(partes) > 1:
-                nombre_lugar = partes[1].split('|')[0].strip()
-                if nombre_lugar and nombre_lugar not in lugares_info:
-                    lugares_info[nombre_lugar] = {'nombre': nombre_lugar, 'descripcion': '', 'ubicacion': ''}
-        
-        # Buscar información adicional del lugar actual
-        if '|' in linea:
-            partes = [p.strip() for p in linea.split('|')]
-            for parte in partes:
-                if 'DESCRIPCIÓN:' in parte:
-                    # Encontrar a qué lugar pertenece esta descripción
-                    for nombre in lugares_info:
-                        if nombre in linea or any(n in linea for n in lugares_info.keys()):
-                            lugares_info[nombre]['descripcion'] = parte.replace('DESCRIPCIÓN:', '').strip()
-                            break
-                elif 'UBICACIÓN:' in parte:
-                    for nombre in lugares_info:
-                        if nombre in linea or any(n in linea for n in lugares_info.keys()):
-                            lugares_info[nombre]['ubicacion'] = parte.replace('UBICACIÓN:', '').strip()
-                            break
-    
-    # Si no pudimos extraer información detallada, usar solo los nombres
-    if not lugares_info:
-        respuesta_real = "¡Excelente! Tenemos estos lugares registrados en Huancayo:\n\n"
-        for lugar in lugares_reales[:6]:  # Mostrar hasta 6 lugares
-            respuesta_real += f"• **{lugar}**\n"
-        respuesta_real += f"\nTenemos {len(lugares_reales)} lugares registrados en total."
-        respuesta_real += "\n\n¿Sobre cuál te gustaría saber más información?"
-        return respuesta_real
+    total_lugares = len(get_place_index())
     
     # Mostrar lugares con información disponible
-    lugares_con_info = [info for info in lugares_info.values() if info['descripcion'] or info['ubicacion']]
+    lugares_con_info = [lugar for lugar in lugares_reales if lugar.descripcion or lugar.ubicacion]
     
     if lugares_con_info:
         for lugar in lugares_con_info[:4]:  # Mostrar 4 lugares con detalles
-            respuesta_real += f"• **{lugar['nombre']}**"
-            if lugar['descripcion']:
-                respuesta_real += f" - {lugar['descripcion']}"
-            if lugar['ubicacion']:
-                respuesta_real += f"\n  📍 {lugar['ubicacion']}"
+            respuesta_real += f"• **{lugar.nombre}**"
+            if lugar.descripcion:
+                respuesta_real += f" - {lugar.descripcion}"
+            if lugar.ubicacion:
+                respuesta_real += f"\n  📍 {lugar.ubicacion}"
             respuesta_real += "\n\n"
     else:
         # Mostrar solo nombres si no hay información adicional
-        for nombre in list(lugares_info.keys())[:6]:
-            respuesta_real += f"• **{nombre}**\n"
+        for lugar in lugares_reales.records[:6]:
+            respuesta_real += f"• **{lugar.nombre}**\n"
     
-    respuesta_real += f"Tenemos {len(lugares_reales)} lugares registrados en total."
+    respuesta_real += f"Tenemos {total_lugares} lugares registrados en total."
     respuesta_real += "\n\n¿Sobre cuál te gustaría saber más información específica?"
     
     return respuesta_real
@@ -1232,18 +1272,17 @@ def dashboard_stats():
         # Calcular tiempo de actividad
         uptime = datetime.now() - system_info['start_time'] if system_info['start_time'] else timedelta(0)
         
-        # Calcular tiempo promedio de respuesta
-        if system_info['response_times']:
-            avg_response_time = sum(system_info['response_times']) / len(system_info['response_times'])
-            avg_response_time = round(avg_response_time, 2)
-        else:
-            avg_response_time = 0
+        # Tiempo promedio de respuesta de /api/chat (todas las clases de respuesta)
+        chat_latency = metrics.merged('chat_seconds')
+        avg_response_time = round(chat_latency.total / chat_latency.count, 2) if chat_latency.count else 0
         
-        # Obtener estadísticas de la base de datos
-        db_stats = stats()
+        # Estadísticas de la base de datos (agregados del catálogo, sin consultar MySQL)
+        aggregates = get_catalog_aggregates()
         
         # Obtener tamaño del caché
         cache_size = len(response_cache)
+        cache_stats = response_cache.stats()
+        conversation_stats = conversation_store.stats()
         
         return jsonify({
             'system': {
@@ -1251,15 +1290,37 @@ def dashboard_stats():
                 'total_requests': system_info['total_requests'],
                 'cached_responses': system_info['cached_responses_count'],
                 'cache_size': cache_size,
+                'cache_bytes': cache_stats['bytes'],
+                'cache_hit_rate': cache_stats['hit_rate'],
                 'avg_response_time': avg_response_time,
-                'daily_requests': daily_requests,
-                'max_daily_requests': MAX_DAILY_REQUESTS
+                'daily_requests': get_daily_requests(),
+                'max_daily_requests': quota.daily_limit
             },
+            'latency': dict(metrics.snapshot(), chat=chat_latency.summary()),
+            'quota': quota.snapshot(get_user_id()),
+            'response_cache': cache_stats,
+            'semantic_cache': semantic_cache.stats(),
+            'conversations': conversation_stats,
+            'prompt_size': {
+                'prompts': system_info['prompts'],
+                'avg_prompt_tokens': round(system_info['prompt_tokens'] / system_info['prompts'], 1) if system_info['prompts'] else 0,
+                'conversation': conversation_stats['prompt_context'],
+            },
+            'db_pool': db_pool.metrics(),
+            'state_backend': shared_state.describe(),
+            'gemini_coalescing': gemini_flights.stats(),
+            'intent_router': intent_router.stats(),
+            'background_tasks': background_tasks.stats(),
+            'gemini_coalescing_async': async_gemini_flights.stats() if async_gemini_flights else None,
             'database': {
-                'status': db_stats.get('estado', 'error'),
-                'total_places': db_stats.get('total_lugares', 0),
-                'categories': db_stats.get('categorias', []),
-                'last_update': db_stats.get('last_update', None)
+                'status': aggregates.status,
+                'total_places': aggregates.total_lugares,
+                'total_images': aggregates.total_imagenes,
+                'places_with_images': aggregates.lugares_con_imagen,
+                'categories': aggregates.stats_payload['categorias'],
+                'places_by_category': dict(aggregates.por_categoria),
+                'last_update': aggregates.stats_payload['last_update'],
+                'catalog_version': aggregates.version
             }
         })
     except Exception as e:
@@ -1271,11 +1332,11 @@ def dashboard_activity():
     try:
         # Obtener las últimas respuestas del caché (más recientes primero)
         recent_activity = []
-        for key in list(response_cache.keys())[-10:]:  # Últimas 10 respuestas
+        for key, response, created_at in response_cache.items(limit=10):  # Últimas 10 respuestas
             recent_activity.append({
                 'query': key,
-                'response': response_cache[key][:100] + '...' if len(response_cache[key]) > 100 else response_cache[key],
-                'timestamp': datetime.now().isoformat()
+                'response': response[:100] + '...' if len(response) > 100 else response,
+                'timestamp': datetime.fromtimestamp(created_at).isoformat()
             })
         
         return jsonify({'recent_activity': recent_activity})
@@ -1300,220 +1361,136 @@ def test_connection():
 def clear_cache():
     """Limpiar el caché de respuestas y conversación del usuario"""
     try:
-        user_id = get_user_id()
-        if user_id in conversation_memory:
-            del conversation_memory[user_id]
-        global response_cache
+        conversation_store.delete(get_session_id())
         response_cache.clear()
+        shared_state.clear('resp:')
+        semantic_cache.clear()
         system_info['cached_responses_count'] = 0
         return jsonify({'success': True, 'message': 'Caché y conversación limpiados exitosamente'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
 
+# Tamaño máximo de página de /api/places
+MAX_PLACES_PER_PAGE = 100
+
+# Campos de cada lugar en /api/places (seleccionables con fields=)
+PLACE_FIELDS = ('nombre', 'descripcion', 'categoria', 'imagen_url', 'ubicacion')
+
 @app.route('/api/places')
 def get_places():
-    """Obtener lugares filtrados por categoría y búsqueda"""
+    """
+    Obtener lugares filtrados por categoría y búsqueda (desde el índice en memoria, sin MySQL).
+    
+    Parámetros:
+        category, search: Filtros (búsqueda sin tildes y por prefijo)
+        per_page: Tamaño de página (sin él se devuelven todos los resultados)
+        cursor: Valor next_cursor de la página anterior
+        fields: Campos a incluir separados por comas (por defecto todos)
+    
+    Las respuestas llevan un ETag derivado de la versión del catálogo y de los parámetros.
+    """
     try:
         category = request.args.get('category', '')
         search = request.args.get('search', '')
+        per_page = request.args.get('per_page', type=int)
+        if per_page is not None:
+            per_page = min(max(per_page, 1), MAX_PLACES_PER_PAGE)
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+        unknown = [f for f in fields if f not in PLACE_FIELDS]
+        if unknown:
+            return jsonify({'places': [], 'error': f"Campos desconocidos: {', '.join(unknown)}"}), 400
+        fields = tuple(fields) or PLACE_FIELDS
         
-        conn = get_db_connection()
-        if not conn:
+        snapshot = catalog.snapshot()
+        if not snapshot.available:
             return jsonify({'places': [], 'error': 'No hay conexión a la base de datos'})
         
-        cursor = conn.cursor()
-        
-        # Primero obtener la estructura real de la tabla
-        cursor.execute("DESCRIBE locaciones")
-        columnas_info = cursor.fetchall()
-        nombres_columnas = [col[0] for col in columnas_info]
-        
-        # Construir la consulta base con las columnas que existen
-        select_columns = []
-        if 'nombre' in nombres_columnas:
-            select_columns.append('nombre')
-        if 'descripcion' in nombres_columnas:
-            select_columns.append('descripcion')
-        if 'latitud' in nombres_columnas:
-            select_columns.append('latitud')
-        if 'longitud' in nombres_columnas:
-            select_columns.append('longitud')
-        # Incluir columna categoria si existe
-        if 'categoria' in nombres_columnas:
-            select_columns.append('categoria')
-        
-        if not select_columns:
-            return jsonify({'places': [], 'error': 'No se encontraron columnas válidas en la tabla'})
-        
-        query = f"SELECT {', '.join(select_columns)} FROM locaciones WHERE 1=1"
-        params = []
-        used_sql_category = False
-        
-        # Normalización y mapeo de categoría desde el frontend para usarla en SQL si existe columna 'categoria'
-        def _norm_cat(s):
-            if not s:
-                return ''
-            s = str(s).strip().lower().replace('-', ' ')
-            try:
-                import unicodedata
-                s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-            except Exception:
-                pass
-            return s
-        
-        category_candidates = []
-        if category:
-            objetivo = _norm_cat(category)
-            mapping = {
-                'parques': ['parque'],
-                'parque': ['parque'],
-                'plazas': ['plaza'],
-                'plaza': ['plaza'],
-                'miradores': ['mirador'],
-                'mirador': ['mirador'],
-                'centros comerciales': ['centro comercial'],
-                'centro comercial': ['centro comercial'],
-                'centros-comerciales': ['centro comercial'],
-                'patrimonios': ['patrimonio'],
-                'patrimonio': ['patrimonio'],
-                'estadios': ['estadio'],
-                'estadio': ['estadio'],
-                'naturaleza': ['naturaleza']
-            }
-            category_candidates = mapping.get(objetivo, [objetivo])
-        
-        # Filtrar por categoría usando la columna real si existe, con múltiples candidatos normalizados
-        if category_candidates and 'categoria' in nombres_columnas:
-            conditions = []
-            for cand in category_candidates:
-                conditions.append("LOWER(categoria) LIKE LOWER(%s)")
-                params.append(f"%{cand}%")
-            query += " AND (" + " OR ".join(conditions) + ")"
-            used_sql_category = True
+        # El cursor solo es válido para la misma consulta sobre la misma versión del catálogo
+        query_key = make_etag(category, search, per_page).strip('"')
+        offset = 0
+        cursor = request.args.get('cursor')
+        if cursor:
+            data = decode_cursor(cursor)
+            if (not data or data.get('v') != snapshot.version or data.get('q') != query_key
+                    or not isinstance(data.get('o'), int) or data['o'] < 0):
+                return jsonify({'places': [], 'error': 'Cursor inválido o de una versión anterior del catálogo'}), 400
+            offset = data['o']
         
-        # Filtrar por búsqueda si se especifica (solo por nombre y descripción)
-        if search:
-            search_conditions = []
-            if 'nombre' in nombres_columnas:
-                search_conditions.append("nombre LIKE %s")
-                params.append(f"%{search}%")
-            if 'descripcion' in nombres_columnas:
-                search_conditions.append("descripcion LIKE %s")
-                params.append(f"%{search}%")
+        # ETag, cursor y resultados salen de la misma versión del catálogo
+        def build_payload():
+            result = get_place_search(snapshot).search(search, category, offset=offset, limit=per_page)
+            places = []
+            for lugar, categoria in zip(result.records, result.categories):
+                place_data = place_card(lugar, categoria)
+                places.append({f: place_data[f] for f in fields})
             
-            if search_conditions:
-                query += " AND (" + " OR ".join(search_conditions) + ")"
+            payload = {'places': places, 'total': result.total}
+            if per_page:
+                next_offset = offset + len(places)
+                has_more = next_offset < result.total
+                payload.update({
+                    'per_page': per_page,
+                    'has_more': has_more,
+                    'next_cursor': encode_cursor({'v': snapshot.version, 'q': query_key, 'o': next_offset}) if has_more else None
+                })
+            return payload
         
-        query += " ORDER BY nombre"
+        etag = make_etag(snapshot.version, 'places', query_key, offset, ','.join(fields))
+        return cacheable_json(etag, build_payload)
         
-        cursor.execute(query, params)
-        lugares = cursor.fetchall()
+    except Exception as e:
+        print(f"Error en get_places: {e}")
+        return jsonify({'places': [], 'error': str(e)})
+
+# Máximo de vecinos por consulta de /api/places/nearby
+MAX_NEARBY_RESULTS = 50
+
+@app.route('/api/places/nearby')
+def get_places_nearby():
+    """
+    Lugares más cercanos a un punto (desde el índice espacial en memoria, sin MySQL).
+    
+    Parámetros:
+        lat, lon: Punto de referencia en grados (obligatorios)
+        radius: Radio máximo en metros (opcional)
+        k: Cantidad de lugares (por defecto 10, máximo MAX_NEARBY_RESULTS)
+    """
+    try:
+        try:
+            lat = float(request.args['lat'])
+            lon = float(request.args['lon'])
+            radius = request.args.get('radius')
+            radius = float(radius) if radius else None
+            k = int(request.args.get('k', 10))
+        except (KeyError, ValueError):
+            return jsonify({'places': [], 'error': 'Parámetros inválidos: lat y lon son obligatorios y numéricos'}), 400
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({'places': [], 'error': 'Coordenadas fuera de rango'}), 400
+        if radius is not None and not (math.isfinite(radius) and radius > 0):
+            return jsonify({'places': [], 'error': 'El radio debe ser un número positivo de metros'}), 400
+        k = min(max(k, 1), MAX_NEARBY_RESULTS)
         
-        # Helper de normalización local para comparar categorías sin tildes y en minúsculas
-        def _norm(s):
-            if not s:
-                return ''
-            s = str(s).strip().lower()
-            try:
-                import unicodedata
-                s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-            except Exception:
-                pass
-            return s
-
-        # Obtener imágenes para cada lugar y usar la categoría de la BD si existe
-        places_with_images = []
-        for lugar in lugares:
-            # Construir diccionario con datos del lugar
-            lugar_data = {}
-            for i, columna in enumerate(select_columns):
-                if i < len(lugar):
-                    lugar_data[columna] = lugar[i]
-            
-            nombre = lugar_data.get('nombre', '')
-            descripcion = lugar_data.get('descripcion', '')
-            latitud = lugar_data.get('latitud')
-            longitud = lugar_data.get('longitud')
-            
-            # Usar categoría de la base de datos si está disponible; si no, inferir por nombre
-            categoria = lugar_data.get('categoria')
-            if not categoria:
-                categoria = 'Sin categoría'
-                if nombre:
-                    nombre_lower = _norm(nombre)
-                    if any(palabra in nombre_lower for palabra in ['parque', 'bosque', 'montana', 'laguna', 'cascada', 'rio', 'naturaleza']):
-                        categoria = 'Naturaleza'
-                    elif any(palabra in nombre_lower for palabra in ['plaza', 'plazuela']):
-                        categoria = 'Plazas'
-                    elif any(palabra in nombre_lower for palabra in ['mirador', 'vista', 'panoramica']):
-                        categoria = 'Miradores'
-                    elif any(palabra in nombre_lower for palabra in ['iglesia', 'templo', 'cerro']):
-                        categoria = 'Religioso'
-                    elif any(palabra in nombre_lower for palabra in ['mercado', 'feria']):
-                        categoria = 'Mercados'
-                    elif any(palabra in nombre_lower for palabra in ['museo', 'cultural']):
-                        categoria = 'Museos'
-                    elif any(palabra in nombre_lower for palabra in ['restaurante', 'comida', 'picanteria']):
-                        categoria = 'Restaurantes'
-                    elif any(palabra in nombre_lower for palabra in ['hotel', 'hostal', 'alojamiento']):
-                        categoria = 'Hoteles'
-            
-            # Filtrar por categoría si aún no se filtró en SQL
-            if category and category != 'todos' and not used_sql_category:
-                # Mapear valores del frontend a equivalentes de la BD
-                category_mapping = {
-                    'parques': ['parque', 'naturaleza'],
-                    'plazas': ['plaza', 'plazas'],
-                    'miradores': ['mirador', 'miradores'],
-                    'museos': ['museo', 'museos'],
-                    'mercados': ['mercado', 'mercados'],
-                    'restaurantes': ['restaurante', 'restaurantes', 'comida'],
-                    'hoteles': ['hotel', 'hoteles', 'alojamiento'],
-                    'patrimonio': ['patrimonio'],
-                    'centro-comercial': ['centro comercial', 'centros comerciales'],
-                    'centros-comerciales': ['centro comercial', 'centros comerciales'],
-                    'estadios': ['estadio', 'estadios']
-                }
-                objetivo = _norm(category)
-                candidatos = category_mapping.get(objetivo, [objetivo])
-                categoria_norm = _norm(categoria)
-                if not any(c in categoria_norm for c in candidatos):
-                    continue
-            
-            # Buscar imagen principal del lugar
-            imagen_url = None
-            if nombre:
-                cursor.execute("""
-                    SELECT url_imagen, descripcion 
-                    FROM locacion_imagenes 
-                    WHERE locacion_id = (SELECT id FROM locaciones WHERE nombre = %s LIMIT 1)
-                    ORDER BY id LIMIT 1
-                """, (nombre,))
-                imagen = cursor.fetchone()
-                if imagen:
-                    imagen_url = imagen[0]
-            
-            place_data = {
-                'nombre': nombre,
-                'descripcion': descripcion or '',
-                'categoria': categoria,
-                'imagen_url': imagen_url,
-                'ubicacion': f"{latitud}, {longitud}" if latitud and longitud else None
-            }
-            places_with_images.append(place_data)
+        snapshot = catalog.snapshot()
+        if not snapshot.available:
+            return jsonify({'places': [], 'error': 'No hay conexión a la base de datos'})
         
-        conn.close()
+        def build_payload():
+            places = [dict(place_card(lugar), distancia_m=round(distancia, 1))
+                      for lugar, distancia in get_geo_index(snapshot).nearby(lat, lon, k, radius)]
+            return {'places': places, 'total': len(places)}
         
-        return jsonify({
-            'places': places_with_images,
-            'total': len(places_with_images)
-        })
+        return cacheable_json(make_etag(snapshot.version, 'nearby', lat, lon, radius, k), build_payload)
         
     except Exception as e:
-        print(f"Error en get_places: {e}")
+        print(f"Error en get_places_nearby: {e}")
         return jsonify({'places': [], 'error': str(e)})
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Latencias y contadores en el formato de texto de Prometheus"""
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/dashboard')
 def dashboard():
     """Servir la página del dashboard"""
@@ -1521,16 +1498,14 @@ def dashboard():
 
 if __name__ == '__main__':
     # Reset de estado al iniciar app (para evitar confusiones después de reinicios)
-    context_cache = None
-    cache_timestamp = None
-    response_cache = {}
-    conversation_memory = {}
+    response_cache.clear()
     system_info = {
         'start_time': None,
         'total_requests': 0,
         'cached_responses_count': 0,
         'avg_response_time': 0,
-        'response_times': []
+        'prompts': 0,
+        'prompt_tokens': 0
     }
     system_info['start_time'] = datetime.now()
     print("Iniciando chatbot con IA real (Google Gemini)...")
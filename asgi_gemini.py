@@ -0,0 +1,144 @@
+"""
+Servidor ASGI del chatbot (modo asíncrono)
+
+El endpoint /api/chat corre de forma nativa sobre asyncio: mientras Gemini genera,
+cada conexión SSE abierta es solo una corrutina en espera, no un hilo bloqueado,
+así que un worker sostiene miles de streams simultáneos. Las etapas bloqueantes
+(caché, cuota, MySQL) reutilizan el pipeline de app_gemini.py en el pool de hilos.
+El resto de rutas (dashboard, /api/places, estadísticas) se sirven con la misma
+aplicación Flask a través de un adaptador WSGI.
+
+Uso:
+    uvicorn asgi_gemini:app --host 0.0.0.0 --port 5000 --workers 2
+    python asgi_gemini.py
+"""
+
+import asyncio
+import contextlib
+from datetime import datetime
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app_gemini as core
+from src.conversation_store import resolve_session_id
+from src.singleflight import AsyncSingleFlight
+
+# Preguntas idénticas en curso comparten una sola llamada asíncrona a Gemini
+gemini_flights = AsyncSingleFlight()
+core.async_gemini_flights = gemini_flights
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # Evitar que nginx acumule los eventos
+}
+
+def get_user_id(request):
+    """Obtener un ID único para el usuario (basado en IP, para la cuota)"""
+    return request.client.host if request.client else 'anonymous'
+
+def get_session_id(request, data):
+    """(ID de la sesión de chat, True si se creó uno nuevo), igual que en app_gemini.get_session_id"""
+    return resolve_session_id(
+        request.headers.get(core.SESSION_HEADER),
+        request.cookies.get(core.SESSION_COOKIE),
+        data.get('session_id') if isinstance(data, dict) else None
+    )
+
+def with_session_cookie(response, session_id, created):
+    """Enviar la cookie de sesión cuando la petición creó una sesión nueva"""
+    if created:
+        response.set_cookie(core.SESSION_COOKIE, session_id, max_age=core.CONVERSATION_TTL,
+                            httponly=True, samesite='lax')
+    return response
+
+async def generate_gemini_text(prompt, user_id):
+    """Respuesta completa de Gemini sin bloquear el bucle de eventos"""
+    await asyncio.to_thread(core.quota.acquire, user_id)
+    response = await core.model.generate_content_async(prompt)
+    return response.text
+
+async def generate_gemini_stream(prompt, user_id):
+    """Fragmentos de texto de Gemini en streaming sin bloquear el bucle de eventos"""
+    await asyncio.to_thread(core.quota.acquire, user_id)
+    response = await core.model.generate_content_async(prompt, stream=True)
+    async for chunk in response:
+        if chunk.text:
+            yield chunk.text
+
+def event_stream(frames):
+    return StreamingResponse(frames, media_type='text/event-stream', headers=SSE_HEADERS)
+
+async def chat(request):
+    data = await request.json()
+    session_id, created = get_session_id(request, data)
+    response = await respond_chat(request, data, session_id)
+    return with_session_cookie(response, session_id, created)
+
+async def respond_chat(request, data, session_id):
+    turn = await asyncio.to_thread(core.prepare_chat_turn, data, get_user_id(request), session_id)
+    
+    if turn.kind == 'limite':
+        core.record_chat_latency(turn)
+        return JSONResponse({'response': turn.response, 'places': []})
+    
+    if turn.kind != 'gemini':
+        # Respuesta resuelta sin Gemini (enrutador local, caché o sin datos)
+        mention_places = turn.kind != 'sin_datos'
+        if turn.stream_mode:
+            async def generate_ready():
+                yield core.sse_text_frames(turn.response)
+                payload = await asyncio.to_thread(core.build_chat_payload, turn, turn.response, mention_places)
+                yield core.sse_frame(core.done_event(payload))
+                core.record_chat_latency(turn)
+            return event_stream(generate_ready())
+        payload = await asyncio.to_thread(core.build_chat_payload, turn, turn.response, mention_places)
+        core.record_chat_latency(turn)
+        return JSONResponse(payload)
+    
+    if turn.stream_mode:
+        async def generate():
+            session = core.StreamSession(turn)
+            try:
+                # Si otra petición idéntica ya está generando, recibir sus mismos fragmentos
+                async for text in gemini_flights.stream(turn.flight_key, lambda: generate_gemini_stream(turn.prompt, turn.user_id),
+                                                        retry_on=core.LEADER_ERRORS):
+                    frames = session.feed(text)
+                    if frames:
+                        yield frames
+                # El cierre valida y arma las tarjetas finales: fuera del bucle de eventos
+                yield await asyncio.to_thread(session.close)
+            except Exception as e:
+                yield session.error(e)
+        return event_stream(generate())
+    
+    try:
+        with core.metrics.timer('stage_seconds', stage='gemini_total'):
+            texto_respuesta, _ = await gemini_flights.do(turn.flight_key, lambda: generate_gemini_text(turn.prompt, turn.user_id),
+                                                         retry_on=core.LEADER_ERRORS)
+        payload = await asyncio.to_thread(core.finish_gemini_turn, turn, texto_respuesta)
+        core.record_chat_latency(turn)
+        return JSONResponse(payload)
+    except Exception as e:
+        core.record_chat_latency(turn, 'error')
+        return JSONResponse({'response': core.gemini_error_message(e, False), 'places': []})
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    core.system_info['start_time'] = datetime.now()
+    yield
+
+app = Starlette(
+    routes=[
+        Route('/api/chat', chat, methods=['POST']),
+        # Todo lo demás lo atiende la aplicación Flask existente
+        Mount('/', app=WSGIMiddleware(core.app)),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
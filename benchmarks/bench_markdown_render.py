@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: format_response anterior (varias pasadas de re.sub por línea) vs
+renderizador de una sola pasada, con el texto completo y por fragmentos de streaming
+"""
+
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio padre al path para importaciones
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.markdown_render import MarkdownStream, render_markdown
+
+WORDS = ['parque', 'plaza', 'mirador', 'cerro', 'laguna', 'real', 'libertad', 'identidad',
+         'huancayo', 'wanka', 'torre', 'feria', 'catedral', 'inmaculada', 'nevado', 'centro']
+IMG = r'<img src="\2" alt="\1" style="max-width: 100%; height: auto; border-radius: 8px; margin: 10px 0; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">'
+
+
+def legacy_format_response(text):
+    """Implementación anterior de format_response"""
+    if not text:
+        return text
+    text = re.sub(r'!\[([^\]]*)\]\(([^\)]+)\)', IMG, text)
+    lines = text.split('\n')
+    formatted_lines = []
+    in_list = False
+    for line in lines:
+        if re.match(r'^\s*[*\-]\s+', line):
+            if not in_list:
+                formatted_lines.append('<ul>')
+                in_list = True
+            content = re.sub(r'^\s*[*\-]\s+', '', line)
+            content = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', content)
+            content = re.sub(r'!\[([^\]]*)\]\(([^\)]+)\)', IMG, content)
+            formatted_lines.append(f'<li>{content}</li>')
+        else:
+            if in_list:
+                formatted_lines.append('</ul>')
+                in_list = False
+            line = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', line)
+            line = re.sub(r'!\[([^\]]*)\]\(([^\)]+)\)', IMG, line)
+            if re.match(r'^###\s+', line):
+                formatted_lines.append('<h4>' + re.sub(r'^###\s+', '', line) + '</h4>')
+            elif re.match(r'^##\s+', line):
+                formatted_lines.append('<h3>' + re.sub(r'^##\s+', '', line) + '</h3>')
+            elif re.match(r'^#\s+', line):
+                formatted_lines.append('<h2>' + re.sub(r'^#\s+', '', line) + '</h2>')
+            else:
+                formatted_lines.append(line)
+    if in_list:
+        formatted_lines.append('</ul>')
+    return '\n'.join(formatted_lines).replace('\n', '<br>')
+
+
+def make_response(rng, places):
+    """Respuesta típica de Gemini: título, párrafos, viñetas con negritas e imágenes"""
+    lines = ['## Lugares recomendados en Huancayo', '']
+    for i in range(places):
+        name = ' '.join(w.capitalize() for w in rng.sample(WORDS, 2))
+        lines.append(f"* **{name}**: " + ' '.join(rng.choice(WORDS) for _ in range(25)))
+        if i % 2 == 0:
+            lines.append(f"![{name}](https://example.com/img/{i}.jpg)")
+    lines += ['', ' '.join(rng.choice(WORDS) for _ in range(40)), '', '### ¿Quieres saber más?']
+    return '\n'.join(lines)
+
+
+def chunked(text, rng):
+    """Fragmentos de 10 a 60 caracteres, como llegan de Gemini"""
+    chunks = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(10, 60)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def stream_render(chunks):
+    renderer = MarkdownStream()
+    parts = [renderer.feed(chunk) for chunk in chunks]
+    parts.append(renderer.close())
+    return ''.join(parts)
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'texto':>6} | {'fragmentos':>10} | {'anterior (ms)':>13} | {'una pasada (ms)':>15} | {'streaming (ms)':>14} | {'aceleración':>11}")
+    print('-' * 86)
+    for places in (3, 10, 40):
+        text = make_response(rng, places)
+        chunks = chunked(text, rng)
+        assert render_markdown(text) == legacy_format_response(text)
+        assert stream_render(chunks) == legacy_format_response(text)
+
+        repeat = max(50, 20000 // len(text))
+        legacy_ms = timeit(lambda: legacy_format_response(text), repeat)
+        single_ms = timeit(lambda: render_markdown(text), repeat)
+        stream_ms = timeit(lambda: stream_render(chunks), repeat)
+        print(f"{len(text):>6} | {len(chunks):>10} | {legacy_ms:>13.3f} | {single_ms:>15.3f} | {stream_ms:>14.3f} | {legacy_ms / single_ms:>10.1f}x")
+    print("\nEn streaming el formato anterior solo podía aplicarse al terminar la respuesta;"
+          "\nel renderizador reparte ese costo entre los fragmentos y no deja trabajo al final.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: detección de lugares con str.find por nombre vs autómata Aho-Corasick"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio padre al path para importaciones
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.place_matcher import PlaceMatcher
+
+WORDS = ['parque', 'plaza', 'mirador', 'cerro', 'laguna', 'real', 'libertad', 'identidad',
+         'huancayo', 'wanka', 'torre', 'feria', 'catedral', 'inmaculada', 'nevado', 'centro']
+
+
+def legacy_extract(response_text, lugares_conocidos):
+    """Implementación anterior de extract_places_from_response (sin la consulta a MySQL)"""
+    t = response_text.lower()
+    lugares_encontrados = []
+    for lugar in lugares_conocidos:
+        lugar_lower = lugar.lower()
+        if lugar_lower in t:
+            start_idx = 0
+            while True:
+                idx = t.find(lugar_lower, start_idx)
+                if idx == -1:
+                    break
+                is_word_boundary_before = (idx == 0 or not t[idx-1].isalnum())
+                is_word_boundary_after = (idx + len(lugar_lower) == len(t) or not t[idx + len(lugar_lower)].isalnum())
+                if is_word_boundary_before and is_word_boundary_after:
+                    if lugar not in lugares_encontrados:
+                        lugares_encontrados.append(lugar)
+                        break
+                start_idx = idx + 1
+    return lugares_encontrados
+
+
+def make_names(count, rng):
+    names = set()
+    while len(names) < count:
+        words = rng.sample(WORDS, rng.randint(2, 3))
+        names.add(' '.join(w.capitalize() for w in words) + f' {len(names)}')
+    return sorted(names)
+
+
+def make_response(names, rng):
+    """Respuesta típica de ~2 KB que menciona algunos lugares"""
+    mentioned = rng.sample(names, min(5, len(names)))
+    parts = []
+    for name in mentioned:
+        parts.append(f"* **{name}**: un lugar muy visitado de la ciudad de Huancayo, ideal para pasear en familia.")
+        parts.append(' '.join(rng.choice(WORDS) for _ in range(40)))
+    return '\n'.join(parts)
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'lugares':>8} | {'texto':>6} | {'str.find (ms)':>13} | {'Aho-Corasick (ms)':>17} | {'compilar (ms)':>13} | {'aceleración':>11}")
+    print('-' * 84)
+    for count in (100, 1_000, 10_000):
+        names = make_names(count, rng)
+        text = make_response(names, rng)
+        repeat = max(5, 2000 // count)
+
+        start = time.perf_counter()
+        matcher = PlaceMatcher(names)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        assert set(matcher.find_all(text)) == set(legacy_extract(text, names))
+
+        legacy_ms = timeit(lambda: legacy_extract(text, names), repeat)
+        matcher_ms = timeit(lambda: matcher.find_all(text), repeat * 10)
+        print(f"{count:>8} | {len(text):>6} | {legacy_ms:>13.3f} | {matcher_ms:>17.3f} | {build_ms:>13.1f} | {legacy_ms / matcher_ms:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: búsqueda de /api/places con recorrido completo (equivalente a LIKE '%x%')
+vs índice invertido en memoria, simulando una búsqueda que se escribe tecla por tecla
+"""
+
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio padre al path para importaciones
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.place_index import PlaceIndex
+from src.place_search import PlaceSearchIndex
+
+WORDS = ['parque', 'plaza', 'mirador', 'cerro', 'laguna', 'real', 'libertad', 'identidad',
+         'huancayo', 'wanka', 'torre', 'feria', 'catedral', 'inmaculada', 'nevado', 'centro',
+         'constitución', 'museo', 'mercado', 'iglesia', 'puente', 'río', 'jardín', 'estación']
+CATEGORIES = ['Parque', 'Plaza', 'Mirador', 'Patrimonio', 'Naturaleza', 'Centro Comercial', 'Estadio']
+TYPED = ['c', 'co', 'con', 'cons', 'const', 'constitucion', 'constitucion pl', 'constitucion plaza']
+
+
+def make_rows(count, rng):
+    rows = []
+    for i in range(count):
+        nombre = ' '.join(w.capitalize() for w in rng.sample(WORDS, rng.randint(2, 3))) + f' {i}'
+        descripcion = ' '.join(rng.choice(WORDS) for _ in range(30))
+        rows.append({'id': i, 'nombre': nombre, 'descripcion': descripcion, 'categoria': rng.choice(CATEGORIES)})
+    rows.sort(key=lambda r: r['nombre'])
+    return rows
+
+
+def legacy_search(rows, search, category=None):
+    """Filtro anterior: LOWER(categoria) LIKE y nombre/descripcion LIKE '%x%' sobre todas las filas"""
+    search = search.lower()
+    result = []
+    for row in rows:
+        if category and category not in row['categoria'].lower():
+            continue
+        if search and search not in row['nombre'].lower() and search not in row['descripcion'].lower():
+            continue
+        result.append(row)
+    return result
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    rng = random.Random(7)
+    print(f"{'lugares':>8} | {'construir (ms)':>14} | {'recorrido p50/p99 (ms)':>22} | {'índice p50/p99 (ms)':>19} | {'aceleración':>11}")
+    print('-' * 88)
+    for count in (10_000, 50_000):
+        rows = make_rows(count, rng)
+
+        start = time.perf_counter()
+        search_index = PlaceSearchIndex(PlaceIndex.from_rows(rows))
+        build_ms = (time.perf_counter() - start) * 1000
+
+        repeat = 20
+        legacy = [measure(lambda q=q: legacy_search(rows, q, 'plaza'), repeat) for q in TYPED]
+        indexed = [measure(lambda q=q: search_index.search(q, 'plazas', limit=20), repeat) for q in TYPED]
+
+        legacy_p50 = statistics.mean(p50 for p50, _ in legacy)
+        legacy_p99 = max(p99 for _, p99 in legacy)
+        index_p50 = statistics.mean(p50 for p50, _ in indexed)
+        index_p99 = max(p99 for _, p99 in indexed)
+        print(f"{count:>8} | {build_ms:>14.0f} | {legacy_p50:>10.2f} / {legacy_p99:>9.2f} | "
+              f"{index_p50:>8.2f} / {index_p99:>8.2f} | {legacy_p50 / index_p50:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: validar_respuesta_real anterior (varias búsquedas `in` sobre la
+respuesta, re.findall de marcadores, recorrido del contexto por cada lugar común y
+re.sub para limpiar) vs ResponseValidator compilado por versión del catálogo
+"""
+
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio padre al path para importaciones
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.place_index import PlaceIndex, PlaceRecord
+from src.response_validator import COMMON_PLACES, GENERIC_MARKERS, TECHNICAL_PHRASES, ResponseValidator
+
+WORDS = ['parque', 'plaza', 'mirador', 'cerro', 'laguna', 'real', 'libertad', 'identidad',
+         'huancayo', 'wanka', 'torre', 'feria', 'catedral', 'inmaculada', 'nevado', 'centro']
+
+
+def legacy_validate(respuesta, lugares_reales):
+    """Detección y limpieza de la implementación anterior (sin el texto de respaldo)"""
+    respuesta_lower = respuesta.lower()
+    problemas_detectados = []
+    if any(frase in respuesta_lower for frase in TECHNICAL_PHRASES):
+        problemas_detectados.append('problemas_tecnicos')
+    if any(g in respuesta_lower for g in GENERIC_MARKERS):
+        problemas_detectados.append('generico_sin_datos')
+    for m in re.findall(r"\[\[(.+?)\]\]", respuesta):
+        if m not in lugares_reales:
+            problemas_detectados.append(f'lugar_inventado_o_fuera_de_contexto: {m}')
+    for lugar_generico in COMMON_PLACES:
+        if lugar_generico in respuesta_lower:
+            if all(lugar_generico not in lugar.nombre_norm for lugar in lugares_reales):
+                problemas_detectados.append(f'lugar_inventado: {lugar_generico}')
+    return problemas_detectados, re.sub(r"\[\[(.*?)\]\]", r"\1", respuesta)
+
+
+def make_catalog(rng, size):
+    names = set()
+    while len(names) < size:
+        names.add(' '.join(w.capitalize() for w in rng.sample(WORDS, 3)))
+    return sorted(names)
+
+
+def make_response(rng, context, catalog, sentences, problem_rate):
+    parts = []
+    for _ in range(sentences):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+        roll = rng.random()
+        if roll < 0.5:
+            words.insert(rng.randrange(len(words)), f"[[{rng.choice(context)}]]")
+        elif roll < 0.5 + problem_rate:
+            pool = TECHNICAL_PHRASES + GENERIC_MARKERS + COMMON_PLACES
+            words.insert(rng.randrange(len(words)), rng.choice(pool + (f"[[{rng.choice(catalog)}]]",)))
+        parts.append(' '.join(words).capitalize() + '.')
+    return ' '.join(parts)
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    rng = random.Random(42)
+    catalog = make_catalog(rng, 200)
+    validator = ResponseValidator(catalog)
+    context = rng.sample(catalog, 12)
+    index = PlaceIndex(PlaceRecord(i, name, 'Parque') for i, name in enumerate(context))
+
+    print(f"{'texto':>6} | {'con problemas':>13} | {'anterior (ms)':>13} | {'compilado (ms)':>15} | {'aceleración':>11}")
+    print('-' * 70)
+    for sentences, problem_rate in ((5, 0.0), (20, 0.0), (20, 0.2), (80, 0.1)):
+        text = make_response(rng, context, catalog, sentences, problem_rate)
+        legacy_problems, legacy_text = legacy_validate(text, index)
+        result = validator.validate(text, index)
+        assert result.text == legacy_text
+        assert bool(result.problems) == bool(legacy_problems)
+
+        repeat = max(200, 200000 // len(text))
+        legacy_ms = timeit(lambda: legacy_validate(text, index), repeat)
+        single_ms = timeit(lambda: validator.validate(text, index), repeat)
+        print(f"{len(text):>6} | {'sí' if legacy_problems else 'no':>13} | {legacy_ms:>13.4f} | {single_ms:>15.4f} | {legacy_ms / single_ms:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
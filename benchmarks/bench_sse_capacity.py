@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Carga: conexiones SSE simultáneas de /api/chat servidas por hilos (Flask/WSGI) vs asyncio (ASGI)
+
+Gemini se reemplaza por un modelo falso que emite fragmentos con una pausa fija, así
+se mide solo la capacidad del servidor para mantener streams abiertos. El modo WSGI
+usa un pool de hilos del tamaño típico de gunicorn --threads; el modo ASGI conduce la
+aplicación de asgi_gemini.py directamente desde un bucle de eventos.
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Agregar el directorio padre al path para importaciones
+sys.path.append(str(Path(__file__).parent.parent))
+
+import app_gemini as core
+import asgi_gemini
+from src.place_catalog import CatalogSnapshot
+
+WSGI_THREADS = 32        # Hilos por worker (gunicorn --worker-class gthread --threads 32)
+CHUNKS = 20              # Fragmentos por respuesta
+CHUNK_DELAY = 0.05       # Segundos entre fragmentos (~1 s por respuesta)
+CONCURRENCY = (100, 500, 1000)
+RESPONSE_TEXT = "Te recomiendo visitar el [[Parque 1]], ideal para pasear en familia. "
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+def fake_generate_content(prompt, stream=False, **kwargs):
+    def chunks():
+        for _ in range(CHUNKS):
+            time.sleep(CHUNK_DELAY)
+            yield _Chunk(RESPONSE_TEXT)
+    return chunks() if stream else _Chunk(RESPONSE_TEXT * CHUNKS)
+
+
+async def fake_generate_content_async(prompt, stream=False, **kwargs):
+    async def chunks():
+        for _ in range(CHUNKS):
+            await asyncio.sleep(CHUNK_DELAY)
+            yield _Chunk(RESPONSE_TEXT)
+    return chunks() if stream else _Chunk(RESPONSE_TEXT * CHUNKS)
+
+
+def setup():
+    """Catálogo sintético y sin MySQL, cuota ilimitada y cachés desactivadas"""
+    places = tuple(
+        {'id': i, 'nombre': f'Parque {i}', 'descripcion': 'Parque de prueba', 'categoria': 'Parque',
+         'latitud': -12.06, 'longitud': -75.21}
+        for i in range(1, 51)
+    )
+    columns = ('id', 'nombre', 'descripcion', 'categoria', 'latitud', 'longitud')
+    core.catalog._snapshot = CatalogSnapshot('bench', None, 'con_mysql', columns, places)
+    core.get_places_filtered = lambda *args, **kwargs: []
+    core.get_cached_response = lambda message: None
+    core.semantic_cache.get = lambda *args, **kwargs: None
+    core.MAX_DAILY_REQUESTS = float('inf')
+    core.model.generate_content = fake_generate_content
+    core.model.generate_content_async = fake_generate_content_async
+
+
+def summarize(label, clients, elapsed, ttfb, ok):
+    ttfb.sort()
+    p95 = ttfb[int(len(ttfb) * 0.95) - 1] if ttfb else 0
+    print(f"{label:>5} | {clients:>8} | {ok:>5} | {elapsed:>9.2f} | {statistics.median(ttfb) * 1000:>11.0f} | {p95 * 1000:>11.0f} | {ok / elapsed:>10.1f}")
+
+
+def run_wsgi(clients, round_id):
+    client = core.app.test_client()
+    start = time.perf_counter()
+
+    def one(i):
+        # El tiempo hasta el primer byte incluye la espera por un hilo libre
+        response = client.post('/api/chat', json={'message': f'ronda {round_id} pregunta {i}', 'stream': True},
+                               buffered=False)
+        first = None
+        body = b''
+        for piece in response.response:
+            if first is None:
+                first = time.perf_counter() - start
+            body += piece
+        response.close()
+        return first, b'"done": true' in body
+
+    with ThreadPoolExecutor(max_workers=WSGI_THREADS) as pool:
+        results = list(pool.map(one, range(clients)))
+    elapsed = time.perf_counter() - start
+    ttfb = [first for first, _ in results if first is not None]
+    return elapsed, ttfb, sum(ok for _, ok in results)
+
+
+async def asgi_request(app, body, started):
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': '/api/chat', 'raw_path': b'/api/chat',
+        'query_string': b'', 'root_path': '', 'scheme': 'http', 'http_version': '1.1',
+        'headers': [(b'content-type', b'application/json')],
+        'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 5000),
+    }
+    payload = json.dumps(body).encode('utf-8')
+    sent = False
+    first = None
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': payload, 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal first
+        if message['type'] == 'http.response.body' and message.get('body'):
+            if first is None:
+                first = time.perf_counter() - started
+            chunks.append(message['body'])
+
+    await app(scope, receive, send)
+    return first, b'"done": true' in b''.join(chunks)
+
+
+def run_asgi(clients, round_id):
+    async def main():
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            asgi_request(asgi_gemini.app, {'message': f'ronda {round_id} pregunta {i}', 'stream': True}, start)
+            for i in range(clients)
+        ])
+        return time.perf_counter() - start, results
+
+    elapsed, results = asyncio.run(main())
+    ttfb = [first for first, _ in results if first is not None]
+    return elapsed, ttfb, sum(ok for _, ok in results)
+
+
+def main():
+    setup()
+    ideal = CHUNKS * CHUNK_DELAY
+    print(f"Respuesta simulada: {CHUNKS} fragmentos x {CHUNK_DELAY * 1000:.0f} ms (~{ideal:.1f} s); "
+          f"WSGI con {WSGI_THREADS} hilos")
+    print(f"{'modo':>5} | {'clientes':>8} | {'ok':>5} | {'total (s)':>9} | {'TTFB p50 ms':>11} | {'TTFB p95 ms':>11} | {'streams/s':>10}")
+    print('-' * 78)
+    for round_id, clients in enumerate(CONCURRENCY):
+        summarize('wsgi', clients, *run_wsgi(clients, round_id))
+        summarize('asgi', clients, *run_asgi(clients, round_id))
+
+
+if __name__ == "__main__":
+    main()
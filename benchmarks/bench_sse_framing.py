@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: respuesta ya resuelta (caché, catálogo) enviada palabra por palabra
+con json.dumps en cada evento (implementación anterior) vs SSEWriter, que la agrupa
+en uno o pocos eventos con un codificador reutilizable
+"""
+
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio padre al path para importaciones
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.sse import SSEWriter
+
+WORDS = ['parque', 'plaza', 'mirador', 'cerro', 'laguna', 'real', 'libertad', 'identidad',
+         'huancayo', 'wanka', 'torre', 'feria', 'catedral', 'inmaculada', 'nevado', 'centro']
+
+
+def legacy_frames(text):
+    """Implementación anterior de sse_text_frames (un evento por palabra)"""
+    return [f"data: {json.dumps({'chunk': word + ' ', 'done': False})}\n\n" for word in text.split()]
+
+
+def writer_frames(text):
+    writer = SSEWriter()
+    writer.text(text)
+    return writer.flush()
+
+
+def make_response(rng, words):
+    lines = []
+    while words > 0:
+        size = min(words, rng.randint(8, 30))
+        lines.append('<strong>' + rng.choice(WORDS).capitalize() + '</strong>: ' +
+                     ' '.join(rng.choice(WORDS) for _ in range(size)))
+        words -= size
+    return '<br>'.join(lines)
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'palabras':>8} | {'eventos antes':>13} | {'eventos ahora':>13} | {'bytes antes':>11} | {'bytes ahora':>11} | {'antes (ms)':>10} | {'ahora (ms)':>10} | {'aceleración':>11}")
+    print('-' * 104)
+    for words in (50, 200, 800):
+        text = make_response(rng, words)
+        legacy = legacy_frames(text)
+        current = writer_frames(text)
+        repeat = max(50, 20000 // words)
+        legacy_ms = timeit(lambda: legacy_frames(text), repeat)
+        writer_ms = timeit(lambda: writer_frames(text), repeat)
+        print(f"{words:>8} | {len(legacy):>13} | {current.count('data: '):>13} | "
+              f"{len(''.join(legacy).encode()):>11} | {len(current.encode()):>11} | "
+              f"{legacy_ms:>10.3f} | {writer_ms:>10.3f} | {legacy_ms / writer_ms:>10.1f}x")
+    print("\nCada evento es además una escritura (y un paquete) en la conexión del cliente;"
+          "\nlos saltos de línea y los espacios repetidos ahora llegan tal cual.")
+
+
+if __name__ == "__main__":
+    main()
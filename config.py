@@ -16,3 +16,56 @@ DB_PORT = int(os.getenv('DB_PORT', '3306'))
 DB_USER = os.getenv('DB_USER', 'root')
 DB_PASSWORD = os.getenv('DB_PASSWORD', '')
 DB_NAME = os.getenv('DB_NAME', 'huancayo_db')
+
+# Pool de conexiones MySQL compartido por todas las peticiones
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))  # segundos de espera para obtener conexión
+DB_POOL_MAX_USES = int(os.getenv('DB_POOL_MAX_USES', '500'))  # reciclar conexión tras N préstamos
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30'))  # segundos inactiva antes de verificarla
+
+# Catálogo de lugares en memoria: segundos entre verificaciones de cambios en la BD
+CATALOG_REFRESH_INTERVAL = float(os.getenv('CATALOG_REFRESH_INTERVAL', '60'))
+
+# Contexto del prompt: solo los lugares más relevantes, con presupuesto de tokens
+CONTEXT_TOP_K = int(os.getenv('CONTEXT_TOP_K', '8'))  # lugares por consulta
+CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', '1200'))  # tokens aproximados del contexto
+NEARBY_RADIUS_M = float(os.getenv('NEARBY_RADIUS_M', '3000'))  # radio de las preguntas "cerca de" en el chat
+
+# Caché de respuestas de IA: límites para mantener la memoria estable
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '500'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(4 * 1024 * 1024)))
+
+# Caché semántica: similitud mínima (0-1) para reutilizar la respuesta de una pregunta equivalente
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.88'))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '1000'))
+# Umbral más permisivo cuando queda poca cuota de Gemini: mejor una respuesta parecida que ninguna
+SEMANTIC_CACHE_RELAXED_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_RELAXED_THRESHOLD', '0.75'))
+
+# Cuota de consultas a Gemini (por día se reinicia a medianoche; por minuto es una cubeta de tokens)
+QUOTA_DAILY_LIMIT = int(os.getenv('QUOTA_DAILY_LIMIT', '45'))  # Un poco menos del límite de 50 para tener margen
+QUOTA_PER_MINUTE = int(os.getenv('QUOTA_PER_MINUTE', '12'))
+QUOTA_USER_DAILY_LIMIT = int(os.getenv('QUOTA_USER_DAILY_LIMIT', '15'))
+QUOTA_USER_PER_MINUTE = int(os.getenv('QUOTA_USER_PER_MINUTE', '4'))
+QUOTA_LOW_FRACTION = float(os.getenv('QUOTA_LOW_FRACTION', '0.2'))  # saldo diario "bajo": empieza a degradar
+
+# Memoria conversacional: tope de memoria para todas las sesiones y archivo opcional
+# donde guardar las sesiones desalojadas ('' = descartarlas; sin efecto con backend compartido)
+CONVERSATION_MAX_BYTES = int(os.getenv('CONVERSATION_MAX_BYTES', str(4 * 1024 * 1024)))
+CONVERSATION_SPILL_PATH = os.getenv('CONVERSATION_SPILL_PATH', '')
+# Tokens aproximados de conversación por prompt (resumen más la última vuelta)
+CONVERSATION_MAX_TOKENS = int(os.getenv('CONVERSATION_MAX_TOKENS', '350'))
+
+# Tareas después de responder (escritura en la caché): hilos y tope de la cola antes de
+# ejecutarlas en el propio hilo de la petición
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '2'))
+BACKGROUND_MAX_PENDING = int(os.getenv('BACKGROUND_MAX_PENDING', '256'))
+
+# Agrupación de eventos SSE: texto acumulado (caracteres) o tiempo desde el último envío (ms)
+# a partir del cual se escribe; con 0 ms cada fragmento de Gemini sale en cuanto llega
+SSE_COALESCE_CHARS = int(os.getenv('SSE_COALESCE_CHARS', '8192'))
+SSE_COALESCE_MS = float(os.getenv('SSE_COALESCE_MS', '0'))
+
+# Estado compartido entre workers: 'local' (memoria del proceso), 'sqlite' o 'redis'
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'local')
+STATE_SQLITE_PATH = os.getenv('STATE_SQLITE_PATH', 'data/state.db')
+STATE_REDIS_URL = os.getenv('STATE_REDIS_URL', 'redis://localhost:6379/0')
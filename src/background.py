@@ -0,0 +1,104 @@
+"""
+Tareas en segundo plano después de responder
+Pool acotado de hilos para el trabajo que no cambia lo que ve el usuario ni lo que
+lee la siguiente petición (por ejemplo, guardar en la caché). La cola tiene tope:
+cuando se llena, la tarea corre en el hilo que la envía (contrapresión en lugar de
+acumular memoria o descartar trabajo). Los fallos se cuentan y no afectan a la
+respuesta ya enviada.
+"""
+
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+from src.metrics import Metrics
+
+
+class BackgroundTasks:
+    """
+    Cola acotada atendida por `workers` hilos daemon (se inician con la primera tarea).
+
+    submit() nunca bloquea: si la cola está llena ejecuta la tarea en el momento.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 256, metrics: Optional[Metrics] = None):
+        """
+        Args:
+            workers: Hilos que ejecutan las tareas (0 = siempre en el hilo que las envía)
+            max_pending: Tareas en espera antes de aplicar contrapresión
+            metrics: Registro donde anotar duración, espera y resultado de cada tarea
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max(max_pending, 1))
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {'submitted': 0, 'completed': 0, 'failed': 0, 'inline': 0}
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"background-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, name: str, fn: Callable[..., Any], *args, **kwargs):
+        """Ejecutar fn(*args, **kwargs) en segundo plano (o ya mismo si la cola está llena)"""
+        with self._lock:
+            self._stats['submitted'] += 1
+        if self.workers > 0:
+            if not self._threads:
+                self._start()
+            try:
+                self._queue.put_nowait((name, fn, args, kwargs, time.perf_counter()))
+                return
+            except queue.Full:
+                pass
+        with self._lock:
+            self._stats['inline'] += 1
+        self._run(name, fn, args, kwargs, time.perf_counter())
+
+    def _worker(self):
+        while True:
+            name, fn, args, kwargs, queued = self._queue.get()
+            try:
+                self._run(name, fn, args, kwargs, queued)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, name: str, fn: Callable[..., Any], args, kwargs, queued: float):
+        started = time.perf_counter()
+        try:
+            fn(*args, **kwargs)
+            result = 'ok'
+        except Exception:
+            result = 'error'
+            print(f"Error en tarea en segundo plano '{name}':")
+            traceback.print_exc()
+        with self._lock:
+            self._stats['completed' if result == 'ok' else 'failed'] += 1
+        if self.metrics is not None:
+            finished = time.perf_counter()
+            self.metrics.observe('background_wait_seconds', started - queued, task=name)
+            self.metrics.observe('background_task_seconds', finished - started, task=name)
+            self.metrics.incr('background_tasks_total', task=name, result=result)
+
+    def join(self):
+        """Esperar a que terminen las tareas encoladas (pruebas y apagado ordenado)"""
+        if self._threads:
+            self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        stats.update({
+            'workers': self.workers,
+            'pending': self._queue.qsize(),
+            'max_pending': self.max_pending,
+        })
+        return stats
@@ -0,0 +1,98 @@
+"""
+Agregados del catálogo de lugares
+Conteos por categoría, imágenes y fecha de última actualización, calculados una sola
+vez por versión del catálogo para servir /api/stats y el dashboard desde memoria
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from src.place_catalog import UPDATED_AT_COLUMNS, CatalogSnapshot
+
+# Temas inferidos del nombre del lugar (lista "categorias" de /api/stats)
+NAME_THEMES = (
+    ('Naturaleza', ('parque', 'bosque', 'montaña', 'laguna', 'cascada', 'río')),
+    ('Cultura', ('plaza', 'iglesia', 'templo', 'museo', 'monumento')),
+    ('Historia', ('ruinas', 'pirámide', 'fortaleza', 'cerro')),
+    ('Gastronomía', ('mercado', 'restaurante', 'comida', 'picantería')),
+    ('Aventura', ('mirador', 'sendero', 'camino', 'trekking')),
+)
+DEFAULT_THEMES = ['Naturaleza', 'Cultura', 'Historia', 'Gastronomía', 'Aventura']
+
+
+def classify_name(nombre: str) -> str:
+    """Tema de un lugar según palabras clave de su nombre"""
+    nombre_lower = nombre.lower()
+    for tema, palabras in NAME_THEMES:
+        if any(palabra in nombre_lower for palabra in palabras):
+            return tema
+    return 'Otros'
+
+
+class CatalogAggregates:
+    """Resumen inmutable de una versión del catálogo"""
+
+    __slots__ = ('version', 'status', 'total_lugares', 'total_imagenes', 'lugares_con_imagen',
+                 'por_categoria', 'por_tema', 'last_update', 'stats_payload')
+
+    def __init__(self, version: str, status: str, total_lugares: int = 0, total_imagenes: int = 0,
+                 lugares_con_imagen: int = 0, por_categoria: Tuple[Tuple[str, int], ...] = (),
+                 por_tema: Tuple[Tuple[str, int], ...] = (), last_update: Optional[datetime] = None):
+        self.version = version
+        self.status = status
+        self.total_lugares = total_lugares
+        self.total_imagenes = total_imagenes
+        self.lugares_con_imagen = lugares_con_imagen
+        self.por_categoria = por_categoria
+        self.por_tema = por_tema
+        self.last_update = last_update
+        # Respuesta de /api/stats ya armada: servirla no recorre nada
+        self.stats_payload = self._build_stats_payload()
+
+    def _build_stats_payload(self) -> Dict[str, Any]:
+        categorias = [f"{tema} ({count})" for tema, count in self.por_tema] or list(DEFAULT_THEMES)
+        return {
+            'total_lugares': self.total_lugares,
+            'total_imagenes': self.total_imagenes,
+            'categorias': categorias,
+            'por_categoria': dict(self.por_categoria),
+            'last_update': self.last_update.isoformat() if self.last_update else None,
+            'estado': self.status
+        }
+
+
+def _last_update(snapshot: CatalogSnapshot) -> Optional[datetime]:
+    """Fecha de la última modificación registrada en la BD, o la de carga del catálogo"""
+    column = next((c for c in UPDATED_AT_COLUMNS if c in snapshot.columns), None)
+    if column:
+        fechas = [p[column] for p in snapshot.places if isinstance(p.get(column), datetime)]
+        if fechas:
+            return max(fechas)
+    return datetime.fromtimestamp(snapshot.loaded_at)
+
+
+def compute_aggregates(snapshot: CatalogSnapshot) -> CatalogAggregates:
+    """Recorrer el catálogo una vez y resumirlo"""
+    if not snapshot.available:
+        return CatalogAggregates(snapshot.version, snapshot.status)
+
+    por_categoria: Dict[str, int] = {}
+    for place in snapshot.places:
+        categoria = place.get('categoria') or 'Sin categoría'
+        por_categoria[categoria] = por_categoria.get(categoria, 0) + 1
+
+    por_tema: Dict[str, int] = {}
+    for nombre in snapshot.names:
+        tema = classify_name(nombre)
+        por_tema[tema] = por_tema.get(tema, 0) + 1
+
+    return CatalogAggregates(
+        snapshot.version,
+        snapshot.status,
+        total_lugares=len(snapshot.places),
+        total_imagenes=snapshot.total_images,
+        lugares_con_imagen=sum(1 for p in snapshot.places if snapshot.images.get(p.get('id'))),
+        por_categoria=tuple(sorted(por_categoria.items(), key=lambda item: (-item[1], item[0]))),
+        por_tema=tuple(por_tema.items()),
+        last_update=_last_update(snapshot),
+    )
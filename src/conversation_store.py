@@ -0,0 +1,340 @@
+"""
+Memoria conversacional por sesión
+Últimos mensajes de cada sesión en forma compacta (texto plano recortado, sin HTML
+ni imágenes) más un resumen incremental de lo anterior, con expiración por
+inactividad y un tope global de memoria que desaloja las sesiones menos recientes.
+Opcionalmente las sesiones desalojadas se guardan en un backend de estado (por
+ejemplo SQLite) y se recuperan al volver.
+"""
+
+import html
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from src.conversation_summary import RollingSummary
+from src.place_retrieval import estimate_tokens
+from src.state_backend import StateBackend
+
+# Caracteres guardados por mensaje: el contexto del prompt no necesita más
+MAX_MESSAGE_CHARS = 500
+# Bytes estimados por mensaje además de su texto (tupla, enteros y nodo de la deque)
+MESSAGE_OVERHEAD = 96
+# Mensajes que van textuales al prompt (la última vuelta); los anteriores, resumidos
+LAST_TURN_MESSAGES = 2
+# Mensajes crudos que se enviaban antes en cada prompt (solo para medir la reducción)
+LEGACY_CONTEXT_MESSAGES = 5
+
+_STRONG = re.compile(r'<(?:strong|b)>(.*?)</(?:strong|b)>', re.IGNORECASE | re.DOTALL)
+_IMAGES = re.compile(r'!\[[^\]]*\]\([^)]*\)|<img\b[^>]*>', re.IGNORECASE)
+_BREAKS = re.compile(r'<br\s*/?>|</?(?:p|li|ul|ol|h\d)\b[^>]*>', re.IGNORECASE)
+_TAGS = re.compile(r'<[^>]+>')
+_SPACES = re.compile(r'[ \t]+')
+_BLANK_LINES = re.compile(r'\s*\n\s*')
+
+
+def compact_text(text: str, limit: int = MAX_MESSAGE_CHARS) -> str:
+    """Texto plano del mensaje: sin imágenes, etiquetas HTML ni espacios repetidos, recortado"""
+    text = _IMAGES.sub('', text or '')
+    text = _STRONG.sub(r'**\1**', text)  # Las negritas marcan los lugares mencionados
+    text = _BREAKS.sub('\n', text)
+    text = html.unescape(_TAGS.sub('', text))
+    text = _BLANK_LINES.sub('\n', _SPACES.sub(' ', text)).strip()
+    if len(text) > limit:
+        text = text[:limit].rsplit(' ', 1)[0] + '…'
+    return text
+
+
+# Mensaje guardado: (es_del_usuario, texto compacto, marca de tiempo en segundos, caracteres originales)
+Message = Tuple[bool, str, int, int]
+
+
+class _Conversation:
+    __slots__ = ('messages', 'summary', 'context', 'size', 'last_seen')
+
+    def __init__(self, messages: Deque[Message], summary: RollingSummary, last_seen: float):
+        self.messages = messages
+        self.summary = summary
+        self.context: Optional[Tuple[str, int, int]] = None  # (texto, tokens, tokens del formato anterior)
+        self.size = 0
+        self.last_seen = last_seen
+
+    def measure(self) -> int:
+        self.size = (sum(len(m[1].encode('utf-8')) + MESSAGE_OVERHEAD for m in self.messages)
+                     + self.summary.size)
+        return self.size
+
+    def to_json(self) -> Dict[str, Any]:
+        return {'m': [list(m) for m in self.messages], 's': self.summary.to_json()}
+
+
+class ConversationStore:
+    """
+    Conversaciones por sesión con expiración por inactividad y LRU global por bytes.
+
+    El prompt recibe un resumen corto de la conversación más la última vuelta textual,
+    dentro de un presupuesto de tokens. Ese texto se arma una vez al recibir un mensaje,
+    así que leerlo es O(1). Con `spill` las sesiones desalojadas por memoria se guardan
+    en ese backend; con `write_through` (backend compartido entre workers) cada
+    mensaje se escribe también allí y las lecturas lo consultan directamente.
+    """
+
+    def __init__(self, max_messages: int = 10, max_tokens: int = 350, max_bytes: int = 4 * 1024 * 1024,
+                 idle_ttl: float = 24 * 3600, spill: Optional[StateBackend] = None, write_through: bool = False):
+        """
+        Args:
+            max_messages: Mensajes guardados por sesión
+            max_tokens: Presupuesto aproximado de tokens del contexto de conversación en el prompt
+            max_bytes: Tope de memoria estimada para todas las sesiones
+            idle_ttl: Segundos sin actividad tras los que se olvida una sesión
+            spill: Backend donde guardar las sesiones desalojadas (None = se descartan)
+            write_through: Escribir cada mensaje en `spill` y leer siempre desde allí
+        """
+        self.max_messages = max(max_messages, LAST_TURN_MESSAGES + 1)
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.spill = spill
+        self.write_through = write_through and spill is not None
+        self._sessions: 'OrderedDict[str, _Conversation]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'appends': 0, 'expired': 0, 'evicted': 0, 'spilled': 0, 'restored': 0}
+        # Tamaño del contexto de conversación enviado en cada prompt, frente al formato anterior
+        self._prompt_stats = {'contexts': 0, 'tokens': 0, 'legacy_tokens': 0}
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"conv:{session_id}"
+
+    def _new(self, now: float) -> _Conversation:
+        return _Conversation(deque(maxlen=self.max_messages), RollingSummary(), now)
+
+    def _load_spilled(self, session_id: str, now: float) -> Optional[_Conversation]:
+        """Conversación guardada en el backend (solo lectura; el llamador decide si la adopta)"""
+        raw = self.spill.get_json(self._key(session_id)) if self.spill is not None else None
+        return self._from_json(raw, now)
+
+    def _from_json(self, raw: Any, now: float) -> Optional[_Conversation]:
+        if not isinstance(raw, dict):
+            return None
+        messages = deque(
+            ((bool(m[0]), str(m[1]), int(m[2]), int(m[3])) for m in raw.get('m') or ()),
+            maxlen=self.max_messages
+        )
+        conversation = _Conversation(messages, RollingSummary.from_json(raw.get('s')), now)
+        conversation.measure()
+        return conversation
+
+    def _drop(self, session_id: str, conversation: _Conversation):
+        del self._sessions[session_id]
+        self._bytes -= conversation.size
+
+    def _get_local(self, session_id: str, now: float) -> Optional[_Conversation]:
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            return None
+        if now - conversation.last_seen > self.idle_ttl:
+            self._drop(session_id, conversation)
+            self._stats['expired'] += 1
+            return None
+        conversation.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return conversation
+
+    def _evict(self) -> List[Tuple[str, _Conversation]]:
+        """Quitar sesiones expiradas y, si hace falta, las menos recientes; devuelve las desalojadas"""
+        now = time.time()
+        evicted = []
+        for session_id, conversation in list(self._sessions.items()):
+            if now - conversation.last_seen <= self.idle_ttl:
+                break
+            self._drop(session_id, conversation)
+            self._stats['expired'] += 1
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            session_id, conversation = next(iter(self._sessions.items()))
+            self._drop(session_id, conversation)
+            self._stats['evicted'] += 1
+            evicted.append((session_id, conversation))
+        return evicted
+
+    def _spill(self, evicted: List[Tuple[str, _Conversation]]):
+        if self.spill is None:
+            return
+        for session_id, conversation in evicted:
+            remaining = self.idle_ttl - (time.time() - conversation.last_seen)
+            if remaining > 0:
+                self.spill.set_json(self._key(session_id), conversation.to_json(), ttl=remaining)
+                with self._lock:
+                    self._stats['spilled'] += 1
+
+    @staticmethod
+    def _push(conversation: _Conversation, message: Message):
+        """Agregar el mensaje y plegar en el resumen el que deja de ser parte de la última vuelta"""
+        conversation.messages.append(message)
+        if len(conversation.messages) > LAST_TURN_MESSAGES:
+            leaving = conversation.messages[-LAST_TURN_MESSAGES - 1]
+            conversation.summary.fold(leaving[0], leaving[1])
+        conversation.context = None
+
+    def append(self, session_id: str, text: str, is_user: bool):
+        """Agregar un mensaje (se guarda compactado) a la conversación de la sesión"""
+        now = time.time()
+        message = (bool(is_user), compact_text(text), int(now), len(text or ''))
+        if self.write_through:
+            # El backend compartido es la fuente de verdad y otro worker pudo agregar mensajes:
+            # leer, agregar y escribir en una sola operación atómica para no perder ninguno
+            def push(raw):
+                conversation = self._from_json(raw, now) or self._new(now)
+                self._push(conversation, message)
+                return conversation.to_json()
+
+            self.spill.update_json(self._key(session_id), push, ttl=self.idle_ttl)
+            with self._lock:
+                self._stats['appends'] += 1
+            return
+
+        with self._lock:
+            conversation = self._get_local(session_id, now)
+        if conversation is None and self.spill is not None:
+            conversation = self._load_spilled(session_id, now)
+            if conversation is not None:
+                self.spill.delete(self._key(session_id))
+                with self._lock:
+                    self._stats['restored'] += 1
+
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is not None:
+                conversation = current
+            elif conversation is None:
+                conversation = self._new(now)
+            if current is None:
+                self._sessions[session_id] = conversation
+                self._bytes += conversation.size
+            previous = conversation.size
+            self._push(conversation, message)
+            self._bytes += conversation.measure() - previous
+            conversation.last_seen = now
+            self._sessions.move_to_end(session_id)
+            self._stats['appends'] += 1
+            evicted = self._evict()
+        self._spill(evicted)
+
+    def _render(self, conversation: _Conversation) -> Tuple[str, int, int]:
+        """(contexto para el prompt, sus tokens, tokens que ocupaban los mensajes crudos)"""
+        messages = list(conversation.messages)
+        if not messages:
+            return "", 0, 0
+
+        header = "CONVERSACIÓN RECIENTE:"
+        # Antes se enviaban los últimos mensajes completos, uno por línea con su rol
+        legacy_tokens = estimate_tokens(header) + sum(
+            3 + (m[3] + 3) // 4 + 1 for m in messages[-LEGACY_CONTEXT_MESSAGES:]
+        )
+        budget = self.max_tokens - estimate_tokens(header) - 1
+        # La última vuelta va textual; si sola excede el presupuesto, se recorta cada mensaje
+        turn = [m for m in messages[-LAST_TURN_MESSAGES:] if m[1]]
+        per_message = max(budget // max(len(turn), 1), 16) * 4
+        turn_lines = [f"{'Usuario' if m[0] else 'Asistente'}: {compact_text(m[1], per_message)}" for m in turn]
+        budget -= sum(estimate_tokens(line) + 1 for line in turn_lines)
+
+        lines = [header]
+        summary = conversation.summary.render(budget) if budget > 0 else ''
+        if summary:
+            lines.append(summary)
+        lines += turn_lines
+        text = '\n'.join(lines) + '\n'
+        return text, estimate_tokens(text), legacy_tokens
+
+    def _record(self, context: Tuple[str, int, int]) -> str:
+        with self._lock:
+            self._prompt_stats['contexts'] += 1
+            self._prompt_stats['tokens'] += context[1]
+            self._prompt_stats['legacy_tokens'] += context[2]
+        return context[0]
+
+    def context(self, session_id: str) -> str:
+        """Resumen más la última vuelta de la sesión, listo para el prompt ('' si no hay)"""
+        now = time.time()
+        if not self.write_through:
+            with self._lock:
+                conversation = self._get_local(session_id, now)
+                if conversation is not None:
+                    if conversation.context is None:
+                        conversation.context = self._render(conversation)
+                    context = conversation.context
+            if conversation is not None:
+                return self._record(context)
+        conversation = self._load_spilled(session_id, now)
+        return self._record(self._render(conversation)) if conversation else ""
+
+    def messages(self, session_id: str) -> List[Message]:
+        """Mensajes guardados de la sesión, del más antiguo al más reciente"""
+        now = time.time()
+        if not self.write_through:
+            with self._lock:
+                conversation = self._get_local(session_id, now)
+                if conversation is not None:
+                    return list(conversation.messages)
+        conversation = self._load_spilled(session_id, now)
+        return list(conversation.messages) if conversation else []
+
+    def delete(self, session_id: str):
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is not None:
+                self._drop(session_id, conversation)
+        if self.spill is not None:
+            self.spill.delete(self._key(session_id))
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+        if self.spill is not None:
+            self.spill.clear('conv:')
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            prompt = dict(self._prompt_stats)
+            stats.update({
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_tokens': self.max_tokens,
+                'spill': self.spill.describe() if self.spill is not None else None,
+                'write_through': self.write_through,
+            })
+        contexts = prompt['contexts']
+        stats['prompt_context'] = {
+            'contexts': contexts,
+            'avg_tokens': round(prompt['tokens'] / contexts, 1) if contexts else 0,
+            'avg_legacy_tokens': round(prompt['legacy_tokens'] / contexts, 1) if contexts else 0,
+            'reduction': round(1 - prompt['tokens'] / prompt['legacy_tokens'], 3) if prompt['legacy_tokens'] else 0,
+        }
+        return stats
+
+
+# Identificadores de sesión aceptados desde cookies, encabezados o el cuerpo de la petición
+_SESSION_ID = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def resolve_session_id(*candidates: Optional[str]) -> Tuple[str, bool]:
+    """
+    Primer identificador de sesión válido entre los candidatos, o uno nuevo.
+
+    Returns:
+        (id de sesión, True si se creó uno nuevo)
+    """
+    for candidate in candidates:
+        if candidate and _SESSION_ID.match(candidate):
+            return candidate, False
+    return uuid.uuid4().hex, True
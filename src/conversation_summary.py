@@ -0,0 +1,114 @@
+"""
+Resumen incremental de la conversación
+Los mensajes que salen de la última vuelta se pliegan en una lista corta de
+puntos ("«qué parques hay» → se mostraron: A, B"), sin repetir lugares ya
+listados, y el resumen se recorta a un presupuesto de tokens al armar el prompt
+"""
+
+import re
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from src.place_retrieval import estimate_tokens
+from src.text_normalization import normalize_text
+
+# Puntos del resumen que se conservan (los más antiguos se descartan primero)
+MAX_SUMMARY_ITEMS = 12
+# Lugares recordados para no volver a listarlos en el resumen
+MAX_SEEN_PLACES = 200
+# Nombres de lugares escritos por punto del resumen
+MAX_PLACES_PER_ITEM = 6
+QUESTION_CHARS = 80
+ANSWER_CHARS = 100
+
+_BOLD = re.compile(r'\*\*([^*\n]{2,80})\*\*')
+_LIST_ITEM = re.compile(r'^\s*(?:[*\-•]|\d+[.)])\s+', re.MULTILINE)
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = ' '.join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + '…'
+
+
+def mentioned_places(text: str) -> List[str]:
+    """Nombres resaltados en **negrita** (así escriben los lugares Gemini y el enrutador), sin repetir"""
+    names = []
+    seen = set()
+    for name in _BOLD.findall(text):
+        name = name.strip(' :-')
+        key = normalize_text(name)
+        if key and key not in seen and not key[0].isdigit():
+            seen.add(key)
+            names.append(name)
+    return names
+
+
+class RollingSummary:
+    """Puntos del resumen y lugares ya mencionados de una conversación"""
+
+    __slots__ = ('items', 'places', 'pending')
+
+    def __init__(self, items: Iterable[str] = (), places: Iterable[str] = (), pending: bool = False):
+        self.items: Deque[str] = deque(items, maxlen=MAX_SUMMARY_ITEMS)
+        self.places: Deque[str] = deque(places, maxlen=MAX_SEEN_PLACES)
+        self.pending = pending  # El último punto es una pregunta todavía sin respuesta plegada
+
+    def fold(self, is_user: bool, text: str):
+        """Plegar un mensaje (ya compactado) que sale de la última vuelta"""
+        if is_user:
+            self.items.append(f"«{_shorten(text, QUESTION_CHARS)}»")
+            self.pending = True
+            return
+
+        answer = self._summarize_answer(text)
+        if self.pending and self.items:
+            self.items[-1] = f"{self.items[-1]} → {answer}" if answer else self.items[-1]
+        elif answer:
+            self.items.append(answer)
+        self.pending = False
+
+    def _summarize_answer(self, text: str) -> Optional[str]:
+        names = mentioned_places(text)
+        if names:
+            seen = set(self.places)
+            new = [name for name in names if normalize_text(name) not in seen]
+            self.places.extend(normalize_text(name) for name in new)
+            if not new:
+                # Listado repetido: los lugares ya constan en el resumen
+                return "repitió lugares ya mencionados"
+            shown = ', '.join(new[:MAX_PLACES_PER_ITEM])
+            if len(new) > MAX_PLACES_PER_ITEM:
+                shown += f" y {len(new) - MAX_PLACES_PER_ITEM} más"
+            verb = "listó" if len(_LIST_ITEM.findall(text)) >= 2 else "habló de"
+            return f"{verb}: {shown}"
+        first = _SENTENCE_END.split(text.strip(), 1)[0] if text.strip() else ''
+        return f"respondió: {_shorten(first, ANSWER_CHARS)}" if first else None
+
+    def render(self, max_tokens: int) -> str:
+        """Línea de resumen con los puntos más recientes que caben en el presupuesto ('' si no hay)"""
+        chosen: List[str] = []
+        used = estimate_tokens("Resumen: ")
+        for item in reversed(self.items):
+            cost = estimate_tokens(item) + 1
+            if used + cost > max_tokens:
+                break
+            chosen.append(item)
+            used += cost
+        return f"Resumen: {' | '.join(reversed(chosen))}" if chosen else ''
+
+    @property
+    def size(self) -> int:
+        """Bytes aproximados del resumen (para el tope de memoria del almacén)"""
+        return sum(len(item.encode('utf-8')) for item in self.items) + sum(len(p) for p in self.places)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {'i': list(self.items), 'p': list(self.places), 'q': self.pending}
+
+    @classmethod
+    def from_json(cls, data: Optional[Dict[str, Any]]) -> 'RollingSummary':
+        if not isinstance(data, dict):
+            return cls()
+        return cls(data.get('i') or (), data.get('p') or (), bool(data.get('q')))
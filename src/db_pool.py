@@ -0,0 +1,249 @@
+"""
+Pool de conexiones MySQL compartido
+Reutiliza conexiones abiertas en lugar de abrir una conexión TCP + autenticación por consulta
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Dict, Any
+
+
+class PoolTimeoutError(Exception):
+    """No se pudo obtener una conexión del pool dentro del tiempo de espera"""
+
+
+class _PoolEntry:
+    """Conexión física administrada por el pool"""
+
+    __slots__ = ('raw', 'uses', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PooledConnection:
+    """
+    Préstamo de una conexión del pool.
+
+    Se comporta como la conexión original (cursor, commit, etc.), pero close()
+    la devuelve al pool en lugar de cerrarla. Llamar close() varias veces es seguro.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get('_entry')
+        if entry is None:
+            raise AttributeError(f"La conexión ya fue devuelta al pool ({name})")
+        return getattr(entry.raw, name)
+
+    def close(self):
+        """Devolver la conexión al pool"""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool.release(entry)
+
+    def discard(self):
+        """Devolver la conexión marcándola como defectuosa (se cerrará)"""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool.release(entry, broken=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Red de seguridad: si alguien olvida cerrar, no perder el cupo del pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones con verificación de salud, tiempo máximo de espera
+    para obtener una conexión y reciclaje después de N usos.
+    """
+
+    def __init__(self,
+                 factory: Callable[[], Any],
+                 max_size: int = 8,
+                 timeout: float = 5.0,
+                 max_uses: int = 500,
+                 health_check_interval: float = 30.0):
+        """
+        Args:
+            factory: Función que abre una conexión física nueva
+            max_size: Número máximo de conexiones abiertas simultáneamente
+            timeout: Segundos máximos de espera para obtener una conexión
+            max_uses: Préstamos tras los cuales la conexión se cierra y se reemplaza
+            health_check_interval: Segundos de inactividad tras los cuales se verifica la conexión antes de prestarla
+        """
+        self._factory = factory
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiters = 0
+
+        self._stats = {
+            'borrows': 0,
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'connect_errors': 0,
+            'total_wait_time': 0.0,
+            'max_wait_time': 0.0,
+        }
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Obtener una conexión del pool, esperando como máximo `timeout` segundos"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            entry = None
+            create = False
+            with self._lock:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"No hay conexiones libres en el pool después de {timeout:.1f}s "
+                            f"({self._in_use} en uso, {self._waiters} esperando)"
+                        )
+                    self._waiters += 1
+                    try:
+                        self._available.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+                self._in_use += 1
+
+            if create:
+                try:
+                    entry = _PoolEntry(self._factory())
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._stats['connect_errors'] += 1
+                        self._available.notify()
+                    raise
+                with self._lock:
+                    self._stats['created'] += 1
+            elif not self._is_healthy(entry):
+                self._close_entry(entry, 'health_check_failures')
+                continue
+
+            waited = time.monotonic() - start
+            with self._lock:
+                self._stats['borrows'] += 1
+                self._stats['total_wait_time'] += waited
+                if waited > self._stats['max_wait_time']:
+                    self._stats['max_wait_time'] = waited
+            return PooledConnection(self, entry)
+
+    def release(self, entry: _PoolEntry, broken: bool = False):
+        """Devolver una conexión al pool (o cerrarla si está defectuosa o agotada)"""
+        entry.uses += 1
+        entry.last_used = time.monotonic()
+
+        if not broken:
+            try:
+                # Descartar resultados sin leer para que el siguiente préstamo empiece limpio
+                entry.raw.consume_results()
+            except Exception:
+                broken = True
+
+        if broken:
+            self._close_entry(entry, 'discarded')
+            return
+        if self.max_uses and entry.uses >= self.max_uses:
+            self._close_entry(entry, 'recycled')
+            return
+
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append(entry)
+            self._available.notify()
+
+    def _is_healthy(self, entry: _PoolEntry) -> bool:
+        """Verificar la conexión solo si estuvo inactiva más del intervalo configurado"""
+        if time.monotonic() - entry.last_used < self.health_check_interval:
+            return True
+        try:
+            entry.raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close_entry(self, entry: _PoolEntry, reason: str):
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._in_use -= 1
+            self._stats[reason] += 1
+            self._available.notify()
+
+    def close_all(self):
+        """Cerrar todas las conexiones inactivas (las prestadas se cierran al devolverse)"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for entry in idle:
+            try:
+                entry.raw.close()
+            except Exception:
+                pass
+
+    def metrics(self) -> Dict[str, Any]:
+        """Métricas del pool para el dashboard"""
+        with self._lock:
+            stats = dict(self._stats)
+            borrows = stats['borrows']
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiters': self._waiters,
+                'borrows': borrows,
+                'created': stats['created'],
+                'recycled': stats['recycled'],
+                'discarded': stats['discarded'],
+                'health_check_failures': stats['health_check_failures'],
+                'timeouts': stats['timeouts'],
+                'connect_errors': stats['connect_errors'],
+                'avg_wait_ms': round(stats['total_wait_time'] / borrows * 1000, 3) if borrows else 0,
+                'max_wait_ms': round(stats['max_wait_time'] * 1000, 3),
+            }
@@ -0,0 +1,170 @@
+"""
+Índice geoespacial de lugares
+Rejilla uniforme de latitud/longitud sobre arreglos NumPy: los puntos se ordenan por
+celda y cada consulta solo mide distancias a los lugares de las celdas cercanas
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.place_index import PlaceRecord
+
+EARTH_RADIUS_M = 6_371_000.0
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+
+# Lugares promedio por celda al elegir el tamaño de la rejilla automáticamente
+POINTS_PER_CELL = 4
+
+
+def _coordinate(value) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def format_distance(meters: float) -> str:
+    """Distancia legible: '350 m' o '1.2 km'"""
+    if meters < 1000:
+        return f"{int(round(meters / 10.0) * 10)} m"
+    return f"{meters / 1000:.1f} km"
+
+
+def haversine_m(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distancia en metros desde (lat, lon) a cada punto"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons - lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    """
+    k vecinos más cercanos y búsqueda por radio sobre una rejilla de celdas.
+
+    La búsqueda recorre anillos de celdas alrededor del punto hasta que los k mejores
+    candidatos están más cerca que cualquier celda todavía no visitada.
+    """
+
+    def __init__(self, records: Iterable[PlaceRecord], cell_degrees: Optional[float] = None):
+        """
+        Args:
+            records: Lugares; se ignoran los que no tienen coordenadas válidas
+            cell_degrees: Lado de cada celda en grados (None = según la densidad de puntos)
+        """
+        points = []
+        for record in records:
+            lat, lon = _coordinate(record.latitud), _coordinate(record.longitud)
+            if lat is not None and lon is not None and -90 <= lat <= 90 and -180 <= lon <= 180:
+                points.append((record, lat, lon))
+
+        lats = np.fromiter((p[1] for p in points), dtype=np.float64, count=len(points))
+        lons = np.fromiter((p[2] for p in points), dtype=np.float64, count=len(points))
+        if cell_degrees is None:
+            cell_degrees = self._auto_cell(lats, lons)
+        self.cell_degrees = cell_degrees
+
+        rows = np.floor(lats / cell_degrees).astype(np.int64)
+        cols = np.floor(lons / cell_degrees).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        self.records: Tuple[PlaceRecord, ...] = tuple(points[i][0] for i in order)
+        self.lats = lats[order]
+        self.lons = lons[order]
+        rows, cols = rows[order], cols[order]
+
+        # Celda -> rango [inicio, fin) en los arreglos ordenados
+        self._cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        start = 0
+        for i in range(1, len(order) + 1):
+            if i == len(order) or rows[i] != rows[start] or cols[i] != cols[start]:
+                self._cells[(int(rows[start]), int(cols[start]))] = (start, i)
+                start = i
+        self._bounds = (int(rows.min()), int(rows.max()), int(cols.min()), int(cols.max())) if len(order) else None
+
+    @staticmethod
+    def _auto_cell(lats: np.ndarray, lons: np.ndarray) -> float:
+        if len(lats) < 2:
+            return 0.01
+        area = max(float(np.ptp(lats)), 1e-4) * max(float(np.ptp(lons)), 1e-4)
+        side = math.sqrt(area * POINTS_PER_CELL / len(lats))
+        return min(max(side, 0.0005), 1.0)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _ring(self, row: int, col: int, ring: int) -> List[Tuple[int, int]]:
+        if ring == 0:
+            return [(row, col)]
+        cells = []
+        for c in range(col - ring, col + ring + 1):
+            cells.append((row - ring, c))
+            cells.append((row + ring, c))
+        for r in range(row - ring + 1, row + ring):
+            cells.append((r, col - ring))
+            cells.append((r, col + ring))
+        return cells
+
+    def nearby(self, lat: float, lon: float, k: int = 10,
+               radius_m: Optional[float] = None) -> List[Tuple[PlaceRecord, float]]:
+        """
+        Los k lugares más cercanos a (lat, lon), opcionalmente dentro de un radio.
+
+        Returns:
+            Lista de (lugar, distancia en metros) ordenada de menor a mayor distancia
+        """
+        if not self.records or k <= 0:
+            return []
+        row = math.floor(lat / self.cell_degrees)
+        col = math.floor(lon / self.cell_degrees)
+        min_row, max_row, min_col, max_col = self._bounds
+        last_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+        # Distancia mínima que cubre cada anillo (el grado de longitud se acorta con la latitud)
+        cell_m = self.cell_degrees * METERS_PER_DEGREE * max(math.cos(math.radians(min(abs(lat) + self.cell_degrees, 90))), 1e-6)
+
+        slices = []
+        found = 0
+        ring = 0
+        while ring <= last_ring:
+            if (2 * ring + 1) ** 2 > len(self._cells):
+                # El cuadrado ya abarca más celdas de las que existen (punto lejos de los
+                # lugares o rejilla dispersa): medir contra todos los puntos de una vez
+                slices = [np.arange(len(self.records))]
+                break
+            for cell in self._ring(row, col, ring):
+                span = self._cells.get(cell)
+                if span is not None:
+                    slices.append(np.arange(span[0], span[1]))
+                    found += span[1] - span[0]
+            covered = ring * cell_m
+            if radius_m is not None and covered >= radius_m:
+                break
+            if found >= k:
+                candidates = np.concatenate(slices)
+                distances = haversine_m(lat, lon, self.lats[candidates], self.lons[candidates])
+                # Los k mejores ya están más cerca que cualquier celda sin visitar
+                if np.partition(distances, k - 1)[k - 1] <= covered:
+                    break
+            ring += 1
+
+        if not slices:
+            return []
+        candidates = np.concatenate(slices)
+        distances = haversine_m(lat, lon, self.lats[candidates], self.lons[candidates])
+        if radius_m is not None:
+            inside = distances <= radius_m
+            candidates, distances = candidates[inside], distances[inside]
+        top = np.argsort(distances, kind='stable')[:k]
+        return [(self.records[candidates[i]], float(distances[i])) for i in top]
+
+    def nearby_place(self, record: PlaceRecord, k: int = 10,
+                     radius_m: Optional[float] = None) -> List[Tuple[PlaceRecord, float]]:
+        """Vecinos de un lugar del catálogo (sin incluirlo); [] si no tiene coordenadas"""
+        lat, lon = _coordinate(record.latitud), _coordinate(record.longitud)
+        if lat is None or lon is None:
+            return []
+        return [(r, d) for r, d in self.nearby(lat, lon, k + 1, radius_m) if r is not record][:k]
@@ -0,0 +1,98 @@
+"""
+Utilidades HTTP para respuestas cacheables
+ETags fuertes, peticiones condicionales (304 Not Modified), cursores opacos de
+paginación y compresión gzip/brotli
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+try:
+    import brotli  # Opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Por debajo de este tamaño comprimir no compensa
+MIN_COMPRESS_SIZE = 512
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag fuerte derivado de los datos que determinan el contenido"""
+    digest = hashlib.sha1('\x1f'.join(map(str, parts)).encode('utf-8')).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_for_encoding(etag: str, encoding: Optional[str]) -> str:
+    """Cada codificación es una representación distinta: su ETag fuerte lleva un sufijo"""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in ('-gzip', '-br'):
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True si If-None-Match incluye el ETag (en cualquiera de sus codificaciones)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    target = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == target for tag in if_none_match.split(','))
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Mejor codificación aceptada por el cliente: 'br' (si está disponible), 'gzip' o None"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    """Cursor de paginación opaco (base64 URL-safe de un JSON compacto)"""
+    raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Dict[str, Any]]:
+    """Contenido del cursor, o None si no es válido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        return None
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,285 @@
+"""
+Enrutador de intenciones del chat
+Reglas deterministas que responden desde el catálogo, sin llamar a Gemini, los
+mensajes que no necesitan redacción: saludos, "mostrar todos", "¿qué parques hay?"
+y "¿dónde queda X?". Un mensaje solo se enruta si todas sus palabras encajan en la
+regla; cualquier palabra de más ("¿qué parques hay para niños?") lo deja para Gemini.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.place_index import PlaceIndex, PlaceRecord
+from src.place_search import PlaceSearchIndex
+from src.semantic_cache import STOPWORDS
+from src.text_normalization import tokenize
+
+# Mensajes de cortesía, con los tipos de get_simple_response: (tipo, palabras que lo
+# identifican, palabras que solo lo acompañan). "mañana", "luego" o "noches" solas no
+# son cortesía: "¿y mañana?" o "¿y de noche?" son preguntas
+SMALL_TALK = (
+    ('greeting', frozenset('hola hello hi hey saludos tal buen buenos buenas'.split()),
+     frozenset('dia dias tarde tardes noche noches'.split())),
+    ('response', frozenset('gracias thanks thank ok okay vale perfecto entendido genial excelente'.split()),
+     frozenset('you muchas muchisimas'.split())),
+    ('farewell', frozenset('adios chao chau bye hasta vemos'.split()),
+     frozenset('luego pronto nos manana'.split())),
+)
+_SMALL_TALK_WORDS = frozenset().union(*(triggers | extra for _, triggers, extra in SMALL_TALK))
+
+# Palabras que nombran una categoría del catálogo, en singular y sin tildes. Solo estas
+# enrutan un listado: los alias sueltos con los que se orienta el prompt ("plaza" ->
+# Parque, "tienda" -> centros comerciales) darían un listado de otra cosa
+CATEGORY_NAMES = {
+    'parque': 'Parque',
+    'naturaleza': 'Naturaleza',
+    'patrimonio': 'Patrimonio',
+    'centro comercial': 'centros-comerciales',
+    'mall': 'centros-comerciales',
+    'shopping': 'centros-comerciales',
+    'estadio': 'Estadio',
+}
+
+# Palabras que piden un listado ("¿qué parques hay?", "muéstrame las plazas")
+LIST_WORDS = frozenset("""
+    hay lista listar listado listame muestrame muestra mostrar ensename ver cuales que tienes
+    tienen tiene existen conoces registrados registradas disponibles huancayo lugares lugar
+    sitios sitio opciones todos todas
+""".split())
+# Palabras que por sí solas piden un listado; alguna es obligatoria salvo que el mensaje
+# sea solo el nombre de la categoría ("parques"). "que" o "lugares" no alcanzan:
+# "¿qué es esto?" o "dime algo de la plaza" son preguntas para Gemini
+LIST_TRIGGERS = frozenset("""
+    hay lista listar listado listame muestrame muestra mostrar ensename ver cuales tienes
+    tienen existen conoces registrados registradas disponibles opciones todos todas
+""".split())
+# Palabras que piden la ubicación de un lugar; alguna de LOCATION_TRIGGERS es obligatoria
+LOCATION_WORDS = frozenset('donde queda quedan esta ubica ubicado ubicada encuentra ubicacion direccion'.split())
+LOCATION_TRIGGERS = frozenset(('donde', 'ubicacion', 'direccion'))
+ALL_WORDS = frozenset(('todos', 'todas'))
+
+# Lugares escritos en la respuesta de un listado (las tarjetas llevan todos)
+LIST_LIMIT = 15
+DESCRIPTION_CHARS = 110
+
+
+def singular(word: str) -> str:
+    """Singular aproximado de una palabra normalizada ("parques" -> "parque", "comerciales" -> "comercial")"""
+    if len(word) > 4 and word.endswith('es') and word[-3] not in 'aeiou':
+        return word[:-2]
+    return word[:-1] if len(word) > 3 and word.endswith('s') else word
+
+
+def detect_category_name(text) -> Optional[str]:
+    """Categoría que el texto nombra con palabras completas ("parques", "centros comerciales") o None"""
+    joined = f" {' '.join(singular(w) for w in tokenize(text))} "
+    for phrase, category in CATEGORY_NAMES.items():
+        if f' {phrase} ' in joined:
+            return category
+    return None
+
+
+def _count_places(total: int) -> str:
+    return f"{total} lugar" if total == 1 else f"{total} lugares"
+
+
+def _shorten(text, limit: int) -> str:
+    text = ' '.join(str(text).split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + '…'
+
+
+class RoutedAnswer:
+    """Respuesta resuelta localmente: texto, lugares para las tarjetas y filtros aplicados"""
+
+    __slots__ = ('intent', 'text', 'records', 'categories', 'category', 'place_name')
+
+    def __init__(self, intent: str, text: str, records: Sequence[PlaceRecord] = (),
+                 categories: Sequence[Optional[str]] = (), category: Optional[str] = None,
+                 place_name: Optional[str] = None):
+        self.intent = intent
+        self.text = text
+        self.records = records
+        self.categories = categories  # Categoría mostrada de cada registro
+        self.category = category
+        self.place_name = place_name
+
+
+class IntentRouter:
+    """
+    Clasificador por reglas sobre las palabras normalizadas del mensaje.
+
+    Intenciones: 'greeting', 'response' y 'farewell' (cortesía), 'list_all',
+    'list_category' y 'location'. Lleva la cuenta de cuántos mensajes resolvió
+    cada regla y cuántos siguieron hacia Gemini.
+    """
+
+    def __init__(self, detect_category: Callable[[str], Optional[str]],
+                 detect_place: Callable[[str], Optional[str]],
+                 small_talk: Callable[[str, str], str], list_limit: int = LIST_LIMIT):
+        """
+        Args:
+            detect_category: Categoría mencionada en un texto (o None)
+            detect_place: Nombre de lugar mencionado en un texto (o None)
+            small_talk: Texto de cortesía para un tipo de mensaje y el mensaje original
+            list_limit: Máximo de lugares escritos en la respuesta de un listado
+        """
+        self.detect_category = detect_category
+        self.detect_place = detect_place
+        self.small_talk = small_talk
+        self.list_limit = list_limit
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {'messages': 0, 'routed': 0, 'passed': 0}
+        self._by_intent: Dict[str, int] = {}
+
+    def _is_category_word(self, *words: str) -> bool:
+        phrase = ' '.join(words)
+        stemmed = ' '.join(singular(w) for w in words)
+        return bool(self.detect_category(phrase) or self.detect_category(stemmed))
+
+    def _strip_category(self, words: List[str]) -> List[str]:
+        """Quitar las palabras de categoría ("parques", "centro comercial")"""
+        rest = []
+        i = 0
+        while i < len(words):
+            if self._is_category_word(words[i]):
+                i += 1
+            elif (i + 1 < len(words) and not self._is_category_word(words[i + 1])
+                  and self._is_category_word(words[i], words[i + 1])):
+                i += 2
+            else:
+                rest.append(words[i])
+                i += 1
+        return rest
+
+    @staticmethod
+    def _strip_place(words: List[str], place_name: str) -> Optional[List[str]]:
+        """Quitar las palabras del nombre del lugar; None si no aparecen todas"""
+        rest = list(words)
+        for word in tokenize(place_name):
+            if word not in rest:
+                return None
+            rest.remove(word)
+        return rest
+
+    def classify(self, message: str, category: Optional[str] = None) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        Intención del mensaje como (intención, categoría, lugar), o None si no hay
+        una regla que lo cubra por completo.
+
+        Args:
+            message: Texto del usuario
+            category: Categoría ya detectada o elegida en la interfaz
+        """
+        words = tokenize(message)
+        if not words:
+            return None
+
+        for intent, triggers, extra in SMALL_TALK:
+            if triggers.intersection(words) and all(w in triggers or w in extra or w in STOPWORDS for w in words):
+                return intent, None, None
+
+        place_name = self.detect_place(message)
+        if place_name:
+            if not LOCATION_TRIGGERS.intersection(words):
+                return None
+            rest = self._strip_place(words, place_name)
+            if rest is None:
+                return None
+            if all(w in LOCATION_WORDS or w in STOPWORDS or w in _SMALL_TALK_WORDS for w in rest):
+                return 'location', None, place_name
+            return None
+
+        # La categoría que nombra el mensaje manda sobre la elegida en la interfaz
+        detected = self.detect_category(message)
+        category = detected or category
+        rest = self._strip_category(words) if category else words
+        if not all(w in LIST_WORDS or w in STOPWORDS or w in _SMALL_TALK_WORDS for w in rest):
+            return None
+        if category:
+            # La categoría elegida en la interfaz no convierte cualquier mensaje en un listado
+            if LIST_TRIGGERS.intersection(words) or (detected and not rest):
+                return 'list_category', category, None
+            return None
+        if ALL_WORDS.intersection(words):
+            return 'list_all', None, None
+        return None
+
+    def route(self, message: str, index: PlaceIndex, search: PlaceSearchIndex,
+              category: Optional[str] = None) -> Optional[RoutedAnswer]:
+        """
+        Respuesta armada desde el catálogo, o None si el mensaje necesita a Gemini.
+
+        Args:
+            message: Texto del usuario
+            index: Lugares del catálogo (búsqueda por nombre)
+            search: Índice de /api/places (filtro por categoría con los mismos alias)
+            category: Categoría ya detectada o elegida en la interfaz
+        """
+        intent = self.classify(message, category)
+        answer = self._answer(intent, message, index, search) if intent else None
+        with self._lock:
+            self._stats['messages'] += 1
+            if answer is None:
+                self._stats['passed'] += 1
+            else:
+                self._stats['routed'] += 1
+                self._by_intent[answer.intent] = self._by_intent.get(answer.intent, 0) + 1
+        return answer
+
+    def _answer(self, intent: Tuple[str, Optional[str], Optional[str]], message: str,
+                index: PlaceIndex, search: PlaceSearchIndex) -> Optional[RoutedAnswer]:
+        kind, category, place_name = intent
+        if kind in ('greeting', 'response', 'farewell'):
+            return RoutedAnswer(kind, self.small_talk(kind, message))
+
+        if kind == 'location':
+            place = index.find(place_name)
+            if place is None or not place.ubicacion:
+                return None
+            return RoutedAnswer(kind, self._location_text(place), [place],
+                                [place.categoria], place_name=place.nombre)
+
+        result = search.search('', category)
+        if not result.total:
+            return None
+        if kind == 'list_all':
+            registered = 'registrado' if result.total == 1 else 'registrados'
+            header = f"Tenemos **{_count_places(result.total)}** {registered} en Huancayo:"
+        else:
+            label = category.replace('-', ' ').lower()
+            header = f"Encontré **{_count_places(result.total)}** en la categoría **{label}**:"
+        return RoutedAnswer(kind, self._list_text(header, result.records, result.total),
+                            result.records, result.categories, category=category)
+
+    def _list_text(self, header: str, records: Sequence[PlaceRecord], total: int) -> str:
+        lines = [header, '']
+        for place in records[:self.list_limit]:
+            line = f"* **{place.nombre}**"
+            if place.descripcion:
+                line += f" - {_shorten(place.descripcion, DESCRIPTION_CHARS)}"
+            lines.append(line)
+        if total > self.list_limit:
+            lines.append(f"* … y {total - self.list_limit} más en las tarjetas de lugares")
+        lines += ['', '¿Sobre cuál te gustaría saber más?']
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _location_text(place: PlaceRecord) -> str:
+        lines = [f"📍 **{place.nombre}** se encuentra en las coordenadas {place.ubicacion}."]
+        if place.categoria:
+            lines.append(f"Categoría: **{place.categoria}**")
+        if place.descripcion:
+            lines += ['', _shorten(place.descripcion, 2 * DESCRIPTION_CHARS)]
+        if place.imagenes and place.imagenes[0][0]:
+            lines += ['', f"![{place.nombre}]({place.imagenes[0][0]})"]
+        return '\n'.join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        """Mensajes resueltos por regla y fracción que no llegó a Gemini"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats['by_intent'] = dict(self._by_intent)
+        stats['route_rate'] = round(stats['routed'] / stats['messages'], 3) if stats['messages'] else 0
+        return stats
@@ -0,0 +1,226 @@
+"""
+Markdown a HTML en una sola pasada, también por fragmentos
+El renderizador recibe el texto a medida que llega (por ejemplo, los fragmentos de
+Gemini en streaming) y devuelve HTML listo para enviar: listas con viñetas, títulos
+#/##/###, **negritas** e imágenes ![alt](url), aunque queden partidas entre dos
+fragmentos. Solo retiene lo mínimo que todavía puede cambiar de significado (un
+"**" sin cerrar, una imagen a medio llegar o el inicio de una línea) y escapa el
+texto, así que nunca emite una etiqueta a medias.
+
+La salida es la misma que la del format_response anterior para el mismo texto,
+salvo por el escapado de &, < y > y porque una imagen no puede cruzar un salto de
+línea (antes eso generaba atributos rotos).
+"""
+
+import html
+import re
+from typing import List
+
+IMAGE_STYLE = 'max-width: 100%; height: auto; border-radius: 8px; margin: 10px 0; box-shadow: 0 2px 8px rgba(0,0,0,0.1);'
+
+_IMAGE = re.compile(r'!\[([^\]\n]*)\]\(([^)\n]+)\)')
+# Comienzo de imagen que todavía puede completarse con más texto
+_IMAGE_PREFIX = re.compile(r'!(?:\[[^\]\n]*(?:\](?:\([^)\n]*)?)?)?')
+
+
+def _escape(text: str) -> str:
+    if '&' in text or '<' in text or '>' in text:
+        return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return text
+
+
+def _image(match) -> str:
+    alt = html.escape(match.group(1))
+    src = html.escape(match.group(2))
+    return f'<img src="{src}" alt="{alt}" style="{IMAGE_STYLE}">'
+
+
+def _inline_complete(text: str) -> str:
+    """Contenido de una negrita ya cerrada: texto escapado con sus imágenes"""
+    parts = []
+    last = 0
+    for match in _IMAGE.finditer(text):
+        parts.append(_escape(text[last:match.start()]))
+        parts.append(_image(match))
+        last = match.end()
+    parts.append(_escape(text[last:]))
+    return ''.join(parts)
+
+
+def _is_space(char: str) -> bool:
+    return char != '\n' and char.isspace()
+
+
+class MarkdownStream:
+    """
+    Renderizador incremental: feed() con cada fragmento y close() al final.
+
+    Cada línea de salida se separa de la anterior con <br>, las viñetas se agrupan
+    en <ul> y los títulos #, ## y ### se convierten en <h2>, <h3> y <h4>.
+    """
+
+    __slots__ = ('_buffer', '_closing', '_skip_spaces', '_in_list', '_started', '_fed')
+
+    def __init__(self):
+        self._buffer = ''
+        self._closing = None       # Etiqueta que cierra la línea en curso (None = al inicio de una línea)
+        self._skip_spaces = False  # Saltar los espacios tras "*", "-" o "#"
+        self._in_list = False
+        self._started = False      # Ya se emitió alguna línea (las siguientes llevan <br>)
+        self._fed = False
+
+    def feed(self, chunk: str) -> str:
+        """HTML que ya se puede enviar después de recibir `chunk` ('' si todo queda retenido)"""
+        if not chunk:
+            return ''
+        self._fed = True
+        self._buffer += chunk
+        return self._drain(final=False)
+
+    def close(self) -> str:
+        """HTML pendiente del final del texto, con la línea y la lista abiertas ya cerradas"""
+        out = [self._drain(final=True)]
+        if self._fed:
+            if self._closing is None:
+                # El texto terminaba en salto de línea: la última línea está vacía
+                self._open_line(out, '', 0, final=True)
+            out.append(self._closing)
+            if self._in_list:
+                self._emit_line(out, '</ul>')
+        self.__init__()
+        return ''.join(out)
+
+    def _emit_line(self, out: List[str], text: str):
+        out.append('<br>' + text if self._started else text)
+        self._started = True
+
+    def _open_line(self, out: List[str], buffer: str, pos: int, final: bool) -> int:
+        """
+        Decidir el tipo de bloque de la línea que empieza en `pos` y emitir su apertura.
+        Devuelve la posición donde empieza su contenido, o -1 si hace falta más texto.
+        """
+        end = buffer.find('\n', pos)
+        complete = end >= 0 or final
+        if end < 0:
+            end = len(buffer)
+        i = pos
+        while i < end and _is_space(buffer[i]):
+            i += 1
+        if i == end and not complete:
+            return -1
+        char = buffer[i] if i < end else ''
+
+        heading = 0
+        list_item = False
+        if char in ('*', '-'):
+            if i + 1 < end:
+                list_item = _is_space(buffer[i + 1])
+            elif not complete:
+                return -1
+        elif char == '#' and i == pos:
+            j = i
+            while j < end and j - i < 4 and buffer[j] == '#':
+                j += 1
+            if j - i <= 3:
+                if j < end:
+                    heading = j - i if _is_space(buffer[j]) else 0
+                elif not complete:
+                    return -1
+
+        if list_item:
+            if not self._in_list:
+                self._emit_line(out, '<ul>')
+                self._in_list = True
+            self._emit_line(out, '<li>')
+            self._closing = '</li>'
+            self._skip_spaces = True
+            return i + 1
+        if self._in_list:
+            self._emit_line(out, '</ul>')
+            self._in_list = False
+        if heading:
+            tag = f'h{heading + 1}'
+            self._emit_line(out, f'<{tag}>')
+            self._closing = f'</{tag}>'
+            self._skip_spaces = True
+            return i + heading
+        self._emit_line(out, '')
+        self._closing = ''
+        return pos
+
+    def _drain(self, final: bool) -> str:
+        buffer = self._buffer
+        size = len(buffer)
+        out: List[str] = []
+        pos = 0
+        while pos < size:
+            if self._closing is None:
+                start = self._open_line(out, buffer, pos, final)
+                if start < 0:
+                    break
+                pos = start
+                continue
+
+            if self._skip_spaces:
+                while pos < size and _is_space(buffer[pos]):
+                    pos += 1
+                if pos == size:
+                    break
+                self._skip_spaces = False
+
+            newline = buffer.find('\n', pos)
+            end = newline if newline >= 0 else size
+            line_done = newline >= 0 or final
+            bold = buffer.find('**', pos, end)
+            image = buffer.find('![', pos, end)
+            special = min(i for i in (bold, image, end) if i >= 0)
+
+            if special > pos:
+                hold = 0
+                if special == end and not line_done and buffer[end - 1] in '*!':
+                    hold = 1  # Podría ser el comienzo de "**" o de "!["
+                out.append(_escape(buffer[pos:special - hold]))
+                pos = special - hold
+                if hold:
+                    break
+                continue
+
+            if pos == end:
+                if newline < 0:
+                    break
+                out.append(self._closing)
+                self._closing = None
+                pos = newline + 1
+                continue
+
+            if pos == bold:
+                close = buffer.find('**', pos + 2, end)
+                if close >= 0:
+                    out.append('<strong>' + _inline_complete(buffer[pos + 2:close]) + '</strong>')
+                    pos = close + 2
+                elif line_done:
+                    out.append('**')
+                    pos += 2
+                else:
+                    break
+            else:
+                match = _IMAGE.match(buffer, pos, end)
+                if match:
+                    out.append(_image(match))
+                    pos = match.end()
+                elif line_done or _IMAGE_PREFIX.match(buffer, pos, end).end() < end:
+                    out.append('!')
+                    pos += 1
+                else:
+                    break
+
+        self._buffer = buffer[pos:]
+        return ''.join(out)
+
+
+def render_markdown(text: str) -> str:
+    """Texto completo de Markdown a HTML (la misma salida que enviar todo como un solo fragmento)"""
+    if not text:
+        return text
+    renderer = MarkdownStream()
+    return renderer.feed(text) + renderer.close()
@@ -0,0 +1,227 @@
+"""
+Métricas de latencia y contadores
+Histogramas de memoria fija con cubetas log-lineales (al estilo HDR: el error
+relativo está acotado en todo el rango, de microsegundos a minutos), percentiles
+p50/p95/p99, contadores con etiquetas y exportación en el formato de texto de
+Prometheus para /metrics. Registrar una medición son unas pocas operaciones
+enteras bajo un lock por serie.
+"""
+
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 16 sub-cubetas por potencia de 2: error relativo de a lo sumo 1/16 (~6%)
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Mayor valor distinguible en microsegundos (2^28 µs ≈ 4,5 min); lo mayor va a la última cubeta
+MAX_MICROS = (1 << 28) - 1
+_BUCKETS = (MAX_MICROS.bit_length() - SUB_BUCKET_BITS - 1) * _SUB_BUCKETS + 2 * _SUB_BUCKETS
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _bucket_index(micros: int) -> int:
+    if micros < 2 * _SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * _SUB_BUCKETS + (micros >> shift)
+
+
+def _bucket_bounds(index: int) -> Tuple[int, int]:
+    """[inicio, fin) en microsegundos de la cubeta"""
+    if index < 2 * _SUB_BUCKETS:
+        return index, index + 1
+    shift = index // _SUB_BUCKETS - 1
+    top = index - shift * _SUB_BUCKETS
+    return top << shift, (top + 1) << shift
+
+
+class LatencyHistogram:
+    """Distribución de duraciones (en segundos) en un arreglo fijo de cubetas"""
+
+    __slots__ = ('counts', 'count', 'total', 'max', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        index = _bucket_index(min(max(int(seconds * 1e6), 0), MAX_MICROS))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram'):
+        with other._lock:
+            counts, count, total, peak = list(other.counts), other.count, other.total, other.max
+        with self._lock:
+            for i, n in enumerate(counts):
+                if n:
+                    self.counts[i] += n
+            self.count += count
+            self.total += total
+            self.max = max(self.max, peak)
+
+    def percentiles(self, quantiles: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        """Percentiles en segundos (punto medio de la cubeta, sin pasar del máximo observado)"""
+        with self._lock:
+            counts, count, peak = list(self.counts), self.count, self.max
+        result = {}
+        if not count:
+            return {q: 0.0 for q in quantiles}
+        for q in quantiles:
+            rank = max(math.ceil(q * count), 1)
+            seen = 0
+            for index, n in enumerate(counts):
+                seen += n
+                if seen >= rank:
+                    low, high = _bucket_bounds(index)
+                    result[q] = min((low + high) / 2e6, peak)
+                    break
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        """Conteo, promedio, máximo y p50/p95/p99 en milisegundos (para el dashboard)"""
+        p = self.percentiles()
+        count = self.count
+        return {
+            'count': count,
+            'avg_ms': round(self.total / count * 1000, 1) if count else 0,
+            'p50_ms': round(p[0.5] * 1000, 1),
+            'p95_ms': round(p[0.95] * 1000, 1),
+            'p99_ms': round(p[0.99] * 1000, 1),
+            'max_ms': round(self.max * 1000, 1),
+        }
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: LatencyHistogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.started)
+        return False
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _dashboard_label(key: LabelKey) -> str:
+    if len(key) == 1:
+        return key[0][1]
+    return ','.join(f'{k}={v}' for k, v in key) or 'all'
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    """
+    Registro de histogramas de latencia y contadores, por nombre y etiquetas.
+
+    Las series se crean al primer uso; los nombres se exportan con el prefijo
+    indicado (por ejemplo 'chatbot_stage_seconds{stage="validation"}').
+    """
+
+    def __init__(self, prefix: str = 'chatbot'):
+        self.prefix = prefix
+        self._histograms: Dict[Tuple[str, LabelKey], LatencyHistogram] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, text: str):
+        """Texto de ayuda de una métrica (línea # HELP de Prometheus)"""
+        self._help[name] = text
+
+    def histogram(self, name: str, **labels) -> LatencyHistogram:
+        key = (name, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def observe(self, name: str, seconds: float, **labels):
+        self.histogram(name, **labels).record(seconds)
+
+    def timer(self, name: str, **labels) -> _Timer:
+        """Context manager que registra la duración del bloque"""
+        return _Timer(self.histogram(name, **labels))
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def merged(self, name: str) -> LatencyHistogram:
+        """Todas las series de un histograma combinadas (sin importar las etiquetas)"""
+        combined = LatencyHistogram()
+        with self._lock:
+            series = [h for (n, _), h in self._histograms.items() if n == name]
+        for histogram in series:
+            combined.merge(histogram)
+        return combined
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumen de cada serie para el dashboard: {'latency': {nombre: {etiquetas: resumen}}, 'counters': ...}"""
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+        latency: Dict[str, Dict[str, Any]] = {}
+        for (name, key), histogram in sorted(histograms, key=lambda item: item[0]):
+            latency.setdefault(name, {})[_dashboard_label(key)] = histogram.summary()
+        totals: Dict[str, Dict[str, float]] = {}
+        for (name, key), value in sorted(counters, key=lambda item: item[0]):
+            totals.setdefault(name, {})[_dashboard_label(key)] = value
+        return {'latency': latency, 'counters': totals}
+
+    def prometheus(self) -> str:
+        """Todas las series en el formato de texto de Prometheus (histogramas como summary)"""
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            counters = sorted(self._counters.items(), key=lambda item: item[0])
+        lines: List[str] = []
+        current = None
+        for (name, key), histogram in histograms:
+            metric = f"{self.prefix}_{name}"
+            if name != current:
+                current = name
+                if name in self._help:
+                    lines.append(f"# HELP {metric} {self._help[name]}")
+                lines.append(f"# TYPE {metric} summary")
+            for q, value in histogram.percentiles().items():
+                lines.append(f"{metric}{_format_labels(key, ('quantile', str(q)))} {value:.6f}")
+            lines.append(f"{metric}_sum{_format_labels(key)} {histogram.total:.6f}")
+            lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        current = None
+        for (name, key), value in counters:
+            metric = f"{self.prefix}_{name}"
+            if name != current:
+                current = name
+                if name in self._help:
+                    lines.append(f"# HELP {metric} {self._help[name]}")
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(key)} {value:g}")
+        return '\n'.join(lines) + '\n'
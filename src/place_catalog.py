@@ -0,0 +1,206 @@
+"""
+Catálogo de lugares en memoria
+Foto inmutable de locaciones, sus imágenes y columnas, compartida por todo el proceso
+y refrescada en segundo plano solo cuando cambia la base de datos
+"""
+
+import hashlib
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, List, Optional, Tuple
+
+# Columnas que, si existen, sirven como marca de última actualización
+UPDATED_AT_COLUMNS = ('updated_at', 'fecha_actualizacion', 'actualizado_en')
+
+
+class CatalogSnapshot:
+    """
+    Foto inmutable del catálogo.
+
+    Nunca se modifica después de creada: cuando la base de datos cambia se construye
+    una nueva y se reemplaza la referencia completa, así los lectores no necesitan locks.
+    """
+
+    __slots__ = ('version', 'watermark', 'status', 'columns', 'places', 'images', 'names', 'loaded_at')
+
+    def __init__(self, version: str, watermark, status: str, columns: Tuple[str, ...] = (),
+                 places: tuple = (), images: Optional[dict] = None):
+        """
+        Args:
+            version: Identificador estable derivado de la marca de agua
+            watermark: Valor comparado en cada refresco para detectar cambios
+            status: 'con_mysql', 'sin_mysql' o 'error_mysql'
+            columns: Columnas de la tabla locaciones (resultado de DESCRIBE)
+            places: Filas de locaciones como mapeos {columna: valor}, ordenadas por nombre
+            images: {locacion_id: ((url_imagen, descripcion), ...)} ordenadas por id
+        """
+        self.version = version
+        self.watermark = watermark
+        self.status = status
+        self.columns = columns
+        self.places = places
+        self.images = MappingProxyType(images or {})
+        self.names = tuple(p['nombre'] for p in places if p.get('nombre'))
+        self.loaded_at = time.time()
+
+    @property
+    def available(self) -> bool:
+        return self.status == 'con_mysql'
+
+    @property
+    def total_images(self) -> int:
+        return sum(len(imgs) for imgs in self.images.values())
+
+
+def _version_from(watermark) -> str:
+    return hashlib.sha1(repr(watermark).encode('utf-8')).hexdigest()[:12]
+
+
+class PlaceCatalog:
+    """
+    Administra la foto vigente del catálogo.
+
+    La primera lectura carga el catálogo de forma síncrona; después un hilo en segundo
+    plano compara periódicamente una marca de agua barata (última actualización o
+    CHECKSUM TABLE) y solo recarga cuando cambió.
+    """
+
+    def __init__(self, connection_factory: Callable, refresh_interval: float = 60.0):
+        """
+        Args:
+            connection_factory: Función que devuelve una conexión MySQL (o None si no hay)
+            refresh_interval: Segundos entre verificaciones de la marca de agua
+        """
+        self._connection_factory = connection_factory
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self.stats = {'checks': 0, 'reloads': 0, 'errors': 0}
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Foto vigente del catálogo (no consulta MySQL salvo en la primera carga)"""
+        snap = self._snapshot
+        if snap is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self.refresh(force=True)
+                    self._start_background()
+                snap = self._snapshot
+        return snap
+
+    def on_refresh(self, callback: Callable[[CatalogSnapshot], None]):
+        """
+        Registrar una función que recibe cada foto nueva apenas se publica
+        (para recalcular datos derivados de una versión del catálogo)
+        """
+        self._listeners.append(callback)
+
+    def _publish(self, snapshot: CatalogSnapshot):
+        # Reemplazo atómico de la referencia: los lectores ven la foto vieja o la nueva
+        self._snapshot = snapshot
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Error en un observador del catálogo: {e}")
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Verificar la marca de agua y recargar si cambió.
+
+        Returns:
+            True si se publicó una foto nueva
+        """
+        with self._refresh_lock:
+            return self._refresh(force)
+
+    def _refresh(self, force: bool) -> bool:
+        self.stats['checks'] += 1
+        conn = self._connection_factory()
+        if not conn:
+            if self._snapshot is None:
+                self._publish(CatalogSnapshot('sin_mysql', None, 'sin_mysql'))
+                return True
+            return False
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DESCRIBE locaciones")
+            columns = tuple(col[0] for col in cursor.fetchall())
+            watermark = self._read_watermark(cursor, columns)
+
+            current = self._snapshot
+            if not force and current is not None and current.available and current.watermark == watermark:
+                return False
+
+            snapshot = self._load(cursor, columns, watermark)
+            self._publish(snapshot)
+            self.stats['reloads'] += 1
+            print(f"Catálogo de lugares cargado: {len(snapshot.places)} lugares (versión {snapshot.version})")
+            return True
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Error al refrescar el catálogo de lugares: {e}")
+            if self._snapshot is None:
+                self._publish(CatalogSnapshot('error_mysql', None, 'error_mysql'))
+                return True
+            return False
+        finally:
+            conn.close()
+
+    def invalidate(self):
+        """Forzar la recarga completa del catálogo"""
+        self.refresh(force=True)
+
+    def stop(self):
+        self._stop.set()
+
+    def _read_watermark(self, cursor, columns):
+        """Marca de agua barata para saber si el catálogo cambió"""
+        updated_col = next((c for c in UPDATED_AT_COLUMNS if c in columns), None)
+        if updated_col:
+            cursor.execute(f"SELECT COUNT(*), MAX({updated_col}) FROM locaciones")
+            lugares = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*), MAX(id) FROM locacion_imagenes")
+            imagenes = cursor.fetchone()
+            return (columns, tuple(lugares), tuple(imagenes))
+
+        cursor.execute("CHECKSUM TABLE locaciones, locacion_imagenes")
+        return (columns, tuple(tuple(row) for row in cursor.fetchall()))
+
+    def _load(self, cursor, columns, watermark) -> CatalogSnapshot:
+        cursor.execute("SELECT * FROM locaciones ORDER BY nombre")
+        places = tuple(MappingProxyType(dict(zip(columns, row))) for row in cursor.fetchall())
+
+        images = {}
+        try:
+            cursor.execute("""
+                SELECT locacion_id, url_imagen, descripcion
+                FROM locacion_imagenes
+                ORDER BY locacion_id, id
+            """)
+            for locacion_id, url_imagen, descripcion in cursor.fetchall():
+                images.setdefault(locacion_id, []).append((url_imagen, descripcion))
+        except Exception as e:
+            print(f"Error al obtener imágenes: {e}")
+
+        images = {key: tuple(value) for key, value in images.items()}
+        return CatalogSnapshot(_version_from(watermark), watermark, 'con_mysql', columns, places, images)
+
+    def _start_background(self):
+        if self._thread is not None or not self.refresh_interval:
+            return
+        self._thread = threading.Thread(target=self._run, name='place-catalog-refresh', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error en el refresco del catálogo: {e}")
@@ -0,0 +1,110 @@
+"""
+Índice tipado de lugares
+Registros compactos (__slots__) construidos una vez por versión del catálogo, con
+búsqueda por id, nombre normalizado y categoría sin recorrer ni parsear texto
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from src.place_repository import format_ubicacion
+from src.text_normalization import normalize_text
+
+
+class PlaceRecord:
+    """Un lugar del catálogo con sus campos ya normalizados para comparar"""
+
+    __slots__ = ('id', 'nombre', 'nombre_norm', 'categoria', 'categoria_norm',
+                 'descripcion', 'latitud', 'longitud', 'imagenes')
+
+    def __init__(self, id, nombre: str, categoria: Optional[str] = None, descripcion: Optional[str] = None,
+                 latitud=None, longitud=None, imagenes: Tuple[Tuple[str, Any], ...] = ()):
+        self.id = id
+        self.nombre = nombre
+        self.nombre_norm = normalize_text(nombre)
+        self.categoria = categoria
+        self.categoria_norm = normalize_text(categoria)
+        self.descripcion = descripcion
+        self.latitud = latitud
+        self.longitud = longitud
+        self.imagenes = imagenes
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any], images: Sequence[Tuple[str, Any]] = ()) -> 'PlaceRecord':
+        """Registro a partir de una fila de locaciones ({columna: valor})"""
+        return cls(
+            row.get('id'),
+            str(row.get('nombre') or ''),
+            row.get('categoria'),
+            row.get('descripcion'),
+            row.get('latitud'),
+            row.get('longitud'),
+            tuple(images),
+        )
+
+    @property
+    def ubicacion(self) -> Optional[str]:
+        return format_ubicacion(self.latitud, self.longitud)
+
+    def __repr__(self):
+        return f"PlaceRecord({self.id!r}, {self.nombre!r})"
+
+
+class PlaceIndex:
+    """
+    Colección inmutable de lugares indexada por id, nombre normalizado y categoría.
+
+    Si dos lugares comparten nombre normalizado, la búsqueda por nombre devuelve el
+    primero en el orden del catálogo.
+    """
+
+    __slots__ = ('records', 'by_id', 'by_name', 'by_category')
+
+    def __init__(self, records: Iterable[PlaceRecord] = ()):
+        self.records: Tuple[PlaceRecord, ...] = tuple(records)
+        self.by_id: Dict[Any, PlaceRecord] = {}
+        self.by_name: Dict[str, PlaceRecord] = {}
+        by_category: Dict[str, List[PlaceRecord]] = {}
+        for record in self.records:
+            if record.id is not None:
+                self.by_id.setdefault(record.id, record)
+            if record.nombre_norm:
+                self.by_name.setdefault(record.nombre_norm, record)
+            by_category.setdefault(record.categoria_norm, []).append(record)
+        self.by_category: Dict[str, Tuple[PlaceRecord, ...]] = {k: tuple(v) for k, v in by_category.items()}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping[str, Any]],
+                  images: Optional[Mapping[Any, Sequence[Tuple[str, Any]]]] = None) -> 'PlaceIndex':
+        """Índice a partir de las filas del catálogo y sus imágenes {id: ((url, desc), ...)}"""
+        images = images or {}
+        return cls(
+            PlaceRecord.from_row(row, images.get(row.get('id'), ()))
+            for row in rows if row.get('nombre')
+        )
+
+    def get(self, place_id) -> Optional[PlaceRecord]:
+        return self.by_id.get(place_id)
+
+    def find(self, name: str) -> Optional[PlaceRecord]:
+        """Lugar por nombre, sin importar tildes ni mayúsculas"""
+        return self.by_name.get(normalize_text(name))
+
+    def in_category(self, category: str) -> Tuple[PlaceRecord, ...]:
+        """Lugares cuya categoría es exactamente `category` (sin importar tildes)"""
+        return self.by_category.get(normalize_text(category), ())
+
+    @property
+    def names(self) -> List[str]:
+        return [record.nombre for record in self.records]
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and normalize_text(name) in self.by_name
+
+    def __iter__(self) -> Iterator[PlaceRecord]:
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __bool__(self) -> bool:
+        return bool(self.records)
@@ -0,0 +1,188 @@
+"""
+Detección de nombres de lugares en texto
+Autómata Aho-Corasick sobre palabras normalizadas: encuentra todos los nombres
+conocidos en una sola pasada lineal, sin importar cuántos lugares haya en el catálogo
+"""
+
+import re
+from collections import deque
+from typing import Any, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src.text_normalization import strip_accents, tokenize
+
+_WORDS = re.compile(r'\w+')
+
+
+class AhoCorasick:
+    """
+    Autómata Aho-Corasick genérico sobre secuencias de símbolos (palabras o caracteres).
+
+    Cada patrón es una secuencia de símbolos con un valor asociado; iter_matches
+    recorre el texto una sola vez y reporta todas las coincidencias, incluso solapadas.
+    """
+
+    __slots__ = ('_goto', '_fail', '_out')
+
+    def __init__(self, patterns: Iterable[Tuple[Sequence[Hashable], Any]]):
+        goto = [{}]
+        outputs = [[]]
+
+        for symbols, value in patterns:
+            if not symbols:
+                continue
+            state = 0
+            for symbol in symbols:
+                nxt = goto[state].get(symbol)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][symbol] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append((len(symbols), value))
+
+        # Enlaces de fallo por recorrido en anchura
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and symbol not in goto[f]:
+                    f = fail[f]
+                candidate = goto[f].get(symbol, 0)
+                fail[nxt] = candidate if candidate != nxt else 0
+                outputs[nxt].extend(outputs[fail[nxt]])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(out) for out in outputs]
+
+    def step(self, state: int, symbol: Hashable) -> int:
+        """Avanzar el autómata un símbolo (útil para procesar texto incremental)"""
+        goto = self._goto
+        while state and symbol not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(symbol, 0)
+
+    def outputs(self, state: int) -> Tuple[Tuple[int, Any], ...]:
+        """Patrones (longitud, valor) que terminan en este estado"""
+        return self._out[state]
+
+    def iter_matches(self, symbols: Sequence[Hashable], state: int = 0) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Recorrer la secuencia y producir (inicio, fin, valor) por cada coincidencia.
+        Los índices son posiciones en `symbols` (fin exclusivo).
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        for i, symbol in enumerate(symbols):
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            if out[state]:
+                for length, value in out[state]:
+                    yield i + 1 - length, i + 1, value
+
+
+class PlaceMatcher:
+    """
+    Buscador de nombres de lugares compilado una vez.
+
+    Los nombres y el texto se comparan sin tildes ni mayúsculas y siempre por palabras
+    completas ("Plaza Vea" no coincide dentro de "Plaza Veana").
+    """
+
+    def __init__(self, names: Iterable[str]):
+        patterns = []
+        seen = set()
+        for name in names:
+            if not name:
+                continue
+            key = tuple(tokenize(name))
+            if key and key not in seen:
+                seen.add(key)
+                patterns.append((key, name))
+        self.size = len(patterns)
+        self._automaton = AhoCorasick(patterns)
+
+    @property
+    def automaton(self) -> AhoCorasick:
+        return self._automaton
+
+    def find_all(self, text: str) -> List[str]:
+        """Nombres encontrados en el texto, sin repetir y en orden de aparición"""
+        if not text or not self.size:
+            return []
+        found = []
+        seen = set()
+        for _, _, name in self._automaton.iter_matches(tokenize(text)):
+            if name not in seen:
+                seen.add(name)
+                found.append(name)
+        return found
+
+    def stream(self) -> 'StreamMatcher':
+        """Buscador para texto que llega por fragmentos (respuestas en streaming)"""
+        return StreamMatcher(self)
+
+    def find_first(self, text: str) -> Optional[str]:
+        """Primer nombre mencionado en el texto o None"""
+        if not text or not self.size:
+            return None
+        for _, _, name in self._automaton.iter_matches(tokenize(text)):
+            return name
+        return None
+
+
+class StreamMatcher:
+    """
+    Coincidencias de un PlaceMatcher sobre texto que llega por fragmentos.
+
+    Cada palabra se pasa al autómata en cuanto termina (cuando llega el separador
+    siguiente), así que un nombre se reporta apenas se completa y con el mismo
+    criterio de palabras completas que find_all. Solo se retiene la palabra en curso.
+    """
+
+    __slots__ = ('_automaton', '_state', '_tail', '_seen')
+
+    def __init__(self, matcher: PlaceMatcher):
+        self._automaton = matcher.automaton
+        self._state = 0
+        self._tail = ''
+        self._seen = set()
+
+    def feed(self, text: str) -> List[str]:
+        """Nombres que se completaron con este fragmento (cada uno se reporta una sola vez)"""
+        if not text:
+            return []
+        # Sin strip: los espacios en los bordes del fragmento separan palabras
+        self._tail += strip_accents(text).lower()
+        return self._scan(final=False)
+
+    def close(self) -> List[str]:
+        """Nombres que terminaban con la última palabra del texto"""
+        return self._scan(final=True)
+
+    def _scan(self, final: bool) -> List[str]:
+        tail = self._tail
+        matches = list(_WORDS.finditer(tail))
+        if matches and not final and matches[-1].end() == len(tail):
+            # La última palabra puede seguir en el próximo fragmento
+            self._tail = tail[matches[-1].start():]
+            matches.pop()
+        else:
+            self._tail = ''
+        found = []
+        automaton = self._automaton
+        state = self._state
+        for match in matches:
+            state = automaton.step(state, match.group())
+            for _, name in automaton.outputs(state):
+                if name not in self._seen:
+                    self._seen.add(name)
+                    found.append(name)
+        self._state = state
+        return found
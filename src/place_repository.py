@@ -0,0 +1,63 @@
+"""
+Repositorio de lugares (tabla locaciones)
+Consultas compartidas por los endpoints que devuelven lugares con su imagen principal
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+# Columnas que usan las tarjetas de lugares del frontend
+DEFAULT_COLUMNS = ('nombre', 'descripcion', 'latitud', 'longitud', 'categoria')
+
+# Imagen principal = la de menor id por locacion_id. Se resuelve con un solo JOIN
+# agrupado en lugar de una subconsulta por lugar (compatible con MySQL 5.7 y MariaDB).
+PRIMARY_IMAGE_JOIN = """
+    LEFT JOIN (
+        SELECT li.locacion_id, li.url_imagen
+        FROM locacion_imagenes li
+        JOIN (
+            SELECT locacion_id, MIN(id) AS primera_id
+            FROM locacion_imagenes
+            GROUP BY locacion_id
+        ) primera ON primera.primera_id = li.id
+    ) img ON img.locacion_id = l.id
+"""
+
+
+def fetch_places(cursor,
+                 columns: Sequence[str] = DEFAULT_COLUMNS,
+                 where: Optional[str] = None,
+                 params: Sequence[Any] = (),
+                 order_by: Optional[str] = 'l.nombre') -> List[Dict[str, Any]]:
+    """
+    Obtener lugares junto con su imagen principal en una sola consulta.
+
+    Args:
+        cursor: Cursor de MySQL abierto
+        columns: Columnas de locaciones a seleccionar (la tabla se aliasa como `l`)
+        where: Condición SQL opcional (sin la palabra WHERE)
+        params: Parámetros para los marcadores %s de `where` y `order_by`, en ese orden
+        order_by: Expresión ORDER BY opcional
+
+    Returns:
+        Lista de diccionarios {columna: valor} con la clave extra 'imagen_url'
+    """
+    select = ', '.join(f'l.{col}' for col in columns)
+    query = f"SELECT {select}, img.url_imagen FROM locaciones l {PRIMARY_IMAGE_JOIN}"
+    if where:
+        query += f" WHERE {where}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+
+    cursor.execute(query, list(params))
+
+    places = []
+    for row in cursor.fetchall():
+        place = dict(zip(columns, row))
+        place['imagen_url'] = row[len(columns)]
+        places.append(place)
+    return places
+
+
+def format_ubicacion(latitud, longitud) -> Optional[str]:
+    """Texto 'lat, lon' usado por las tarjetas, o None si faltan coordenadas"""
+    return f"{latitud}, {longitud}" if latitud and longitud else None
@@ -0,0 +1,234 @@
+"""
+Recuperación de lugares relevantes para el prompt
+Puntúa cada lugar del catálogo contra el mensaje del usuario (índice léxico BM25 más
+similitud de n-gramas con hashing) y arma un contexto compacto con presupuesto de tokens,
+en vez de enviar a Gemini el catálogo completo en cada consulta
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.geo_index import format_distance
+from src.place_index import PlaceIndex, PlaceRecord
+from src.semantic_cache import embed_question, normalize_question
+from src.text_normalization import normalize_text
+
+# Peso de cada campo en el índice léxico
+FIELD_WEIGHTS = (('nombre', 3.0), ('categoria', 2.0), ('descripcion', 1.0))  # atributos de PlaceRecord
+
+# Parámetros habituales de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Peso de la similitud vectorial (tolera plurales y errores de tipeo) frente a BM25
+VECTOR_WEIGHT = 0.5
+# Bonificación para el lugar nombrado explícitamente por el usuario
+NAME_BOOST = 2.0
+# Con una coincidencia léxica clara se descartan lugares por debajo de esta fracción del mejor
+MIN_RELATIVE_SCORE = 0.35
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens aproximados de un texto en español (~4 caracteres por token)"""
+    return (len(text) + 3) // 4
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = ' '.join(str(text).split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + '…'
+
+
+class RetrievedContext:
+    """Contexto armado para una consulta: texto del prompt e índice de los lugares incluidos"""
+
+    __slots__ = ('text', 'index', 'tokens', 'total_places', 'full_tokens')
+
+    def __init__(self, text: str, index: Optional[PlaceIndex] = None, total_places: int = 0, full_tokens: int = 0):
+        self.text = text
+        self.index = index if index is not None else PlaceIndex()
+        self.tokens = estimate_tokens(text)
+        self.total_places = total_places
+        self.full_tokens = full_tokens
+
+
+class PlaceRetriever:
+    """
+    Índice de recuperación construido una vez por versión del catálogo.
+
+    Cada lugar se renderiza en una sola línea compacta al construir el índice; las
+    consultas solo puntúan, ordenan y concatenan líneas ya preparadas.
+    """
+
+    def __init__(self, index: PlaceIndex, description_chars: int = 240, images_per_place: int = 2, dim: int = 512):
+        """
+        Args:
+            index: Lugares del catálogo; su orden es el de desempate
+            description_chars: Máximo de caracteres de descripción por lugar
+            images_per_place: Máximo de URLs de imágenes por lugar
+            dim: Dimensión de los vectores con hashing
+        """
+        self.places: Tuple[PlaceRecord, ...] = index.records
+        self.dim = dim
+        self.description_chars = description_chars
+        self.images_per_place = images_per_place
+
+        self._by_name: Dict[str, List[int]] = {}
+        for i, place in enumerate(self.places):
+            self._by_name.setdefault(place.nombre_norm, []).append(i)
+        self._filter_text = [(str(p.categoria or '').lower(), p.nombre.lower()) for p in self.places]
+        self._lines = [self._render(p, description_chars, images_per_place) for p in self.places]
+        self._line_tokens = [estimate_tokens(line) + 1 for line in self._lines]
+        # Tamaño del contexto si se enviara el catálogo completo (para medir el ahorro)
+        self.full_tokens = sum(self._line_tokens) + estimate_tokens(self._header(len(self.places), len(self.places)))
+        self._build_lexical()
+        self._vectors = np.stack([
+            embed_question(normalize_question(f"{p.nombre} {p.categoria or ''}"), dim)
+            for p in self.places
+        ]) if self.places else np.zeros((0, dim), dtype=np.float32)
+
+    @staticmethod
+    def _render(place: PlaceRecord, description_chars, images_per_place, location: Optional[str] = None) -> str:
+        """Línea compacta de un lugar (location reemplaza a las coordenadas; '' las omite)"""
+        parts = [f"LUGAR: {place.nombre}"]
+        if place.categoria:
+            parts.append(f"CATEGORÍA: {place.categoria}")
+        if place.descripcion:
+            parts.append(f"DESCRIPCIÓN: {_shorten(place.descripcion, description_chars)}")
+        if location:
+            parts.append(location)
+        elif location is None and place.latitud is not None and place.longitud is not None:
+            parts.append(f"UBICACIÓN: {place.latitud}, {place.longitud}")
+        urls = [url for url, _ in place.imagenes[:images_per_place] if url]
+        if urls:
+            parts.append(f"IMÁGENES: {' ; '.join(urls)}")
+        return ' | '.join(parts)
+
+    @staticmethod
+    def _header(count: int, total: int) -> str:
+        return f"BASE DE DATOS HUANCAYO - {count} de {total} lugares más relevantes:\n\n"
+
+    def _build_lexical(self):
+        """Listas invertidas con la contribución BM25 de cada (término, lugar) precalculada"""
+        term_freqs: List[Dict[str, float]] = []
+        for place in self.places:
+            tf: Dict[str, float] = {}
+            for field, weight in FIELD_WEIGHTS:
+                for term in normalize_question(str(getattr(place, field) or '')).split():
+                    tf[term] = tf.get(term, 0.0) + weight
+            term_freqs.append(tf)
+
+        lengths = [sum(tf.values()) for tf in term_freqs]
+        avg_length = (sum(lengths) / len(lengths)) if lengths else 1.0
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc, tf in enumerate(term_freqs):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / (avg_length or 1.0))
+            for term, freq in tf.items():
+                postings.setdefault(term, []).append((doc, freq * (BM25_K1 + 1) / (freq + norm)))
+
+        total = len(self.places)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, entries in postings.items():
+            idf = math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            docs = np.fromiter((d for d, _ in entries), dtype=np.intp, count=len(entries))
+            weights = np.fromiter((w * idf for _, w in entries), dtype=np.float32, count=len(entries))
+            self._postings[term] = (docs, weights)
+
+    def scores(self, query: str, boost_name: Optional[str] = None) -> np.ndarray:
+        """Puntuación de relevancia de cada lugar para la consulta"""
+        scores = np.zeros(len(self.places), dtype=np.float32)
+        if not self.places:
+            return scores
+        normalized = normalize_question(query or '')
+        for term in set(normalized.split()):
+            posting = self._postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        top = float(scores.max())
+        if top > 0:
+            scores /= top
+        if normalized:
+            scores += VECTOR_WEIGHT * (self._vectors @ embed_question(normalized, self.dim))
+        if boost_name:
+            for i in self._by_name.get(normalize_text(boost_name), ()):
+                scores[i] += NAME_BOOST
+        return scores
+
+    def build_context(self, query: str, category: Optional[str] = None, boost_name: Optional[str] = None,
+                      top_k: Optional[int] = 8, max_tokens: int = 1200) -> RetrievedContext:
+        """
+        Contexto compacto con los lugares más relevantes.
+
+        Args:
+            query: Mensaje del usuario
+            category: Texto de categoría en minúsculas; filtra lugares cuya categoría o nombre lo contengan
+            boost_name: Nombre de lugar detectado en el mensaje (se prioriza)
+            top_k: Máximo de lugares (None = todos los que quepan en el presupuesto)
+            max_tokens: Presupuesto aproximado de tokens del contexto
+        """
+        candidates = range(len(self.places))
+        if category:
+            candidates = [i for i in candidates
+                          if category in self._filter_text[i][0] or category in self._filter_text[i][1]]
+
+        header_total = len(candidates)
+        chosen: List[int] = []
+        if header_total:
+            scores = self.scores(query, boost_name)
+            rows = np.fromiter(candidates, dtype=np.intp, count=header_total)
+            # Orden estable: a igual puntuación se respeta el orden del catálogo
+            ranked = rows[np.argsort(-scores[rows], kind='stable')]
+            best = float(scores[ranked[0]])
+            if best >= 1.0:
+                # La pregunta nombra algo concreto: no rellenar con lugares no relacionados
+                ranked = ranked[scores[ranked] >= best * MIN_RELATIVE_SCORE]
+            limit = header_total if top_k is None else min(top_k, header_total)
+            used = 0
+            for i in ranked:
+                cost = self._line_tokens[i]
+                if chosen and used + cost > max_tokens:
+                    continue
+                chosen.append(int(i))
+                used += cost
+                if len(chosen) >= limit:
+                    break
+
+        if chosen:
+            text = (self._header(len(chosen), header_total)
+                    + '\n'.join(self._lines[i] for i in chosen) + '\n')
+        else:
+            text = "BASE DE DATOS HUANCAYO - 0 lugares encontrados:\n\nNo se encontraron lugares en la categoría especificada."
+            if category:
+                text += f" (Búsqueda: {category})"
+            text += "\n"
+        return RetrievedContext(text, PlaceIndex(self.places[i] for i in chosen), header_total, self.full_tokens)
+
+    def build_nearby_context(self, anchor: PlaceRecord, neighbors: Sequence[Tuple[PlaceRecord, float]],
+                             max_tokens: int = 1200) -> RetrievedContext:
+        """
+        Contexto para preguntas "cerca de": el lugar de referencia y sus vecinos con la
+        distancia ya calculada, sin coordenadas (Gemini no tiene que calcular nada).
+
+        Args:
+            anchor: Lugar mencionado por el usuario
+            neighbors: (lugar, distancia en metros) en orden de cercanía
+            max_tokens: Presupuesto aproximado de tokens del contexto
+        """
+        lines = [self._render(anchor, self.description_chars, self.images_per_place, location='')]
+        chosen = [anchor]
+        used = estimate_tokens(lines[0]) + 1
+        for place, distance in neighbors:
+            line = self._render(place, self.description_chars, self.images_per_place,
+                                location=f"DISTANCIA: {format_distance(distance)} de {anchor.nombre}")
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            lines.append(line)
+            chosen.append(place)
+            used += cost
+        header = f"BASE DE DATOS HUANCAYO - {anchor.nombre} y {len(chosen) - 1} lugares cercanos (más cercano primero):\n\n"
+        text = header + '\n'.join(lines) + '\n'
+        return RetrievedContext(text, PlaceIndex(chosen), len(neighbors) + 1, self.full_tokens)
@@ -0,0 +1,270 @@
+"""
+Búsqueda de lugares para /api/places
+Índice invertido en memoria que reemplaza los LIKE '%x%' en MySQL con los mismos
+resultados: el texto buscado debe aparecer (sin tildes ni mayúsculas) dentro del
+nombre o de la descripción, también a mitad de palabra ("plaza" en "Realplaza"), y
+la categoría se filtra por la columna categoria de la BD. El índice solo acota los
+candidatos y ordena por relevancia. Se construye una vez por versión del catálogo.
+"""
+
+import bisect
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.place_index import PlaceIndex, PlaceRecord
+from src.text_normalization import normalize_text, tokenize
+
+# Peso de cada campo en la puntuación
+SEARCH_FIELDS = (('nombre', 3.0), ('categoria', 2.0), ('descripcion', 1.0))
+
+# Una palabra que solo coincide por prefijo puntúa menos que una coincidencia exacta
+PREFIX_FACTOR = 0.7
+# Longitud mínima para expandir una palabra por prefijo
+MIN_PREFIX_LENGTH = 2
+# Una búsqueda de varias palabras se verifica lugar por lugar si su palabra más larga
+# aparece en a lo sumo 1/SELECTIVE_FRACTION de los lugares; si no, se recorre el texto unido
+SELECTIVE_FRACTION = 8
+
+# Palabras del nombre que permiten inferir la categoría mostrada cuando la BD no la tiene
+INFERRED_CATEGORIES = (
+    (('parque', 'bosque', 'montana', 'laguna', 'cascada', 'rio', 'naturaleza'), 'Naturaleza'),
+    (('plaza', 'plazuela'), 'Plazas'),
+    (('mirador', 'vista', 'panoramica'), 'Miradores'),
+    (('iglesia', 'templo', 'cerro'), 'Religioso'),
+    (('mercado', 'feria'), 'Mercados'),
+    (('museo', 'cultural'), 'Museos'),
+    (('restaurante', 'comida', 'picanteria'), 'Restaurantes'),
+    (('hotel', 'hostal', 'alojamiento'), 'Hoteles'),
+)
+
+# Valores de categoría del frontend -> textos buscados dentro de la columna categoria
+CATEGORY_ALIASES = {
+    'parques': ['parque'],
+    'parque': ['parque'],
+    'plazas': ['plaza'],
+    'plaza': ['plaza'],
+    'miradores': ['mirador'],
+    'mirador': ['mirador'],
+    'centros comerciales': ['centro comercial'],
+    'centro comercial': ['centro comercial'],
+    'patrimonios': ['patrimonio'],
+    'patrimonio': ['patrimonio'],
+    'estadios': ['estadio'],
+    'estadio': ['estadio'],
+    'naturaleza': ['naturaleza'],
+}
+
+
+def infer_category(nombre: str) -> str:
+    """Categoría aproximada a partir del nombre del lugar"""
+    nombre_norm = normalize_text(nombre)
+    for palabras, categoria in INFERRED_CATEGORIES:
+        if any(palabra in nombre_norm for palabra in palabras):
+            return categoria
+    return 'Sin categoría'
+
+
+def category_candidates(category: Optional[str]) -> List[str]:
+    """Textos normalizados que debe contener la categoría del lugar ([] = sin filtro)"""
+    objetivo = normalize_text(category).replace('-', ' ')
+    if not objetivo or objetivo == 'todos':
+        return []
+    return CATEGORY_ALIASES.get(objetivo, [objetivo])
+
+
+class SearchResult:
+    """Página de resultados: registros en orden de relevancia, su categoría mostrada y total de coincidencias"""
+
+    __slots__ = ('records', 'categories', 'total')
+
+    def __init__(self, records: Sequence[PlaceRecord], categories: Sequence[str], total: int):
+        self.records = records
+        self.categories = categories
+        self.total = total
+
+
+class PlaceSearchIndex:
+    """
+    Índice invertido de lugares con puntuación TF-IDF por campo.
+
+    Un lugar coincide si el texto buscado completo aparece en su nombre o en su
+    descripción (como LIKE '%x%'). Una sola palabra se resuelve con los términos del
+    vocabulario que la contienen; varias, buscando en el texto unido de todos los
+    lugares. El orden es por relevancia (palabras exactas o por prefijo) y, a igual
+    puntuación, el del catálogo.
+    Los lugares sin categoría en la BD no pasan ningún filtro de categoría.
+    """
+
+    def __init__(self, index: PlaceIndex):
+        self.records: Tuple[PlaceRecord, ...] = index.records
+        # Categoría mostrada en las tarjetas: la de la BD o una inferida por el nombre
+        self.categories = tuple(r.categoria or infer_category(r.nombre) for r in self.records)
+        # El filtro de categoría usa la columna de la BD, no la inferida
+        self._db_categories = tuple(normalize_text(r.categoria) for r in self.records)
+        # Nombres y descripciones normalizados en un solo texto (separados por \0) para
+        # buscar con str.find un texto de varias palabras; _doc_starts: inicio de cada lugar
+        parts = []
+        self._doc_starts = []
+        start = 0
+        for r in self.records:
+            part = f"{normalize_text(r.nombre)}\0{normalize_text(r.descripcion)}\0"
+            self._doc_starts.append(start)
+            parts.append(part)
+            start += len(part)
+        self._text = ''.join(parts)
+        self._category_rows: Dict[Tuple[str, ...], np.ndarray] = {}
+
+        term_weights: Dict[str, Dict[int, float]] = {}
+        # Término -> lugares que lo tienen en el nombre o la descripción (donde se busca)
+        text_docs: Dict[str, Dict[int, None]] = {}
+        for doc, record in enumerate(self.records):
+            counts: Dict[Tuple[str, float], int] = {}
+            for field, weight in SEARCH_FIELDS:
+                value = self.categories[doc] if field == 'categoria' else getattr(record, field)
+                for term in tokenize(value):
+                    counts[(term, weight)] = counts.get((term, weight), 0) + 1
+                    if field != 'categoria':
+                        text_docs.setdefault(term, {})[doc] = None
+            for (term, weight), tf in counts.items():
+                docs = term_weights.setdefault(term, {})
+                docs[doc] = docs.get(doc, 0.0) + weight * (1.0 + math.log(tf))
+
+        total = len(self.records)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, docs in term_weights.items():
+            idf = math.log(1 + total / len(docs))
+            self._postings[term] = (
+                np.fromiter(docs.keys(), dtype=np.intp, count=len(docs)),
+                np.fromiter((w * idf for w in docs.values()), dtype=np.float32, count=len(docs)),
+            )
+        # Vocabulario ordenado para expandir prefijos con búsqueda binaria
+        self._vocabulary = sorted(self._postings)
+
+        # Términos de nombre y descripción unidos en un solo texto, para encontrar con
+        # str.find los que contienen una palabra en cualquier posición
+        self._text_terms = sorted(text_docs)
+        self._text_postings = [np.fromiter(text_docs[term], dtype=np.intp, count=len(text_docs[term]))
+                               for term in self._text_terms]
+        self._text_vocabulary = '\n'.join(self._text_terms)
+        self._text_starts = []
+        start = 0
+        for term in self._text_terms:
+            self._text_starts.append(start)
+            start += len(term) + 1
+
+    def __len__(self):
+        return len(self.records)
+
+    def expand(self, word: str) -> List[Tuple[str, float]]:
+        """Términos del vocabulario que coinciden con la palabra: (término, factor)"""
+        matches = []
+        if word in self._postings:
+            matches.append((word, 1.0))
+        if len(word) >= MIN_PREFIX_LENGTH:
+            vocabulary = self._vocabulary
+            i = bisect.bisect_right(vocabulary, word)
+            while i < len(vocabulary) and vocabulary[i].startswith(word):
+                matches.append((vocabulary[i], PREFIX_FACTOR))
+                i += 1
+        return matches
+
+    def containing(self, word: str) -> List[str]:
+        """Términos de nombres y descripciones que contienen la palabra en cualquier posición"""
+        return [self._text_terms[t] for t in self._containing(word)]
+
+    def _containing(self, word: str) -> List[int]:
+        text, starts = self._text_vocabulary, self._text_starts
+        found = []
+        i = text.find(word)
+        while i != -1:
+            t = bisect.bisect_right(starts, i) - 1
+            found.append(t)
+            # Seguir desde el término siguiente: cada término se cuenta una vez
+            i = text.find(word, starts[t + 1]) if t + 1 < len(starts) else -1
+        return found
+
+    def _word_rows(self, word: str) -> np.ndarray:
+        """Filas con algún término de nombre o descripción que contiene la palabra, en orden"""
+        mask = np.zeros(len(self.records), dtype=bool)
+        for t in self._containing(word):
+            mask[self._text_postings[t]] = True
+        return np.flatnonzero(mask)
+
+    def _matches(self, needle: str) -> np.ndarray:
+        """Filas cuyo nombre o descripción contiene el texto (ya normalizado), en orden"""
+        words = tokenize(needle)
+        if words == [needle]:
+            # Una sola palabra: todo término que la contiene ya es una coincidencia
+            return self._word_rows(needle)
+
+        text, starts = self._text, self._doc_starts
+        ends = starts[1:] + [len(text)]
+        if words:
+            # Varias palabras: si la más larga es poco común, verificar solo esos lugares
+            candidates = self._word_rows(max(words, key=len))
+            if len(candidates) * SELECTIVE_FRACTION <= len(self.records):
+                return np.fromiter((i for i in candidates if text.find(needle, starts[i], ends[i]) != -1),
+                                   dtype=np.intp)
+
+        # Si no, el texto completo de una vez, saltando al lugar siguiente tras cada hallazgo
+        rows = []
+        i = text.find(needle)
+        while i != -1:
+            doc = bisect.bisect_right(starts, i) - 1
+            rows.append(doc)
+            i = text.find(needle, starts[doc + 1]) if doc + 1 < len(starts) else -1
+        return np.array(rows, dtype=np.intp)
+
+    def _category_filter(self, candidates: List[str]) -> Optional[np.ndarray]:
+        """Filas cuya categoría en la BD contiene alguno de los candidatos (memorizado por filtro)"""
+        if not candidates:
+            return None
+        key = tuple(candidates)
+        rows = self._category_rows.get(key)
+        if rows is None:
+            rows = np.fromiter(
+                (i for i, c in enumerate(self._db_categories) if any(cand in c for cand in candidates)),
+                dtype=np.intp
+            )
+            self._category_rows[key] = rows
+        return rows
+
+    def search(self, query: str = '', category: Optional[str] = None,
+               offset: int = 0, limit: Optional[int] = None) -> SearchResult:
+        """
+        Lugares que coinciden con la búsqueda y la categoría, ordenados por relevancia.
+
+        Args:
+            query: Texto buscado en nombre o descripción (vacío = todos, en orden del catálogo)
+            category: Categoría del frontend ('parques', 'centros-comerciales', ...)
+            offset: Resultados a saltar
+            limit: Máximo de resultados (None = todos)
+        """
+        rows = self._category_filter(category_candidates(category))
+        needle = normalize_text(query)
+
+        if needle:
+            hits = self._matches(needle)
+            # Relevancia: las palabras exactas o por prefijo puntúan; las coincidencias
+            # solo a mitad de palabra quedan al final, en orden del catálogo
+            scores = np.zeros(len(self.records), dtype=np.float32)
+            for word in dict.fromkeys(tokenize(needle)):
+                word_scores = np.zeros(len(self.records), dtype=np.float32)
+                for term, factor in self.expand(word):
+                    docs, weights = self._postings[term]
+                    # Cada término aparece una sola vez por lugar: basta con indexado directo
+                    word_scores[docs] = np.maximum(word_scores[docs], weights * factor)
+                scores += word_scores
+            if rows is not None:
+                hits = np.intersect1d(hits, rows, assume_unique=True)
+            # Orden estable: a igual puntuación se respeta el orden del catálogo
+            ordered = hits[np.argsort(-scores[hits], kind='stable')]
+        else:
+            ordered = rows if rows is not None else np.arange(len(self.records))
+
+        total = len(ordered)
+        end = total if limit is None else offset + limit
+        page = ordered[offset:end]
+        return SearchResult([self.records[i] for i in page], [self.categories[i] for i in page], total)
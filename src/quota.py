@@ -0,0 +1,169 @@
+"""
+Cuotas de consultas a Gemini
+Cubetas de tokens por minuto (globales y por usuario) más topes diarios que se
+reinician a medianoche, todo sobre el backend de estado compartido para que los
+límites se respeten entre workers. Las consultas se descuentan de forma atómica
+justo antes de llamar a Gemini; antes de eso solo se consulta el saldo.
+"""
+
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.state_backend import StateBackend, bucket_level
+
+# Los contadores diarios viven dos días: alcanza para cubrir el cambio de fecha
+DAY_TTL = 2 * 24 * 3600
+
+
+class QuotaExceededError(Exception):
+    """No queda cuota para llamar a Gemini (el mensaje incluye 'quota')"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"quota exceeded: {reason}")
+        self.reason = reason
+
+
+class QuotaDecision:
+    """Resultado de consultar la cuota: si se permite llamar a Gemini y si el saldo es bajo"""
+
+    __slots__ = ('allowed', 'reason', 'low', 'remaining_day')
+
+    def __init__(self, allowed: bool, reason: Optional[str] = None, low: bool = False,
+                 remaining_day: int = 0):
+        self.allowed = allowed
+        self.reason = reason          # 'user_minute', 'user_day', 'global_minute' o 'global_day'
+        self.low = low                # Saldo diario global por debajo de la reserva
+        self.remaining_day = remaining_day
+
+
+class QuotaManager:
+    """
+    Límites de consultas a Gemini, globales y por usuario.
+
+    - Por minuto: cubetas de tokens (ráfagas de hasta `per_minute` consultas que se
+      recargan de forma continua)
+    - Por día: contadores por fecha, que se reinician solos a medianoche (hora local)
+    """
+
+    def __init__(self, backend: StateBackend, daily_limit: int = 45, per_minute: int = 12,
+                 user_daily_limit: int = 15, user_per_minute: int = 4, low_fraction: float = 0.2):
+        """
+        Args:
+            backend: Estado compartido donde viven contadores y cubetas
+            daily_limit: Consultas diarias para toda la aplicación
+            per_minute: Consultas por minuto para toda la aplicación
+            user_daily_limit: Consultas diarias por usuario
+            user_per_minute: Consultas por minuto por usuario
+            low_fraction: Fracción del cupo diario por debajo de la cual el saldo se considera bajo
+        """
+        self.backend = backend
+        self.daily_limit = daily_limit
+        self.per_minute = per_minute
+        self.user_daily_limit = user_daily_limit
+        self.user_per_minute = user_per_minute
+        self.low_fraction = low_fraction
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {'granted': 0, 'denied': 0}
+        self._degraded: Dict[str, int] = {}
+
+    @staticmethod
+    def _today() -> str:
+        return date.today().isoformat()
+
+    def _limits(self, user_id: str, day: str) -> List[Tuple[str, str, int]]:
+        """(motivo, clave, límite) en el orden en que se descuentan"""
+        return [
+            ('user_minute', f"quota:user:{user_id}:minute", self.user_per_minute),
+            ('user_day', f"quota:user:{user_id}:day:{day}", self.user_daily_limit),
+            ('global_minute', "quota:global:minute", self.per_minute),
+            ('global_day', f"quota:global:day:{day}", self.daily_limit),
+        ]
+
+    def _level(self, key: str, limit: int, now: float) -> float:
+        return bucket_level(self.backend.get(key), limit, limit / 60.0, now)
+
+    def used_today(self, user_id: Optional[str] = None) -> int:
+        """Consultas a Gemini de hoy (de un usuario o de toda la aplicación)"""
+        key = f"quota:user:{user_id}:day:{self._today()}" if user_id else f"quota:global:day:{self._today()}"
+        limit = self.user_daily_limit if user_id else self.daily_limit
+        return min(int(self.backend.get(key) or 0), limit)
+
+    def check(self, user_id: str) -> QuotaDecision:
+        """Saldo actual sin descontar nada (para decidir si conviene degradar)"""
+        now = time.time()
+        reason = None
+        for name, key, limit in self._limits(user_id, self._today()):
+            if name.endswith('minute'):
+                exhausted = self._level(key, limit, now) < 1
+            else:
+                exhausted = int(self.backend.get(key) or 0) >= limit
+            if exhausted:
+                reason = name
+                break
+        remaining = max(self.daily_limit - self.used_today(), 0)
+        return QuotaDecision(reason is None, reason, remaining <= self.daily_limit * self.low_fraction, remaining)
+
+    def acquire(self, user_id: str):
+        """
+        Descontar una consulta de todos los límites de forma atómica.
+        Si alguno se agotó devuelve lo ya descontado y lanza QuotaExceededError.
+        """
+        taken = []
+        for name, key, limit in self._limits(user_id, self._today()):
+            if name.endswith('minute'):
+                allowed, _ = self.backend.take_tokens(key, limit, limit / 60.0, ttl=120)
+            else:
+                allowed = self.backend.incr(key, ttl=DAY_TTL) <= limit
+                if not allowed:
+                    self.backend.incr(key, -1, ttl=DAY_TTL)
+            if not allowed:
+                self._release(taken)
+                with self._lock:
+                    self._stats['denied'] += 1
+                raise QuotaExceededError(name)
+            taken.append((name, key, limit))
+        with self._lock:
+            self._stats['granted'] += 1
+
+    def _release(self, taken: List[Tuple[str, str, int]]):
+        for name, key, limit in taken:
+            if name.endswith('minute'):
+                self.backend.take_tokens(key, limit, limit / 60.0, cost=-1, ttl=120)
+            else:
+                self.backend.incr(key, -1, ttl=DAY_TTL)
+
+    def record_degraded(self, outcome: str):
+        """Contar una consulta resuelta sin Gemini por falta de saldo ('cache', 'local' o 'refused')"""
+        with self._lock:
+            self._degraded[outcome] = self._degraded.get(outcome, 0) + 1
+
+    def snapshot(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Saldo global (y de un usuario) para el dashboard"""
+        now = time.time()
+        used = self.used_today()
+        result: Dict[str, Any] = {
+            'day': self._today(),
+            'global': {
+                'used_today': used,
+                'daily_limit': self.daily_limit,
+                'remaining_today': max(self.daily_limit - used, 0),
+                'minute_tokens': round(self._level("quota:global:minute", self.per_minute, now), 2),
+                'per_minute': self.per_minute,
+            },
+            'low': max(self.daily_limit - used, 0) <= self.daily_limit * self.low_fraction,
+        }
+        if user_id:
+            user_used = self.used_today(user_id)
+            result['user'] = {
+                'used_today': user_used,
+                'daily_limit': self.user_daily_limit,
+                'remaining_today': max(self.user_daily_limit - user_used, 0),
+                'minute_tokens': round(self._level(f"quota:user:{user_id}:minute", self.user_per_minute, now), 2),
+                'per_minute': self.user_per_minute,
+            }
+        with self._lock:
+            result.update(self._stats)
+            result['degraded'] = dict(self._degraded)
+        return result
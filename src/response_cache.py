@@ -0,0 +1,171 @@
+"""
+Caché acotada en memoria con expiración
+Combina desalojo LRU, tiempo de vida (TTL) y límite de bytes para que la memoria
+se mantenga estable en procesos de larga duración
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def estimate_size(key: str, value: Any) -> int:
+    """Tamaño aproximado en bytes de una entrada (texto codificado en UTF-8)"""
+    if isinstance(value, (bytes, bytearray)):
+        value_size = len(value)
+    elif isinstance(value, str):
+        value_size = len(value.encode('utf-8'))
+    else:
+        value_size = len(repr(value).encode('utf-8'))
+    return len(key.encode('utf-8')) + value_size
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'created_at', 'expires_at')
+
+    def __init__(self, value, size, created_at, expires_at):
+        self.value = value
+        self.size = size
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+
+class LRUTTLCache:
+    """
+    Caché segura entre hilos con límite de entradas, límite de bytes y TTL.
+
+    Cuando se supera algún límite se desalojan primero las entradas expiradas
+    y luego las usadas hace más tiempo.
+    """
+
+    def __init__(self,
+                 max_entries: int = 500,
+                 max_bytes: int = 4 * 1024 * 1024,
+                 ttl: Optional[float] = 3600,
+                 sizeof: Callable[[str, Any], int] = estimate_size):
+        """
+        Args:
+            max_entries: Número máximo de entradas
+            max_bytes: Tamaño máximo aproximado de todas las entradas
+            ttl: Segundos de vida de cada entrada (None = sin expiración)
+            sizeof: Función que estima el tamaño en bytes de (clave, valor)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._data: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expirations': 0, 'rejected': 0}
+
+    def get(self, key: str, default=None):
+        """Valor vigente de la clave (la marca como usada recientemente)"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            if entry.expires_at is not None and entry.expires_at <= now:
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Guardar un valor. Devuelve False si la entrada sola supera el límite de bytes.
+        """
+        size = self._sizeof(key, value)
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if self.max_bytes and size > self.max_bytes:
+                self._stats['rejected'] += 1
+                return False
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = _Entry(value, size, now, now + ttl if ttl else None)
+            self._bytes += size
+            self._stats['sets'] += 1
+            self._evict(now)
+            return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                return True
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """Eliminar todas las entradas expiradas; devuelve cuántas se eliminaron"""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, e in self._data.items() if e.expires_at is not None and e.expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self._stats['expirations'] += len(expired)
+            return len(expired)
+
+    def items(self, limit: Optional[int] = None) -> List[Tuple[str, Any, float]]:
+        """Entradas vigentes (clave, valor, creado_en), las usadas más recientemente primero"""
+        now = time.time()
+        result = []
+        with self._lock:
+            for key in reversed(self._data):
+                entry = self._data[key]
+                if entry.expires_at is not None and entry.expires_at <= now:
+                    continue
+                result.append((key, entry.value, entry.created_at))
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores y ocupación de la caché"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0,
+            })
+            return stats
+
+    def _remove(self, key):
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+
+    def _evict(self, now):
+        # Las más antiguas suelen ser también las primeras en expirar
+        while self._data:
+            key, entry = next(iter(self._data.items()))
+            if entry.expires_at is None or entry.expires_at > now:
+                break
+            self._remove(key)
+            self._stats['expirations'] += 1
+
+        while self._data and (
+            (self.max_entries and len(self._data) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self._stats['evictions'] += 1
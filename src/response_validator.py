@@ -0,0 +1,103 @@
+"""
+Validación de respuestas de Gemini contra el catálogo
+Validador compilado una vez por versión del catálogo: las frases de problemas
+técnicos, de respuestas genéricas y de lugares que Gemini suele inventar quedan en
+tablas ya en minúsculas y normalizadas, y los nombres del catálogo ya normalizados
+(sin pasar por unicodedata en cada respuesta). La respuesta se pasa a minúsculas
+una sola vez y los marcadores [[...]] se validan y se quitan en el mismo recorrido.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Tuple
+
+from src.place_index import PlaceIndex
+from src.text_normalization import normalize_text
+
+TECHNICAL_PHRASES = (
+    'problemas de conexión', 'sin conexión', 'base de datos completa', 'problemas técnicos',
+    'base de datos está fallando', 'base de datos fallando', 'mi base de datos está fallando',
+    'mi base de datos fallando', 'no tengo acceso a la base de datos', 'no puedo acceder a la base de datos',
+)
+GENERIC_MARKERS = ('ideas generales', 'recomendaciones generales', 'de forma general', 'en general puedo')
+# Lugares conocidos de la región que Gemini menciona aunque no estén en el contexto
+COMMON_PLACES = ('laguna de paca', 'parque nacional de huayllay', 'distrito de chupaca', 'concepción')
+
+_MARKER = re.compile(r'\[\[(.*?)\]\]')
+
+
+class ValidationResult(NamedTuple):
+    problems: List[str]
+    text: str  # Respuesta sin los marcadores [[...]]
+
+
+class ResponseValidator:
+    """
+    Detector de problemas en una respuesta, compilado para un catálogo.
+
+    Las frases se buscan sin importar mayúsculas y en cualquier posición. Para una
+    docena de frases fijas la búsqueda de subcadenas de str (en C) es más rápida que
+    recorrer la respuesta con una regex que las combine a todas.
+    """
+
+    __slots__ = ('names', '_normalized', '_checks', '_common')
+
+    def __init__(self, names: Iterable[str] = ()):
+        """
+        Args:
+            names: Nombres de los lugares del catálogo
+        """
+        # Nombre tal como Gemini lo copia en [[...]] -> nombre normalizado
+        self._normalized: Dict[str, str] = {}
+        for name in names:
+            if name:
+                self._normalized.setdefault(name, normalize_text(name))
+        self.names: FrozenSet[str] = frozenset(filter(None, self._normalized.values()))
+
+        self._checks: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+            ('problemas_tecnicos', tuple(p.lower() for p in TECHNICAL_PHRASES)),
+            ('generico_sin_datos', tuple(p.lower() for p in GENERIC_MARKERS)),
+        )
+        # (frase en minúsculas, frase normalizada para compararla con los nombres del contexto)
+        self._common: Tuple[Tuple[str, str], ...] = tuple((p.lower(), normalize_text(p)) for p in COMMON_PLACES)
+
+    def _normalize(self, name: str) -> str:
+        key = self._normalized.get(name)
+        return key if key is not None else normalize_text(name)
+
+    def validate(self, text: str, context: PlaceIndex) -> ValidationResult:
+        """
+        Problemas de la respuesta frente a los lugares del contexto y el texto sin marcadores.
+
+        Los marcadores [[...]] deben nombrar lugares del contexto; los lugares comunes
+        solo se aceptan si algún lugar del contexto los incluye en su nombre.
+        """
+        lowered = text.lower()
+        problems: List[str] = []
+        for kind, phrases in self._checks:
+            if any(phrase in lowered for phrase in phrases):
+                problems.append(kind)
+
+        by_name = context.by_name
+        parts: List[str] = []
+        last = 0
+        for match in _MARKER.finditer(text):
+            marker = match.group(1)
+            parts.append(text[last:match.start()])
+            parts.append(marker)
+            last = match.end()
+            if not marker:
+                continue
+            key = self._normalize(marker)
+            if key not in by_name:
+                # Distinguir un lugar del catálogo que no estaba en el contexto de uno inventado
+                reason = 'lugar_fuera_de_contexto' if key in self.names else 'lugar_inventado'
+                problems.append(f'{reason}: {marker}')
+
+        for phrase, key in self._common:
+            if phrase in lowered and all(key not in name for name in by_name):
+                problems.append(f'lugar_inventado: {phrase}')
+
+        if not parts:
+            return ValidationResult(problems, text)
+        parts.append(text[last:])
+        return ValidationResult(problems, ''.join(parts))
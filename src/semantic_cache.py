@@ -0,0 +1,205 @@
+"""
+Caché semántica de respuestas
+Reconoce preguntas casi idénticas ("¿Qué parques hay?" / "que parques hay") con una
+similitud vectorial calculada localmente, sin llamar a ningún modelo de embeddings
+"""
+
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from src.text_normalization import tokenize
+
+# Palabras vacías que no cambian el sentido de una consulta sobre lugares
+STOPWORDS = frozenset("""
+    a acerca al algo algun alguna algunas alguno algunos ante como con cual cuales
+    cuentame dame de del dime el en es esta estan este esto favor hablame hay
+    informacion la las le lo los me mi muestrame mostrar muestra o para pero por porfa
+    puedo puedes que quiero quisiera se sobre son su sus te tu un una unas unos ver y ya
+""".split())
+
+
+def _stem(word: str) -> str:
+    """Singular aproximado para que "parques" y "parque" coincidan"""
+    return word[:-1] if len(word) > 3 and word.endswith('s') else word
+
+
+def normalize_question(text: str) -> str:
+    """Pregunta sin tildes, signos de puntuación, plurales ni palabras vacías"""
+    words = [_stem(w) for w in tokenize(text) if w not in STOPWORDS]
+    return ' '.join(words)
+
+
+@lru_cache(maxsize=4096)
+def _scope_words(scope: Hashable) -> FrozenSet[str]:
+    """Palabras (normalizadas) de los textos del ámbito: el lugar o la categoría ya fijados"""
+    parts = scope if isinstance(scope, tuple) else (scope,)
+    return frozenset(normalize_question(' '.join(p for p in parts if isinstance(p, str))).split())
+
+
+def scoped_question(text: str, scope: Hashable = None) -> str:
+    """
+    Pregunta normalizada sin las palabras que ya fija el ámbito.
+
+    Dentro del ámbito de un lugar su nombre no distingue una pregunta de otra: si se
+    dejara, "horario del Nevado Huaytapallana" y "precio del Nevado Huaytapallana" se
+    parecerían sobre todo por el nombre. Si no queda nada se usa la pregunta completa.
+    """
+    normalized = normalize_question(text)
+    words = _scope_words(scope) if scope is not None else ()
+    if not words:
+        return normalized
+    return ' '.join(w for w in normalized.split() if w not in words) or normalized
+
+
+def _bucket(feature: str, dim: int) -> int:
+    return zlib.crc32(feature.encode('utf-8')) % dim
+
+
+def embed_question(normalized: str, dim: int = 1024) -> np.ndarray:
+    """
+    Vector L2-normalizado de n-gramas con hashing: palabras completas más trigramas
+    de caracteres (tolera plurales y errores de tipeo leves).
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in normalized.split():
+        vector[_bucket('w:' + word, dim)] += 1.0
+        padded = f' {word} '
+        for i in range(len(padded) - 2):
+            vector[_bucket(padded[i:i + 3], dim)] += 0.5
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+
+class SemanticCache:
+    """
+    Caché de respuestas indexada por similitud coseno entre preguntas normalizadas.
+
+    Las entradas se agrupan por ámbito (por ejemplo categoría y lugar detectados) para
+    que preguntas parecidas sobre lugares distintos nunca compartan respuesta, y dentro
+    del ámbito se comparan sin las palabras del propio ámbito. La capacidad es fija: al llenarse se reemplaza la entrada más antigua.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: Optional[float] = 3600,
+                 threshold: float = 0.9, dim: int = 1024):
+        """
+        Args:
+            max_entries: Capacidad máxima (tamaño fijo de la matriz de vectores)
+            ttl: Segundos de vida de cada respuesta (None = sin expiración)
+            threshold: Similitud coseno mínima para considerar dos preguntas equivalentes
+            dim: Dimensión de los vectores con hashing
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.dim = dim
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._scopes: List[Optional[Hashable]] = [None] * max_entries
+        self._keys: List[Optional[str]] = [None] * max_entries
+        self._values: List[Any] = [None] * max_entries
+        self._by_key: Dict[Tuple[Hashable, str], int] = {}
+        self._by_scope: Dict[Hashable, set] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'exact_hits': 0, 'misses': 0, 'sets': 0}
+
+    def get(self, question: str, scope: Hashable = None, threshold: Optional[float] = None) -> Optional[Any]:
+        """Respuesta de una pregunta equivalente dentro del mismo ámbito, o None"""
+        match = self.lookup(question, scope, threshold)
+        return match[0] if match else None
+
+    def lookup(self, question: str, scope: Hashable = None,
+               threshold: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """(respuesta, similitud) de la pregunta más parecida si supera el umbral (o `threshold`)"""
+        normalized = scoped_question(question, scope)
+        if not normalized:
+            return None
+        now = time.time()
+
+        with self._lock:
+            slot = self._by_key.get((scope, normalized))
+            if slot is not None and self._alive(slot, now):
+                self._stats['hits'] += 1
+                self._stats['exact_hits'] += 1
+                return self._values[slot], 1.0
+
+            candidates = [i for i in self._by_scope.get(scope, ()) if self._alive(i, now)]
+            if not candidates:
+                self._stats['misses'] += 1
+                return None
+
+            vector = embed_question(normalized, self.dim)
+            rows = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+            similarities = self._vectors[rows] @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < (self.threshold if threshold is None else threshold):
+                self._stats['misses'] += 1
+                return None
+
+            self._stats['hits'] += 1
+            return self._values[rows[best]], similarity
+
+    def set(self, question: str, value: Any, scope: Hashable = None):
+        """Guardar la respuesta de una pregunta en su ámbito"""
+        normalized = scoped_question(question, scope)
+        if not normalized:
+            return
+        vector = embed_question(normalized, self.dim)
+        expires = time.time() + self.ttl if self.ttl else float('inf')
+
+        with self._lock:
+            key = (scope, normalized)
+            slot = self._by_key.get(key)
+            if slot is None:
+                slot = self._next
+                self._next = (self._next + 1) % self.max_entries
+                old_key = self._keys[slot]
+                if old_key is not None:
+                    old_scope = self._scopes[slot]
+                    self._by_key.pop((old_scope, old_key), None)
+                    self._by_scope[old_scope].discard(slot)
+                    if not self._by_scope[old_scope]:
+                        del self._by_scope[old_scope]
+            self._vectors[slot] = vector
+            self._expires[slot] = expires
+            self._scopes[slot] = scope
+            self._keys[slot] = normalized
+            self._values[slot] = value
+            self._by_key[key] = slot
+            self._by_scope.setdefault(scope, set()).add(slot)
+            self._stats['sets'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._keys = [None] * self.max_entries
+            self._values = [None] * self.max_entries
+            self._scopes = [None] * self.max_entries
+            self._by_key.clear()
+            self._by_scope.clear()
+            self._next = 0
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'entries': len(self._by_key),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0,
+            })
+            return stats
+
+    def _alive(self, slot: int, now: float) -> bool:
+        return self._expires[slot] > now
@@ -0,0 +1,298 @@
+"""
+Coalescencia de llamadas idénticas en curso (single-flight)
+Cuando varias peticiones hacen la misma pregunta a la vez, solo una llega a Gemini;
+las demás esperan y reciben el mismo resultado (completo o fragmento a fragmento).
+Los errores propios de quien inició la llamada (retry_on, p. ej. su cuota agotada) no
+se reparten: cada petición que esperaba vuelve a intentarlo, y una de ellas pasa a
+ser la que llama
+
+AsyncSingleFlight ofrece lo mismo para corrutinas y generadores asíncronos (modo ASGI)
+"""
+
+import asyncio
+import threading
+from typing import (Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, Iterator,
+                    Tuple, Type)
+
+
+class _Flight:
+    """Llamada en curso compartida por todas las peticiones con la misma clave"""
+
+    __slots__ = ('cond', 'chunks', 'done', 'error', 'result')
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.result = None
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes con la misma clave en una sola ejecución.
+
+    - do(): para llamadas que devuelven un resultado completo
+    - stream(): para generadores; un hilo productor consume la fuente y cada petición
+      recibe todos los fragmentos desde el principio, aunque se una a mitad de camino
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats = {'calls': 0, 'leaders': 0, 'coalesced': 0, 'errors': 0, 'retried': 0}
+
+    def _join(self, key) -> Tuple[_Flight, bool]:
+        with self._lock:
+            self._stats['calls'] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats['coalesced'] += 1
+                return flight, False
+            flight = _Flight()
+            self._flights[key] = flight
+            self._stats['leaders'] += 1
+            return flight, True
+
+    def _finish(self, key, flight: _Flight, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if error is not None:
+                self._stats['errors'] += 1
+        with flight.cond:
+            flight.error = error
+            flight.done = True
+            flight.cond.notify_all()
+
+    def _retry(self, flight, leader: bool, retry_on: Tuple[Type[BaseException], ...]) -> bool:
+        """Si quien esperaba debe repetir la llamada por un error propio del que la inició"""
+        if leader or not isinstance(flight.error, retry_on):
+            return False
+        with self._lock:
+            self._stats['retried'] += 1
+        return True
+
+    def do(self, key: Hashable, fn: Callable[[], Any],
+           retry_on: Tuple[Type[BaseException], ...] = ()) -> Tuple[Any, bool]:
+        """
+        Ejecutar fn() una sola vez por clave entre las llamadas concurrentes.
+
+        Args:
+            retry_on: Errores que solo valen para quien ejecutó fn(); quien esperaba
+                vuelve a intentarlo con su propio fn()
+
+        Returns:
+            (resultado, compartido) donde compartido indica que se reutilizó otra llamada
+        """
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                error = None
+                try:
+                    flight.result = fn()
+                except Exception as e:
+                    error = e
+                self._finish(key, flight, error)
+            else:
+                with flight.cond:
+                    while not flight.done:
+                        flight.cond.wait()
+
+            if self._retry(flight, leader, retry_on):
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, not leader
+
+    def stream(self, key: Hashable, factory: Callable[[], Iterable[Any]],
+               retry_on: Tuple[Type[BaseException], ...] = ()) -> Iterator[Any]:
+        """
+        Iterar los fragmentos de factory() compartiendo una sola fuente por clave.
+        Los errores de la fuente se relanzan en cada consumidor tras los fragmentos recibidos;
+        los de retry_on anteriores al primer fragmento hacen que quien esperaba lo reintente.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            producer = threading.Thread(
+                target=self._produce, args=(key, flight, factory),
+                name='singleflight-stream', daemon=True
+            )
+            producer.start()
+        return self._consume(key, flight, leader, factory, retry_on)
+
+    def _produce(self, key, flight: _Flight, factory):
+        error = None
+        try:
+            for chunk in factory():
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except Exception as e:
+            error = e
+        self._finish(key, flight, error)
+
+    def _consume(self, key, flight: _Flight, leader: bool, factory, retry_on) -> Iterator[Any]:
+        index = 0
+        while True:
+            with flight.cond:
+                while index >= len(flight.chunks) and not flight.done:
+                    flight.cond.wait()
+                pending = flight.chunks[index:]
+                done = flight.done
+            index += len(pending)
+            for chunk in pending:
+                yield chunk
+            if done:
+                break
+        if not index and self._retry(flight, leader, retry_on):
+            yield from self.stream(key, factory, retry_on)
+            return
+        if flight.error is not None:
+            raise flight.error
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de deduplicación"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+            stats['dedup_rate'] = round(stats['coalesced'] / stats['calls'], 3) if stats['calls'] else 0
+            return stats
+
+
+class _AsyncFlight:
+    """Llamada asíncrona en curso; `changed` se reemplaza cada vez que llega un fragmento"""
+
+    __slots__ = ('changed', 'chunks', 'done', 'error', 'result', 'task')
+
+    def __init__(self):
+        self.changed = asyncio.Event()
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.result = None
+        self.task = None
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class AsyncSingleFlight:
+    """
+    Versión para asyncio de SingleFlight. Todas las llamadas deben hacerse desde el
+    mismo bucle de eventos, por lo que no necesita locks: el productor es una tarea
+    del bucle en vez de un hilo y cada espera libera el bucle para otras peticiones.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _AsyncFlight] = {}
+        self._stats = {'calls': 0, 'leaders': 0, 'coalesced': 0, 'errors': 0, 'retried': 0}
+
+    def _join(self, key) -> Tuple[_AsyncFlight, bool]:
+        self._stats['calls'] += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            self._stats['coalesced'] += 1
+            return flight, False
+        flight = _AsyncFlight()
+        self._flights[key] = flight
+        self._stats['leaders'] += 1
+        return flight, True
+
+    def _finish(self, key, flight: _AsyncFlight, error=None):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if error is not None:
+            self._stats['errors'] += 1
+        flight.error = error
+        flight.done = True
+        flight.notify()
+
+    def _retry(self, flight: _AsyncFlight, leader: bool, retry_on: Tuple[Type[BaseException], ...]) -> bool:
+        """Si quien esperaba debe repetir la llamada por un error propio del que la inició"""
+        if leader or not isinstance(flight.error, retry_on):
+            return False
+        self._stats['retried'] += 1
+        return True
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                 retry_on: Tuple[Type[BaseException], ...] = ()) -> Tuple[Any, bool]:
+        """
+        Esperar fn() una sola vez por clave entre las llamadas concurrentes.
+
+        Args:
+            retry_on: Errores que solo valen para quien ejecutó fn(); quien esperaba
+                vuelve a intentarlo con su propio fn()
+
+        Returns:
+            (resultado, compartido) donde compartido indica que se reutilizó otra llamada
+        """
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                flight.task = asyncio.ensure_future(self._run(key, flight, fn))
+            # shield: si la petición que inició la llamada se cancela, las demás siguen esperando
+            await asyncio.shield(flight.task)
+            if self._retry(flight, leader, retry_on):
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, not leader
+
+    async def _run(self, key, flight: _AsyncFlight, fn):
+        error = None
+        try:
+            flight.result = await fn()
+        except Exception as e:
+            error = e
+        self._finish(key, flight, error)
+
+    def stream(self, key: Hashable, factory: Callable[[], AsyncIterable[Any]],
+               retry_on: Tuple[Type[BaseException], ...] = ()) -> AsyncIterator[Any]:
+        """
+        Iterar los fragmentos de factory() compartiendo una sola fuente por clave.
+        Los errores de la fuente se relanzan en cada consumidor tras los fragmentos recibidos;
+        los de retry_on anteriores al primer fragmento hacen que quien esperaba lo reintente.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            flight.task = asyncio.ensure_future(self._produce(key, flight, factory))
+        return self._consume(key, flight, leader, factory, retry_on)
+
+    async def _produce(self, key, flight: _AsyncFlight, factory):
+        error = None
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.notify()
+        except Exception as e:
+            error = e
+        self._finish(key, flight, error)
+
+    async def _consume(self, key, flight: _AsyncFlight, leader: bool, factory, retry_on) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            changed = flight.changed
+            pending = flight.chunks[index:]
+            done = flight.done
+            index += len(pending)
+            for chunk in pending:
+                yield chunk
+            if done:
+                break
+            if index >= len(flight.chunks) and not flight.done:
+                await changed.wait()
+        if not index and self._retry(flight, leader, retry_on):
+            async for chunk in self.stream(key, factory, retry_on):
+                yield chunk
+            return
+        if flight.error is not None:
+            raise flight.error
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de deduplicación"""
+        stats = dict(self._stats)
+        stats['in_flight'] = len(self._flights)
+        stats['dedup_rate'] = round(stats['coalesced'] / stats['calls'], 3) if stats['calls'] else 0
+        return stats
@@ -0,0 +1,107 @@
+"""
+Escritura de eventos SSE de /api/chat
+Codificador JSON reutilizable y un escritor que agrupa texto y eventos en una sola
+escritura: una respuesta ya resuelta (caché, catálogo) sale en uno o pocos eventos
+en lugar de uno por palabra, y en streaming el texto y las tarjetas de un mismo
+fragmento de Gemini viajan juntos. Los cortes nunca parten una etiqueta HTML ni
+una entidad, así que cada evento se puede insertar tal cual en la página.
+"""
+
+import json
+import time
+from typing import Any, Dict, List
+
+# Codificador creado una vez; sin ensure_ascii las tildes no se inflan a \uXXXX
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def encode_event(data: Dict[str, Any]) -> str:
+    """Evento SSE con un objeto JSON"""
+    return f"data: {_encode(data)}\n\n"
+
+
+def text_event(text: str) -> str:
+    """Evento SSE con un fragmento de la respuesta ({'chunk': text, 'done': false})"""
+    return 'data: {"chunk": ' + _encode(text) + ', "done": false}\n\n'
+
+
+def _split_point(text: str, limit: int) -> int:
+    """
+    Posición de corte <= limit que no deja una etiqueta ni una entidad a medias; si el
+    texto empieza con una etiqueta más larga que limit, el final de esa etiqueta
+    """
+    cut = limit
+    tag = text.rfind('<', 0, cut)
+    if tag > text.rfind('>', 0, cut):
+        cut = tag
+    entity = text.rfind('&', 0, cut)
+    if entity > text.rfind(';', 0, cut) and cut - entity <= 10:
+        cut = entity
+    if cut > 0:
+        return cut
+    end = text.find('>' if text.startswith('<') else ';', limit)
+    return end + 1 if end >= 0 else len(text)
+
+
+class SSEWriter:
+    """
+    Acumula texto y eventos y los entrega juntos con flush().
+
+    - max_chars: tamaño de texto acumulado a partir del cual conviene enviar
+    - max_delay: segundos desde el último envío a partir de los cuales conviene enviar
+      (0 = enviar en cuanto haya algo; en streaming, una escritura por fragmento de Gemini)
+    """
+
+    __slots__ = ('max_chars', 'max_delay', '_text', '_size', '_frames', '_last_flush')
+
+    def __init__(self, max_chars: int = 8192, max_delay: float = 0.0):
+        self.max_chars = max(max_chars, 64)
+        self.max_delay = max_delay
+        self._text: List[str] = []
+        self._size = 0
+        self._frames: List[str] = []
+        self._last_flush = time.monotonic()
+
+    def text(self, chunk: str):
+        """Agregar texto de la respuesta (los textos seguidos se unen en un solo evento)"""
+        if chunk:
+            self._text.append(chunk)
+            self._size += len(chunk)
+
+    def event(self, data: Dict[str, Any]):
+        """Agregar un evento (tarjeta, cierre, error) después del texto ya acumulado"""
+        self._close_text()
+        self._frames.append(encode_event(data))
+
+    def _close_text(self):
+        if self._text:
+            text = ''.join(self._text)
+            self._text.clear()
+            self._size = 0
+            while len(text) > self.max_chars:
+                cut = _split_point(text, self.max_chars)
+                self._frames.append(text_event(text[:cut]))
+                text = text[cut:]
+            if text:
+                self._frames.append(text_event(text))
+
+    def ready(self) -> bool:
+        """Hay algo pendiente y ya se alcanzó el tamaño o el tiempo de agrupación"""
+        if not (self._text or self._frames):
+            return False
+        return (self._size >= self.max_chars or self.max_delay <= 0
+                or time.monotonic() - self._last_flush >= self.max_delay)
+
+    def flush(self) -> str:
+        """Todo lo pendiente como una sola escritura ('' si no hay nada)"""
+        self._close_text()
+        if not self._frames:
+            return ''
+        out = ''.join(self._frames)
+        self._frames.clear()
+        self._last_flush = time.monotonic()
+        return out
+
+    def drain(self) -> str:
+        """flush() si ya conviene enviar; si no, '' y el contenido sigue acumulándose"""
+        return self.flush() if self.ready() else ''
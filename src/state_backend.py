@@ -0,0 +1,622 @@
+"""
+Backends de estado compartido
+Almacén clave/valor con TTL y contadores atómicos para caché, cuotas y memoria
+conversacional. Permite que varios workers (por ejemplo gunicorn) compartan estado:
+
+- local:  diccionario en memoria del proceso (un solo worker)
+- sqlite: archivo SQLite en modo WAL con mmap, compartido por los procesos de la máquina
+- redis:  cualquier servidor que hable el protocolo de Redis (RESP), con respaldo en
+          memoria local mientras el servidor no responde
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class StateBackendError(Exception):
+    """Error de comunicación con el backend de estado"""
+
+
+def bucket_level(raw: Optional[str], capacity: float, rate: float, now: float) -> float:
+    """Tokens disponibles de una cubeta guardada como 'tokens:marca_de_tiempo' (llena si no existe)"""
+    if not raw:
+        return capacity
+    try:
+        tokens, updated_at = (float(part) for part in raw.split(':', 1))
+    except ValueError:
+        return capacity
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+def _bucket_take(raw, capacity, rate, cost, now) -> Tuple[bool, float, str]:
+    tokens = bucket_level(raw, capacity, rate, now)
+    allowed = cost <= 0 or tokens >= cost
+    if allowed:
+        tokens = min(capacity, tokens - cost)
+    return allowed, tokens, f"{tokens:.6f}:{now:.6f}"
+
+
+class StateBackend(ABC):
+    """
+    Interfaz común de los backends.
+
+    Los valores se guardan como texto; get_json/set_json serializan estructuras.
+    `ttl` son segundos de vida (None = sin expiración).
+    """
+
+    # True si el estado es visible para otros procesos
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Valor guardado, o None si no existe o expiró"""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Guardar el valor, reemplazando el anterior y su TTL"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Eliminar la clave (si no existe no hace nada)"""
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Incremento atómico; el TTL se aplica solo cuando la clave se crea"""
+
+    @abstractmethod
+    def take_tokens(self, key: str, capacity: float, rate: float, cost: float = 1.0,
+                    ttl: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Cubeta de tokens atómica: se recarga `rate` tokens por segundo hasta `capacity`
+        y descuenta `cost` solo si alcanzan (un costo negativo devuelve tokens).
+
+        Returns:
+            (permitido, tokens que quedan)
+        """
+
+    @abstractmethod
+    def update(self, key: str, fn: Callable[[Optional[str]], str], ttl: Optional[float] = None) -> str:
+        """
+        Lectura-modificación-escritura atómica entre procesos: guarda fn(valor actual o None)
+        con el TTL indicado y lo devuelve. fn puede llamarse más de una vez (si otro
+        proceso escribió la clave entre medio) y no debe tener efectos fuera del valor.
+        """
+
+    @abstractmethod
+    def clear(self, prefix: str = ''):
+        """Eliminar todas las claves que empiezan con `prefix`"""
+
+    def get_json(self, key: str, default: Any = None) -> Any:
+        raw = self.get(key)
+        if raw is None:
+            return default
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return default
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.set(key, json.dumps(value, ensure_ascii=False, separators=(',', ':')), ttl)
+
+    def update_json(self, key: str, fn: Callable[[Any], Any], ttl: Optional[float] = None) -> Any:
+        """update() con estructuras: fn recibe la guardada (None si no hay o no es JSON)"""
+        result = []
+
+        def apply(raw):
+            try:
+                value = json.loads(raw) if raw is not None else None
+            except ValueError:
+                value = None
+            result[:] = [fn(value)]
+            return json.dumps(result[0], ensure_ascii=False, separators=(',', ':'))
+
+        self.update(key, apply, ttl)
+        return result[0]
+
+    def describe(self) -> str:
+        return type(self).__name__
+
+
+class LocalBackend(StateBackend):
+    """Estado en memoria del proceso, acotado por número de claves (LRU)"""
+
+    shared = False
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _alive(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return item
+
+    def _store(self, key, value, expires_at):
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            item = self._alive(key, time.time())
+            return item[0] if item else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        with self._lock:
+            item = self._alive(key, now)
+            if item is None:
+                value, expires_at = amount, (now + ttl if ttl else None)
+            else:
+                value, expires_at = int(item[0]) + amount, item[1]
+            self._store(key, str(value), expires_at)
+            return value
+
+    def take_tokens(self, key, capacity, rate, cost=1.0, ttl=None):
+        now = time.time()
+        with self._lock:
+            item = self._alive(key, now)
+            allowed, tokens, value = _bucket_take(item[0] if item else None, capacity, rate, cost, now)
+            self._store(key, value, now + ttl if ttl else None)
+            return allowed, tokens
+
+    def update(self, key, fn, ttl=None):
+        now = time.time()
+        with self._lock:
+            item = self._alive(key, now)
+            value = fn(item[0] if item else None)
+            self._store(key, value, now + ttl if ttl else None)
+            return value
+
+    def clear(self, prefix=''):
+        with self._lock:
+            if not prefix:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class SQLiteBackend(StateBackend):
+    """
+    Estado en un archivo SQLite compartido por todos los procesos de la máquina.
+
+    Usa WAL (lectores concurrentes con un escritor) y mmap para que las lecturas
+    no copien páginas; cada hilo mantiene su propia conexión.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = 'data/state.db', mmap_size: int = 64 * 1024 * 1024):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv(expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        self._conn().execute(
+            "INSERT INTO kv(key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, time.time() + ttl if ttl else None)
+        )
+        self._maybe_purge()
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        conn = self._conn()
+        now = time.time()
+        # BEGIN IMMEDIATE toma el lock de escritura: el incremento es atómico entre procesos
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                value, expires_at = amount, (now + ttl if ttl else None)
+            else:
+                value, expires_at = int(row[0]) + amount, row[1]
+            conn.execute(
+                "INSERT OR REPLACE INTO kv(key, value, expires_at) VALUES (?, ?, ?)",
+                (key, str(value), expires_at)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def take_tokens(self, key, capacity, rate, cost=1.0, ttl=None):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            allowed, tokens, value = _bucket_take(row[0] if row else None, capacity, rate, cost, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO kv(key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl else None)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def update(self, key, fn, ttl=None):
+        conn = self._conn()
+        now = time.time()
+        # Con el lock de escritura tomado ningún otro proceso puede escribir entre la lectura y la escritura
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            value = fn(row[0] if row else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO kv(key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl else None)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def clear(self, prefix=''):
+        if prefix:
+            self._conn().execute("DELETE FROM kv WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        else:
+            self._conn().execute("DELETE FROM kv")
+
+    def _maybe_purge(self):
+        """Eliminar claves expiradas de vez en cuando para que el archivo no crezca"""
+        self._writes += 1
+        if self._writes % 500 == 0:
+            self._conn().execute(
+                "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+
+    def describe(self):
+        return f"SQLiteBackend({self.path})"
+
+
+class RedisBackend(StateBackend):
+    """
+    Estado en un servidor compatible con Redis, usando un cliente RESP mínimo
+    (sin dependencias externas). Cada hilo mantiene su propia conexión.
+    """
+
+    shared = True
+
+    # Misma lógica que _bucket_take, ejecutada de forma atómica en el servidor
+    TAKE_TOKENS_SCRIPT = """
+local capacity, rate, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = capacity
+local raw = redis.call('GET', KEYS[1])
+if raw then
+    local sep = string.find(raw, ':', 1, true)
+    local level, updated_at = tonumber(string.sub(raw, 1, sep - 1)), tonumber(string.sub(raw, sep + 1))
+    if level and updated_at then
+        tokens = math.min(capacity, level + math.max(0, now - updated_at) * rate)
+    end
+end
+local allowed = 0
+if cost <= 0 or tokens >= cost then
+    tokens = math.min(capacity, tokens - cost)
+    allowed = 1
+end
+local value = string.format('%.6f:%.6f', tokens, now)
+if tonumber(ARGV[5]) > 0 then
+    redis.call('SET', KEYS[1], value, 'PX', ARGV[5])
+else
+    redis.call('SET', KEYS[1], value)
+end
+return {allowed, value}
+"""
+
+    # Compare-and-set: escribe ARGV[3] solo si la clave sigue con el valor leído
+    # (ARGV[1]; ARGV[2] = '0' si no existía). Devuelve 1 si escribió, 0 si cambió
+    COMPARE_AND_SET_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if ARGV[2] == '1' then
+    if current ~= ARGV[1] then
+        return 0
+    end
+elseif current then
+    return 0
+end
+if tonumber(ARGV[4]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[3], 'PX', ARGV[4])
+else
+    redis.call('SET', KEYS[1], ARGV[3])
+end
+return 1
+"""
+    # Intentos de update() antes de rendirse si otros procesos siguen escribiendo la clave
+    UPDATE_ATTEMPTS = 50
+
+    # Comandos que se pueden repetir sin cambiar el resultado
+    IDEMPOTENT = frozenset({'GET', 'SET', 'DEL', 'SCAN', 'PING'})
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.url = url
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or '/0').lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # --- protocolo RESP ---
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._roundtrip('AUTH', self.password)
+        if self.db:
+            self._roundtrip('SELECT', self.db)
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Conexión cerrada por el servidor")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise StateBackendError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2].decode('utf-8')
+        if kind == b'*':
+            count = int(payload)
+            if count == -1:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise StateBackendError(f"Respuesta RESP desconocida: {line!r}")
+
+    def _roundtrip(self, *args):
+        self._local.sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def _closed_by_server(self) -> bool:
+        """La conexión guardada ya fue cerrada por el servidor (por ejemplo, por inactividad)"""
+        sock = self._local.sock
+        try:
+            sock.setblocking(False)
+            try:
+                return sock.recv(1, socket.MSG_PEEK) == b''
+            finally:
+                sock.settimeout(self.timeout)
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+
+    def execute(self, *args):
+        """
+        Enviar un comando. Si la conexión falla a mitad de camino solo se reintenta un
+        comando idempotente: INCRBY o EVAL pudieron aplicarse aunque no llegara la respuesta.
+        """
+        attempts = 2 if args[0] in self.IDEMPOTENT else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                if getattr(self._local, 'sock', None) is not None and self._closed_by_server():
+                    self._disconnect()
+                if getattr(self._local, 'sock', None) is None:
+                    self._connect()
+                return self._roundtrip(*args)
+            except OSError as e:
+                self._disconnect()
+                if attempt == attempts:
+                    raise StateBackendError(f"Error de conexión con Redis ({args[0]}): {e}") from e
+
+    # --- interfaz StateBackend ---
+
+    def get(self, key):
+        return self.execute('GET', key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.execute('SET', key, value, 'PX', int(ttl * 1000))
+        else:
+            self.execute('SET', key, value)
+
+    def delete(self, key):
+        self.execute('DEL', key)
+
+    def incr(self, key, amount=1, ttl=None):
+        if ttl:
+            # La clave se crea ya con su expiración (NX: solo si no existe) e INCRBY la
+            # conserva; aunque la conexión se corte entre los dos, la clave siempre expira
+            self.execute('SET', key, 0, 'PX', int(ttl * 1000), 'NX')
+        return self.execute('INCRBY', key, amount)
+
+    def take_tokens(self, key, capacity, rate, cost=1.0, ttl=None):
+        allowed, value = self.execute('EVAL', self.TAKE_TOKENS_SCRIPT, 1, key, capacity, rate, cost,
+                                      repr(time.time()), int(ttl * 1000) if ttl else 0)
+        return bool(allowed), float(value.split(':', 1)[0])
+
+    def update(self, key, fn, ttl=None):
+        # Concurrencia optimista: si otro proceso escribió la clave entre GET y EVAL, repetir
+        ttl_ms = int(ttl * 1000) if ttl else 0
+        for _ in range(self.UPDATE_ATTEMPTS):
+            current = self.execute('GET', key)
+            value = fn(current)
+            if self.execute('EVAL', self.COMPARE_AND_SET_SCRIPT, 1, key, current or '',
+                            0 if current is None else 1, value, ttl_ms):
+                return value
+        raise StateBackendError(f"update de {key} sin éxito tras {self.UPDATE_ATTEMPTS} intentos")
+
+    def clear(self, prefix=''):
+        cursor = '0'
+        while True:
+            cursor, keys = self.execute('SCAN', cursor, 'MATCH', f'{prefix}*', 'COUNT', 500)
+            if keys:
+                self.execute('DEL', *keys)
+            if cursor == '0':
+                break
+
+    def describe(self):
+        return f"RedisBackend({self.host}:{self.port}/{self.db})"
+
+
+class FailoverBackend(StateBackend):
+    """
+    Backend compartido con respaldo en memoria local.
+
+    Si el primario falla (StateBackendError) la operación se resuelve en el respaldo
+    y durante `retry_after` segundos se usa solo el respaldo, sin esperar el timeout
+    en cada consulta; después se vuelve a probar el primario. Mientras tanto cuotas,
+    caché y conversaciones son locales al proceso en lugar de fallar con un 500.
+    """
+
+    def __init__(self, primary: StateBackend, fallback: Optional[StateBackend] = None,
+                 retry_after: float = 30.0):
+        self.primary = primary
+        self.fallback = fallback or LocalBackend()
+        self.retry_after = retry_after
+        self.shared = primary.shared
+        self.failures = 0
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def degraded(self) -> bool:
+        return time.monotonic() < self._down_until
+
+    def _call(self, method: str, *args, **kwargs):
+        if not self.degraded:
+            try:
+                return getattr(self.primary, method)(*args, **kwargs)
+            except StateBackendError as e:
+                with self._lock:
+                    self.failures += 1
+                    self._down_until = time.monotonic() + self.retry_after
+                print(f"ADVERTENCIA: {self.primary.describe()} no responde ({e}); "
+                      f"usando memoria local durante {self.retry_after:g} s")
+        return getattr(self.fallback, method)(*args, **kwargs)
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def set(self, key, value, ttl=None):
+        self._call('set', key, value, ttl)
+
+    def delete(self, key):
+        self._call('delete', key)
+
+    def incr(self, key, amount=1, ttl=None):
+        return self._call('incr', key, amount, ttl)
+
+    def take_tokens(self, key, capacity, rate, cost=1.0, ttl=None):
+        return self._call('take_tokens', key, capacity, rate, cost, ttl)
+
+    def update(self, key, fn, ttl=None):
+        return self._call('update', key, fn, ttl)
+
+    def clear(self, prefix=''):
+        self.fallback.clear(prefix)
+        self._call('clear', prefix)
+
+    def describe(self):
+        if self.degraded:
+            return f"{self.primary.describe()} (sin conexión: memoria local)"
+        return self.primary.describe()
+
+
+def create_backend(kind: str = 'local', **options) -> StateBackend:
+    """
+    Crear el backend indicado por configuración.
+
+    Args:
+        kind: 'local', 'sqlite' o 'redis'
+        options: sqlite_path, redis_url, local_max_entries
+    """
+    kind = (kind or 'local').lower()
+    if kind == 'sqlite':
+        return SQLiteBackend(options.get('sqlite_path') or 'data/state.db')
+    if kind == 'redis':
+        return FailoverBackend(RedisBackend(options.get('redis_url') or 'redis://localhost:6379/0'))
+    if kind != 'local':
+        print(f"ADVERTENCIA: STATE_BACKEND '{kind}' desconocido, usando memoria local")
+    return LocalBackend(options.get('local_max_entries') or 10000)
@@ -0,0 +1,29 @@
+"""
+Normalización de texto en español
+Utilidades compartidas para comparar textos sin tildes ni mayúsculas
+"""
+
+import re
+import unicodedata
+from typing import List
+
+# Marcas diacríticas combinables que quedan tras la descomposición NFD
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+_WORDS = re.compile(r'\w+')
+
+
+def strip_accents(text: str) -> str:
+    """Quitar tildes y diacríticos (á -> a, ñ -> n, ü -> u)"""
+    return _COMBINING_MARKS.sub('', unicodedata.normalize('NFD', text))
+
+
+def normalize_text(text) -> str:
+    """Texto sin tildes, en minúsculas y sin espacios en los extremos"""
+    if not isinstance(text, str):
+        text = '' if text is None else str(text)
+    return strip_accents(text).lower().strip()
+
+
+def tokenize(text) -> List[str]:
+    """Palabras normalizadas del texto (sin tildes y en minúsculas)"""
+    return _WORDS.findall(normalize_text(text))
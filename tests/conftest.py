@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Agregar el directorio del proyecto al path para importar src.*
+sys.path.insert(0, str(Path(__file__).parent.parent))
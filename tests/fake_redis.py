@@ -0,0 +1,227 @@
+"""
+Servidor RESP en proceso para probar RedisBackend sin un Redis real
+Implementa solo los comandos que usa el backend (GET, SET con PX/NX, DEL, INCRBY,
+PTTL, SCAN, PING, AUTH, SELECT y los EVAL de la cubeta de tokens y del compare-and-set)
+y permite simular cortes de conexión.
+"""
+
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+
+from src.state_backend import RedisBackend, _bucket_take
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.clients.add(self.connection)
+
+    def finish(self):
+        with self.server.lock:
+            self.server.clients.discard(self.connection)
+        super().finish()
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode('utf-8'))
+        return args
+
+    def handle(self):
+        while True:
+            try:
+                args = self._read_command()
+            except (OSError, ValueError):
+                return
+            if args is None:
+                return
+            reply = self.server.fake.execute(args)
+            if self.server.fake.take_drop():
+                # Comando aplicado, pero la respuesta nunca llega al cliente
+                self.connection.shutdown(socket.SHUT_RDWR)
+                return
+            try:
+                self.wfile.write(_encode(reply))
+            except OSError:
+                return
+
+
+def _encode(reply) -> bytes:
+    if isinstance(reply, Exception):
+        return b'-%s\r\n' % str(reply).encode('utf-8')
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, bool):
+        reply = int(reply)
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(_encode(item) for item in reply)
+    if isinstance(reply, _Status):
+        return b'+%s\r\n' % reply.encode('utf-8')
+    data = str(reply).encode('utf-8')
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+class _Status(str):
+    """Respuesta simple (+OK)"""
+
+
+OK = _Status('OK')
+
+
+class FakeRedis:
+    """
+    Servidor en un hilo, escuchando en 127.0.0.1 en un puerto libre.
+
+    Uso: `with FakeRedis() as server: RedisBackend(server.url)`.
+    """
+
+    def __init__(self):
+        self.data = {}         # clave -> (valor, expira_en o None)
+        self.commands = []     # Nombres de los comandos recibidos, en orden
+        self._drops = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._server.lock = threading.Lock()
+        self._server.clients = set()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close_clients()
+        self._server.shutdown()
+        self._server.server_close()
+
+    # --- simulación de fallos ---
+
+    def close_clients(self):
+        """Cerrar todas las conexiones abiertas (como un timeout de inactividad del servidor)"""
+        with self._server.lock:
+            clients = list(self._server.clients)
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        deadline = time.monotonic() + 1.0
+        while self._server.clients and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def drop_next_reply(self, count: int = 1):
+        """Aplicar los próximos comandos pero cortar la conexión antes de responder"""
+        with self._lock:
+            self._drops += count
+
+    def take_drop(self) -> bool:
+        with self._lock:
+            if self._drops:
+                self._drops -= 1
+                return True
+            return False
+
+    # --- comandos ---
+
+    def _get(self, key):
+        item = self.data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            del self.data[key]
+            return None
+        return item
+
+    def execute(self, args):
+        name = args[0].upper()
+        with self._lock:
+            self.commands.append(name)
+            try:
+                return getattr(self, f'_cmd_{name.lower()}')(*args[1:])
+            except AttributeError:
+                return Exception(f"ERR unknown command '{name}'")
+            except (TypeError, ValueError) as e:
+                return Exception(f"ERR {e}")
+
+    def _cmd_ping(self):
+        return _Status('PONG')
+
+    def _cmd_auth(self, *_):
+        return OK
+
+    def _cmd_select(self, _db):
+        return OK
+
+    def _cmd_get(self, key):
+        item = self._get(key)
+        return item[0] if item else None
+
+    def _cmd_set(self, key, value, *options):
+        options = [o.upper() for o in options]
+        expires_at = None
+        if 'PX' in options:
+            expires_at = time.time() + int(options[options.index('PX') + 1]) / 1000
+        if 'NX' in options and self._get(key) is not None:
+            return None
+        self.data[key] = (value, expires_at)
+        return OK
+
+    def _cmd_del(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def _cmd_incrby(self, key, amount):
+        item = self._get(key)
+        value = (int(item[0]) if item else 0) + int(amount)
+        self.data[key] = (str(value), item[1] if item else None)
+        return value
+
+    def _cmd_pttl(self, key):
+        item = self._get(key)
+        if item is None:
+            return -2
+        if item[1] is None:
+            return -1
+        return int((item[1] - time.time()) * 1000)
+
+    def _cmd_scan(self, _cursor, *options):
+        pattern = options[options.index('MATCH') + 1] if 'MATCH' in options else '*'
+        keys = [key for key in list(self.data) if self._get(key) and fnmatch.fnmatchcase(key, pattern)]
+        return ['0', keys]
+
+    def _cmd_eval(self, script, numkeys, *rest):
+        if script == RedisBackend.COMPARE_AND_SET_SCRIPT:
+            return self._compare_and_set(rest[0], *rest[int(numkeys):])
+        if script != RedisBackend.TAKE_TOKENS_SCRIPT:
+            return Exception('ERR script no soportado por el servidor de prueba')
+        key = rest[0]
+        capacity, rate, cost, now, ttl_ms = rest[int(numkeys):]
+        item = self._get(key)
+        allowed, _, value = _bucket_take(item[0] if item else None, float(capacity), float(rate),
+                                         float(cost), float(now))
+        ttl_ms = int(ttl_ms)
+        self.data[key] = (value, time.time() + ttl_ms / 1000 if ttl_ms > 0 else None)
+        return [int(allowed), value]
+
+    def _compare_and_set(self, key, expected, existed, value, ttl_ms):
+        item = self._get(key)
+        if (item[0] if item else None) != (expected if existed == '1' else None):
+            return 0
+        ttl_ms = int(ttl_ms)
+        self.data[key] = (value, time.time() + ttl_ms / 1000 if ttl_ms > 0 else None)
+        return 1
@@ -0,0 +1,96 @@
+"""Pruebas de /api/places y /api/stats en app_gemini: ETag, 304, compresión y cursores"""
+
+import pytest
+
+from src.http_cache import decode_cursor
+from src.place_catalog import CatalogSnapshot
+
+core = pytest.importorskip('app_gemini')
+
+
+def make_snapshot(version, count=30):
+    places = tuple({'id': i, 'nombre': f'Parque {i:02d}', 'categoria': 'Parque', 'descripcion': 'verde ' * 20,
+                    'latitud': -12.06 + i * 0.001, 'longitud': -75.2} for i in range(count))
+    return CatalogSnapshot(version, 'prueba', 'con_mysql', (), places, {})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    snapshot = make_snapshot('api-v1')
+    monkeypatch.setattr(core.catalog, 'snapshot', lambda: snapshot)
+    return core.app.test_client()
+
+
+def test_304_keeps_the_etag_of_the_200(client):
+    headers = {'Accept-Encoding': 'gzip'}
+    first = client.get('/api/places', headers=headers)
+    assert first.status_code == 200 and first.headers['Content-Encoding'] == 'gzip'
+    etag = first.headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    again = client.get('/api/places', headers={**headers, 'If-None-Match': etag})
+    assert again.status_code == 304 and again.headers['ETag'] == etag
+    # Otro worker (sin el tamaño del cuerpo memorizado) responde el mismo ETag
+    core._compressible_bodies.clear()
+    again = client.get('/api/places', headers={**headers, 'If-None-Match': etag})
+    assert again.status_code == 304 and again.headers['ETag'] == etag
+
+    plain = client.get('/api/places', headers={'If-None-Match': etag})
+    assert plain.status_code == 304 and plain.headers['ETag'] == etag[:-6] + '"'
+
+
+def test_cursor_round_trip(client):
+    seen = []
+    response = client.get('/api/places?per_page=12&fields=nombre').get_json()
+    while True:
+        seen += [place['nombre'] for place in response['places']]
+        assert set(response['places'][0]) == {'nombre'}
+        if not response['has_more']:
+            break
+        response = client.get(f"/api/places?per_page=12&fields=nombre&cursor={response['next_cursor']}").get_json()
+    assert seen == [f'Parque {i:02d}' for i in range(30)]
+
+    bad = client.get('/api/places?per_page=12&cursor=no-es-un-cursor')
+    assert bad.status_code == 400
+
+
+def test_cursor_from_another_catalog_version_is_rejected(client, monkeypatch):
+    cursor = client.get('/api/places?per_page=5').get_json()['next_cursor']
+    newer = make_snapshot('api-v2')
+    monkeypatch.setattr(core.catalog, 'snapshot', lambda: newer)
+    assert client.get(f'/api/places?per_page=5&cursor={cursor}').status_code == 400
+
+
+def test_etag_and_payload_come_from_one_snapshot(monkeypatch):
+    # El catálogo cambia de versión a mitad de la petición: todo debe salir de la primera lectura
+    snapshots = iter([make_snapshot('api-old', 10)] + [make_snapshot('api-new', 3)] * 10)
+    monkeypatch.setattr(core.catalog, 'snapshot', lambda: next(snapshots))
+    body = core.app.test_client().get('/api/places?per_page=4').get_json()
+    assert body['total'] == 10
+    assert decode_cursor(body['next_cursor'])['v'] == 'api-old'
+
+
+def test_stats_revalidates(client):
+    first = client.get('/api/stats')
+    assert first.status_code == 200 and first.get_json()['total_lugares'] == 30
+    assert client.get('/api/stats', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+
+def test_nearby_orders_by_distance_and_respects_radius(client):
+    body = client.get('/api/places/nearby?lat=-12.055&lon=-75.2&k=3').get_json()
+    assert [p['nombre'] for p in body['places']][0] == 'Parque 05'
+    assert {p['nombre'] for p in body['places'][1:]} == {'Parque 04', 'Parque 06'}
+    assert body['places'][0]['distancia_m'] == 0.0 and body['total'] == 3
+
+    # Los vecinos están a ~111 m: un radio de 100 m deja solo el punto exacto
+    body = client.get('/api/places/nearby?lat=-12.055&lon=-75.2&radius=100').get_json()
+    assert [p['nombre'] for p in body['places']] == ['Parque 05']
+
+    body = client.get(f'/api/places/nearby?lat=-12.06&lon=-75.2&k={core.MAX_NEARBY_RESULTS + 10}').get_json()
+    assert body['total'] == 30
+
+
+@pytest.mark.parametrize('query', ['lon=-75.2', 'lat=abc&lon=-75.2', 'lat=91&lon=0', 'lat=0&lon=0&radius=-5',
+                                   'lat=nan&lon=0'])
+def test_nearby_rejects_bad_parameters(client, query):
+    assert client.get(f'/api/places/nearby?{query}').status_code == 400
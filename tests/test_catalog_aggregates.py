@@ -0,0 +1,63 @@
+"""Pruebas de los agregados del catálogo (/api/stats y dashboard)"""
+
+from datetime import datetime
+
+from src.catalog_aggregates import DEFAULT_THEMES, classify_name, compute_aggregates
+from src.place_catalog import CatalogSnapshot
+
+PLACES = (
+    {'id': 1, 'nombre': 'Catedral de Huancayo', 'categoria': 'Iglesia', 'updated_at': datetime(2024, 5, 1)},
+    {'id': 2, 'nombre': 'Parque de la Identidad', 'categoria': 'Parque', 'updated_at': datetime(2024, 6, 2)},
+    {'id': 3, 'nombre': 'Parque Túpac Amaru', 'categoria': 'Parque', 'updated_at': None},
+    {'id': 4, 'nombre': 'Mirador Cerrito de la Libertad', 'categoria': None},
+    {'id': 5, 'nombre': 'Torre Torre', 'categoria': 'Mirador'},
+)
+IMAGES = {1: (('a.jpg', None), ('b.jpg', None)), 2: (('c.jpg', None),), 3: ()}
+COLUMNS = ('id', 'nombre', 'categoria', 'updated_at')
+
+
+def snapshot(places=PLACES, columns=COLUMNS, status='con_mysql'):
+    return CatalogSnapshot('v1', 'prueba', status, columns, places, IMAGES)
+
+
+def test_classify_name():
+    assert classify_name('PARQUE de la Identidad') == 'Naturaleza'
+    assert classify_name('Museo Salesiano') == 'Cultura'
+    assert classify_name('Picantería La Tullpa') == 'Gastronomía'
+    assert classify_name('Torre Torre') == 'Otros'
+
+
+def test_counts():
+    aggregates = compute_aggregates(snapshot())
+    assert aggregates.total_lugares == 5
+    assert aggregates.total_imagenes == 3
+    assert aggregates.lugares_con_imagen == 2
+    # Más frecuente primero; a igual cantidad por nombre
+    assert aggregates.por_categoria == (('Parque', 2), ('Iglesia', 1), ('Mirador', 1), ('Sin categoría', 1))
+    assert dict(aggregates.por_tema) == {'Naturaleza': 2, 'Aventura': 1, 'Otros': 2}
+
+
+def test_last_update_from_column():
+    assert compute_aggregates(snapshot()).last_update == datetime(2024, 6, 2)
+
+
+def test_last_update_falls_back_to_load_time():
+    snap = snapshot(columns=('id', 'nombre', 'categoria'))
+    assert compute_aggregates(snap).last_update == datetime.fromtimestamp(snap.loaded_at)
+
+
+def test_stats_payload():
+    payload = compute_aggregates(snapshot()).stats_payload
+    assert payload['total_lugares'] == 5 and payload['total_imagenes'] == 3
+    assert 'Naturaleza (2)' in payload['categorias']
+    assert payload['por_categoria']['Parque'] == 2
+    assert payload['last_update'] == '2024-06-02T00:00:00'
+    assert payload['estado'] == 'con_mysql'
+
+
+def test_unavailable_catalog():
+    aggregates = compute_aggregates(snapshot(status='sin_mysql'))
+    assert aggregates.total_lugares == 0 and aggregates.por_categoria == ()
+    assert aggregates.stats_payload['categorias'] == DEFAULT_THEMES
+    assert aggregates.stats_payload['last_update'] is None
+    assert aggregates.stats_payload['estado'] == 'sin_mysql'
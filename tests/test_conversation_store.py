@@ -0,0 +1,61 @@
+"""Pruebas de la memoria conversacional: compactación, resumen, desalojo y varios workers"""
+
+import threading
+
+from src.conversation_store import ConversationStore, compact_text
+from src.state_backend import LocalBackend, SQLiteBackend
+
+
+def texts(store, session_id):
+    return [message[1] for message in store.messages(session_id)]
+
+
+def test_compact_text_strips_html_and_images():
+    html = '<p>Visita <strong>Plaza Constitución</strong></p><img src="x.jpg"> ![foto](y.png)&amp; más'
+    assert compact_text(html) == 'Visita **Plaza Constitución**\n& más'
+    assert compact_text('palabra ' * 200, limit=20).endswith('…')
+
+
+def test_context_has_summary_and_last_turn():
+    store = ConversationStore(max_tokens=350)
+    store.append('s1', '¿Qué parques hay?', True)
+    store.append('s1', 'Te recomiendo el **Parque de la Identidad**.', False)
+    store.append('s1', '¿Y plazas?', True)
+    store.append('s1', 'La **Plaza Constitución** es la principal.', False)
+    context = store.context('s1')
+    assert context.startswith('CONVERSACIÓN RECIENTE:')
+    assert 'Parque de la Identidad' in context  # Plegado en el resumen
+    assert context.rstrip().endswith('Asistente: La **Plaza Constitución** es la principal.')
+    assert store.context('otra') == ''
+
+
+def test_evicted_sessions_spill_and_restore():
+    spill = LocalBackend()
+    store = ConversationStore(max_bytes=1, spill=spill)
+    store.append('a', 'hola', True)
+    store.append('b', 'hola', True)
+    # Con un tope mínimo solo queda la sesión más reciente en memoria
+    assert len(store) == 1 and store.stats()['spilled'] == 1
+    assert texts(store, 'a') == ['hola']
+    store.append('a', 'sigo aquí', True)
+    assert texts(store, 'a') == ['hola', 'sigo aquí']
+    assert store.stats()['restored'] == 1
+
+
+def test_write_through_workers_do_not_lose_messages(tmp_path):
+    # Dos workers con su propio almacén sobre el mismo archivo SQLite, escribiendo a la vez
+    path = str(tmp_path / 'state.db')
+    workers = [ConversationStore(max_messages=100, spill=SQLiteBackend(path), write_through=True)
+               for _ in range(2)]
+
+    def chat(store, n):
+        for i in range(30):
+            store.append('sesion-compartida', f'{n}-{i}', i % 2 == 0)
+
+    threads = [threading.Thread(target=chat, args=(store, n)) for n, store in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert sorted(texts(workers[0], 'sesion-compartida')) == sorted(f'{n}-{i}' for n in range(2) for i in range(30))
+    assert texts(workers[0], 'sesion-compartida') == texts(workers[1], 'sesion-compartida')
@@ -0,0 +1,124 @@
+"""Pruebas del pool de conexiones con conexiones falsas"""
+
+import threading
+
+import pytest
+
+from src.db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self, n):
+        self.n = n
+        self.closed = False
+        self.alive = True
+        self.pings = 0
+
+    def consume_results(self):
+        if self.closed:
+            raise RuntimeError('cerrada')
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.alive:
+            raise RuntimeError('se perdió la conexión')
+
+    def close(self):
+        self.closed = True
+
+    def cursor(self):
+        return f'cursor-{self.n}'
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def pool(opened):
+    def factory():
+        opened.append(FakeConnection(len(opened)))
+        return opened[-1]
+    return ConnectionPool(factory, max_size=2, timeout=0.2, max_uses=3, health_check_interval=60)
+
+
+def test_connections_are_reused(pool, opened):
+    for _ in range(2):
+        with pool.acquire() as conn:
+            assert conn.cursor() == 'cursor-0'
+    assert len(opened) == 1
+    assert pool.metrics()['borrows'] == 2 and pool.metrics()['idle'] == 1
+
+
+def test_close_twice_and_use_after_close(pool):
+    conn = pool.acquire()
+    conn.close()
+    conn.close()
+    assert pool.metrics()['in_use'] == 0
+    with pytest.raises(AttributeError):
+        conn.cursor()
+
+
+def test_timeout_when_exhausted(pool):
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.metrics()['timeouts'] == 1
+    for conn in held:
+        conn.close()
+
+
+def test_waiter_gets_released_connection(pool):
+    held = [pool.acquire(), pool.acquire()]
+    first = held[0].n
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=2)))
+    waiter.start()
+    held[0].close()
+    waiter.join(2)
+    assert got[0].n == first
+    got[0].close()
+    held[1].close()
+    assert pool.metrics()['size'] == 2
+
+
+def test_recycled_after_max_uses(pool, opened):
+    for _ in range(4):
+        pool.acquire().close()
+    assert opened[0].closed
+    assert len(opened) == 2 and pool.metrics()['recycled'] == 1
+
+
+def test_broken_connection_is_replaced(pool, opened):
+    conn = pool.acquire()
+    conn.discard()
+    assert opened[0].closed and pool.metrics()['discarded'] == 1
+    pool.acquire().close()
+    assert len(opened) == 2
+
+
+def test_idle_connection_health_checked(opened):
+    pool = ConnectionPool(lambda: opened.append(FakeConnection(len(opened))) or opened[-1],
+                          max_size=1, health_check_interval=0)
+    pool.acquire().close()
+    opened[0].alive = False
+    with pool.acquire() as conn:
+        assert conn.n == 1
+    assert pool.metrics()['health_check_failures'] == 1
+
+
+def test_connect_error_frees_the_slot(opened):
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError('MySQL no responde')
+        return FakeConnection(len(attempts))
+
+    pool = ConnectionPool(factory, max_size=1, timeout=0.2)
+    with pytest.raises(OSError):
+        pool.acquire()
+    pool.acquire().close()
+    assert pool.metrics()['connect_errors'] == 1 and pool.metrics()['size'] == 1
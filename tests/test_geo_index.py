@@ -0,0 +1,123 @@
+"""Pruebas del índice geoespacial: mismos vecinos que medir contra todos los lugares"""
+
+import random
+
+import numpy as np
+import pytest
+
+from src.geo_index import METERS_PER_DEGREE, GeoIndex, format_distance, haversine_m
+from src.place_index import PlaceRecord
+
+LAT, LON = -12.0686, -75.2102  # Plaza Constitución, Huancayo
+
+
+def brute_force(records, lat, lon, k, radius_m=None):
+    lats = np.array([r.latitud for r in records], dtype=np.float64)
+    lons = np.array([r.longitud for r in records], dtype=np.float64)
+    distances = haversine_m(lat, lon, lats, lons)
+    order = [i for i in np.argsort(distances, kind='stable') if radius_m is None or distances[i] <= radius_m]
+    return [float(distances[i]) for i in order[:k]]
+
+
+def random_records(rng, count, lat, span):
+    return [PlaceRecord(i, f'Lugar {i}', latitud=lat + rng.uniform(-span, span),
+                        longitud=LON + rng.uniform(-span, span)) for i in range(count)]
+
+
+def test_format_distance():
+    assert format_distance(0) == '0 m'
+    assert format_distance(344) == '340 m'
+    assert format_distance(999) == '1000 m'
+    assert format_distance(1000) == '1.0 km'
+    assert format_distance(12345) == '12.3 km'
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    center = rng.choice([LAT, 0.0, 60.0, -75.0])
+    span = rng.choice([0.01, 0.2, 2.0])
+    records = random_records(rng, rng.randint(1, 200), center, span)
+    index = GeoIndex(records, rng.choice([None, 0.001, 0.01, 0.05]))
+    for _ in range(10):
+        lat = center + rng.uniform(-2 * span, 2 * span)
+        lon = LON + rng.uniform(-2 * span, 2 * span)
+        k = rng.randint(1, 15)
+        radius = rng.choice([None, 500, 5000, 50000])
+        got = [d for _, d in index.nearby(lat, lon, k, radius)]
+        assert np.allclose(got, brute_force(records, lat, lon, k, radius))
+
+
+def test_neighbor_just_past_the_first_ring():
+    # El vecino de la celda contigua está más cerca que el de la misma celda
+    cell = 0.01
+    records = [PlaceRecord(1, 'Misma celda', latitud=0.0001, longitud=0.0099),
+               PlaceRecord(2, 'Celda vecina', latitud=0.0001, longitud=0.0101),
+               PlaceRecord(3, 'Lejos', latitud=0.05, longitud=0.05)]
+    index = GeoIndex(records, cell)
+    (first, _), = index.nearby(0.0001, 0.01005, k=1)
+    assert first.nombre == 'Celda vecina'
+    assert [r.nombre for r, _ in index.nearby(0.0, 0.0, k=1)] == ['Misma celda']
+
+
+def test_point_on_cell_boundary():
+    records = [PlaceRecord(i, f'L{i}', latitud=0.01 * i, longitud=0.01 * i) for i in range(-3, 4)]
+    index = GeoIndex(records, 0.01)
+    result = index.nearby(0.01, 0.01, k=3)
+    assert result[0][0].id == 1 and result[0][1] == 0.0
+    assert {r.id for r, _ in result[1:]} == {0, 2}
+    assert np.allclose([d for _, d in result], brute_force(records, 0.01, 0.01, 3))
+
+
+def test_radius_is_inclusive_and_exclusive_beyond():
+    meters = 0.01 * METERS_PER_DEGREE  # Un centésimo de grado de latitud
+    records = [PlaceRecord(1, 'Origen', latitud=0.0, longitud=0.0),
+               PlaceRecord(2, 'Norte', latitud=0.01, longitud=0.0),
+               PlaceRecord(3, 'Más al norte', latitud=0.0101, longitud=0.0)]
+    index = GeoIndex(records, 0.001)
+    assert [r.id for r, _ in index.nearby(0.0, 0.0, k=10, radius_m=meters + 0.01)] == [1, 2]
+    assert [r.id for r, _ in index.nearby(0.0, 0.0, k=10, radius_m=meters - 0.01)] == [1]
+    assert index.nearby(0.5, 0.5, k=10, radius_m=100) == []
+
+
+def test_k_limits():
+    rng = random.Random(7)
+    records = random_records(rng, 30, LAT, 0.05)
+    index = GeoIndex(records)
+    assert len(index.nearby(LAT, LON, k=5)) == 5
+    assert len(index.nearby(LAT, LON, k=100)) == 30
+    assert index.nearby(LAT, LON, k=0) == []
+
+
+def test_far_query_point():
+    records = random_records(random.Random(3), 50, LAT, 0.05)
+    index = GeoIndex(records, 0.001)
+    got = [d for _, d in index.nearby(40.0, 10.0, k=3)]
+    assert np.allclose(got, brute_force(records, 40.0, 10.0, 3))
+
+
+def test_skips_invalid_coordinates():
+    records = [PlaceRecord(1, 'Válido', latitud='-12.06', longitud='-75.21'),
+               PlaceRecord(2, 'Sin latitud', latitud=None, longitud=-75.2),
+               PlaceRecord(3, 'Texto', latitud='norte', longitud=-75.2),
+               PlaceRecord(4, 'Fuera de rango', latitud=95, longitud=-75.2),
+               PlaceRecord(5, 'Infinito', latitud=float('inf'), longitud=-75.2)]
+    index = GeoIndex(records)
+    assert len(index) == 1
+    assert [r.id for r, _ in index.nearby(LAT, LON)] == [1]
+
+
+def test_empty_index():
+    index = GeoIndex([])
+    assert len(index) == 0 and index.nearby(LAT, LON) == []
+
+
+def test_nearby_place_excludes_itself():
+    records = random_records(random.Random(11), 20, LAT, 0.02)
+    index = GeoIndex(records)
+    anchor = records[4]
+    neighbors = index.nearby_place(anchor, k=3)
+    assert len(neighbors) == 3 and all(r is not anchor for r, _ in neighbors)
+    expected = brute_force(records, anchor.latitud, anchor.longitud, 4)[1:]
+    assert np.allclose([d for _, d in neighbors], expected)
+    assert index.nearby_place(PlaceRecord(99, 'Sin coordenadas')) == []
@@ -0,0 +1,132 @@
+"""Pruebas del enrutador de intenciones, con detectores simplificados y con los de app_gemini"""
+
+import pytest
+
+from src.intent_router import IntentRouter, detect_category_name
+from src.place_index import PlaceIndex, PlaceRecord
+from src.place_matcher import PlaceMatcher
+from src.place_search import PlaceSearchIndex
+from src.text_normalization import normalize_text
+
+CATEGORIES = {'parque': 'Parque', 'plaza': 'Plaza', 'mirador': 'Mirador'}
+PLACES = ('Parque Uno', 'Plaza Constitución')
+
+
+def detect_category(text):
+    text = normalize_text(text)
+    for word, category in CATEGORIES.items():
+        if word in text:
+            return category
+    return None
+
+
+def detect_place(text):
+    text = normalize_text(text)
+    for name in PLACES:
+        if normalize_text(name) in text:
+            return name
+    return None
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(detect_category, detect_place, lambda kind, message: kind)
+
+
+@pytest.mark.parametrize('message, expected', [
+    ('hola', ('greeting', None, None)),
+    ('¿Qué parques hay?', ('list_category', 'Parque', None)),
+    ('parques', ('list_category', 'Parque', None)),
+    ('muéstrame todos los lugares', ('list_all', None, None)),
+    ('¿Dónde queda el Parque Uno?', ('location', None, 'Parque Uno')),
+    ('¿Qué parques hay para niños?', None),
+    ('dime algo de la plaza', None),
+    ('¿Qué es esto?', None),
+])
+def test_classify(router, message, expected):
+    assert router.classify(message) == expected
+
+
+@pytest.mark.parametrize('message', ['¿Qué es esto?', 'a', 'dime algo de la plaza', 'cuéntame más'])
+def test_selected_category_does_not_turn_any_message_into_a_listing(router, message):
+    assert router.classify(message, 'Parque') is None
+
+
+@pytest.mark.parametrize('message', ['muéstrame', '¿cuáles hay?', 'parques', 'ver todos'])
+def test_selected_category_with_list_request(router, message):
+    assert router.classify(message, 'Parque') == ('list_category', 'Parque', None)
+
+
+def test_route_list_category(router):
+    index = PlaceIndex([PlaceRecord(1, 'Parque Uno', 'Parque', 'Verde'),
+                        PlaceRecord(2, 'Plaza Constitución', 'Plaza')])
+    answer = router.route('¿Qué parques hay?', index, PlaceSearchIndex(index))
+    assert answer.intent == 'list_category'
+    assert [place.nombre for place in answer.records] == ['Parque Uno']
+    assert router.route('¿Qué es esto?', index, PlaceSearchIndex(index), 'Parque') is None
+    assert router.stats()['routed'] == 1 and router.stats()['passed'] == 1
+
+
+# --- Enrutador armado como en app_gemini: detector de categorías real y PlaceMatcher ---
+
+CATALOG = PlaceIndex([
+    PlaceRecord(1, 'Parque Huamanmarca', 'Parque', 'Parque en el centro'),
+    PlaceRecord(2, 'Plaza Constitución', 'Plaza', 'Plaza principal'),
+    PlaceRecord(3, 'Real Plaza Huancayo', 'Centro Comercial', 'Tiendas y cines'),
+    PlaceRecord(4, 'Open Plaza', 'Centro Comercial'),
+])
+
+
+@pytest.fixture
+def app_router():
+    matcher = PlaceMatcher(record.nombre for record in CATALOG.records)
+    return IntentRouter(detect_category_name, matcher.find_first, lambda kind, message: kind)
+
+
+@pytest.mark.parametrize('message, category', [
+    ('parques', 'Parque'),
+    ('¿Qué centros comerciales hay?', 'centros-comerciales'),
+    ('centros comerciales', 'centros-comerciales'),
+    ('hay malls?', 'centros-comerciales'),
+])
+def test_real_detector_routes_category_names(app_router, message, category):
+    assert app_router.classify(message) == ('list_category', category, None)
+
+
+@pytest.mark.parametrize('message', ['plazas', '¿Qué plazas hay?', 'hay tiendas?', '¿qué iglesias hay?'])
+def test_real_detector_does_not_route_prompt_aliases(app_router, message):
+    # "plaza" orienta el prompt hacia Parque, pero no es un listado de parques
+    assert app_router.classify(message) is None
+    assert app_router.classify(message, 'Parque') is None
+
+
+def test_message_category_wins_over_selected_category(app_router):
+    assert app_router.classify('¿qué centros comerciales hay?', 'Parque') == \
+        ('list_category', 'centros-comerciales', None)
+
+
+@pytest.mark.parametrize('message', ['¿y mañana?', 'y luego', '¿y de noche?'])
+def test_companion_words_alone_are_not_small_talk(app_router, message):
+    assert app_router.classify(message) is None
+
+
+@pytest.mark.parametrize('message, intent', [
+    ('hasta mañana', 'farewell'), ('nos vemos', 'farewell'), ('buenas noches', 'greeting'),
+    ('muchas gracias', 'response'),
+])
+def test_small_talk(app_router, message, intent):
+    assert app_router.classify(message) == (intent, None, None)
+
+
+def test_route_headers_use_singular_and_plural(app_router):
+    search = PlaceSearchIndex(CATALOG)
+    answer = app_router.route('parques', CATALOG, search)
+    assert answer.text.startswith('Encontré **1 lugar** en la categoría **parque**:')
+    assert [place.nombre for place in answer.records] == ['Parque Huamanmarca']
+
+    answer = app_router.route('¿qué centros comerciales hay?', CATALOG, search)
+    assert answer.text.startswith('Encontré **2 lugares** en la categoría **centros comerciales**:')
+
+    single = PlaceIndex([PlaceRecord(1, 'Parque Huamanmarca', 'Parque')])
+    answer = app_router.route('muéstrame todos', single, PlaceSearchIndex(single))
+    assert answer.text.startswith('Tenemos **1 lugar** registrado en Huancayo:')
@@ -0,0 +1,95 @@
+"""Pruebas del renderizador de Markdown incremental: por fragmentos igual que de una vez"""
+
+import random
+
+import pytest
+
+from src.markdown_render import IMAGE_STYLE, MarkdownStream, render_markdown
+
+TEXTS = [
+    'Hola **mundo**, te recomiendo la **Plaza Constitución**.',
+    '* uno\n* dos\n- tres\nfin',
+    '# Título\n## Sub\n### Tercero\n#### no es título\n#sin espacio',
+    '![Plaza](https://img/plaza.jpg) y **![Catedral](https://img/catedral.jpg) de noche**',
+    'a & b < c > d',
+    '**sin cerrar\n y ** suelto al final **',
+    '! [no] ![roto\n](x) !![doble](u)!',
+    '- a\n\n- b\n\n\n',
+    '   * con sangría\n   texto  \n',
+    '**Parque de la Identidad**: esculturas ![foto](https://img/p.jpg?a=1&b=2)\n* **Cerrito** ![x](y)',
+    '\n\n*\n-\n#\n**\n![',
+]
+
+
+def img(alt, src):
+    return f'<img src="{src}" alt="{alt}" style="{IMAGE_STYLE}">'
+
+
+def stream(chunks):
+    renderer = MarkdownStream()
+    pieces = [renderer.feed(chunk) for chunk in chunks]
+    pieces.append(renderer.close())
+    return pieces
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Hola **mundo**', 'Hola <strong>mundo</strong>'),
+    ('* uno\n* dos\nfin', '<ul><br><li>uno</li><br><li>dos</li><br></ul><br>fin'),
+    ('# Título\n## Sub\n#### no', '<h2>Título</h2><br><h3>Sub</h3><br>#### no'),
+    ('![Plaza](https://x/a.jpg) y **![b](u)**', img('Plaza', 'https://x/a.jpg') + f' y <strong>{img("b", "u")}</strong>'),
+    ('a & b < c', 'a &amp; b &lt; c'),
+    ('**abierto', '**abierto'),
+    ('![roto\n](x)', '![roto<br>](x)'),
+    ('', ''),
+])
+def test_render(text, expected):
+    assert render_markdown(text) == expected
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_every_split_point_matches(text):
+    expected = render_markdown(text)
+    for i in range(len(text) + 1):
+        assert ''.join(stream([text[:i], text[i:]])) == expected, i
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_one_character_at_a_time(text):
+    assert ''.join(stream(list(text))) == render_markdown(text)
+
+
+@pytest.mark.parametrize('text', ['Visita la **Plaza Constitución** hoy', 'Mira ![Plaza](https://img/a.jpg) aquí'])
+def test_markup_split_across_chunks(text):
+    # "**" y "![" partidos en cualquier posición, también en tres fragmentos
+    expected = render_markdown(text)
+    for i in range(len(text) + 1):
+        for j in range(i, len(text) + 1):
+            assert ''.join(stream([text[:i], text[i:j], text[j:]])) == expected, (i, j)
+
+
+def test_random_chunks():
+    rng = random.Random(13)
+    alphabet = ['*', '**', '-', '#', '##', ' ', '\n', '![', '](', ')', ']', '!', 'a', 'Plaza', '&', '<', 'ñ']
+    for _ in range(300):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 5)))
+        chunks = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        assert ''.join(stream(chunks)) == render_markdown(text), chunks
+
+
+def test_pieces_never_cut_a_tag():
+    text = TEXTS[9]
+    for i in range(len(text) + 1):
+        for piece in stream([text[:i], text[i:]]):
+            assert piece.count('<') == piece.count('>')
+
+
+def test_holds_only_what_can_still_change():
+    renderer = MarkdownStream()
+    assert renderer.feed('Hola *') == 'Hola '
+    assert renderer.feed('*mun') == ''
+    assert renderer.feed('do** y') == '<strong>mundo</strong> y'
+    assert renderer.close() == ''
+    assert renderer.feed('nuevo') == 'nuevo'  # close() deja el renderizador listo para reutilizar
+    assert renderer.close() == ''
+    assert MarkdownStream().close() == ''
@@ -0,0 +1,120 @@
+"""Pruebas de los histogramas de latencia y la exportación a Prometheus"""
+
+import random
+
+import pytest
+
+from src import metrics as metrics_module
+from src.metrics import (_BUCKETS, _SUB_BUCKETS, MAX_MICROS, LatencyHistogram, Metrics, _bucket_bounds,
+                         _bucket_index)
+
+
+def test_bucket_bounds_contain_value_with_bounded_error():
+    values = list(range(0, 5000)) + [random.Random(1).randrange(MAX_MICROS) for _ in range(5000)] + [MAX_MICROS]
+    for micros in values:
+        index = _bucket_index(micros)
+        assert 0 <= index < _BUCKETS
+        low, high = _bucket_bounds(index)
+        assert low <= micros < high
+        assert high - low <= max(1, low / _SUB_BUCKETS)
+
+
+def test_buckets_are_contiguous():
+    previous_high = 0
+    for index in range(_BUCKETS):
+        low, high = _bucket_bounds(index)
+        assert low == previous_high
+        previous_high = high
+    assert previous_high > MAX_MICROS
+
+
+def test_percentiles_within_relative_error():
+    rng = random.Random(5)
+    samples = [rng.lognormvariate(-3, 1.5) for _ in range(5000)]
+    histogram = LatencyHistogram()
+    for seconds in samples:
+        histogram.record(seconds)
+    ordered = sorted(samples)
+    for q, value in histogram.percentiles().items():
+        exact = ordered[max(int(q * len(ordered) + 0.999999), 1) - 1]
+        assert value == pytest.approx(exact, rel=1 / _SUB_BUCKETS, abs=1e-6)
+    assert histogram.count == 5000 and histogram.max == max(samples)
+    assert histogram.total == pytest.approx(sum(samples))
+
+
+def test_percentile_never_exceeds_max_and_clamps_range():
+    histogram = LatencyHistogram()
+    histogram.record(0.0123)
+    assert histogram.percentiles() == {0.5: 0.0123, 0.95: 0.0123, 0.99: 0.0123}
+    histogram.record(-1)       # Reloj hacia atrás: cuenta en la primera cubeta
+    histogram.record(10_000)   # Más de MAX_MICROS: cuenta en la última
+    assert histogram.counts[0] == 1 and histogram.counts[_bucket_index(MAX_MICROS)] == 1
+    assert LatencyHistogram().percentiles() == {0.5: 0.0, 0.95: 0.0, 0.99: 0.0}
+
+
+def test_summary_and_merge():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for _ in range(3):
+        a.record(0.010)
+    b.record(0.100)
+    a.merge(b)
+    summary = a.summary()
+    assert summary['count'] == 4
+    assert summary['avg_ms'] == pytest.approx(32.5)
+    assert summary['max_ms'] == 100.0
+    assert summary['p50_ms'] == pytest.approx(10, rel=0.07)
+    assert summary['p99_ms'] == 100.0
+    assert LatencyHistogram().summary()['avg_ms'] == 0
+
+
+def test_timer(monkeypatch):
+    ticks = iter([10.0, 10.25])
+    monkeypatch.setattr(metrics_module.time, 'perf_counter', lambda: next(ticks))
+    registry = Metrics()
+    with registry.timer('stage_seconds', stage='gemini'):
+        pass
+    histogram = registry.histogram('stage_seconds', stage='gemini')
+    assert histogram.count == 1 and histogram.total == 0.25
+
+
+def test_series_by_labels_and_merged():
+    registry = Metrics()
+    registry.observe('stage_seconds', 0.1, stage='retrieval')
+    registry.observe('stage_seconds', 0.3, stage='gemini')
+    registry.observe('stage_seconds', 0.2, stage='gemini')
+    assert registry.histogram('stage_seconds', stage='gemini').count == 2
+    assert registry.merged('stage_seconds').count == 3
+    assert registry.merged('otra').count == 0
+
+
+def test_counters_and_snapshot():
+    registry = Metrics()
+    registry.incr('cache_lookups_total', tier='semantic', result='hit')
+    registry.incr('cache_lookups_total', 2, result='hit', tier='semantic')  # El orden de las etiquetas no importa
+    registry.incr('requests_total', route='chat')
+    registry.incr('errors_total')
+    registry.observe('request_seconds', 0.05, route='chat')
+    snapshot = registry.snapshot()
+    assert snapshot['counters']['cache_lookups_total'] == {'result=hit,tier=semantic': 3}
+    assert snapshot['counters']['requests_total'] == {'chat': 1}
+    assert snapshot['counters']['errors_total'] == {'all': 1}
+    assert snapshot['latency']['request_seconds']['chat']['count'] == 1
+
+
+def test_prometheus_format():
+    registry = Metrics(prefix='app')
+    registry.describe('request_seconds', 'Duración de las peticiones')
+    registry.observe('request_seconds', 0.5, route='chat')
+    registry.incr('errors_total', kind='dijo "no"\n')
+    text = registry.prometheus()
+    lines = text.splitlines()
+    assert text.endswith('\n')
+    assert lines[0] == '# HELP app_request_seconds Duración de las peticiones'
+    assert lines[1] == '# TYPE app_request_seconds summary'
+    quantile = next(line for line in lines if line.startswith('app_request_seconds{route="chat",quantile="0.5"} '))
+    assert float(quantile.split()[-1]) == pytest.approx(0.5, rel=1 / _SUB_BUCKETS)
+    assert 'app_request_seconds_sum{route="chat"} 0.500000' in lines
+    assert 'app_request_seconds_count{route="chat"} 1' in lines
+    assert '# TYPE app_errors_total counter' in lines
+    assert 'app_errors_total{kind="dijo \\"no\\"\\n"} 1' in lines
+    assert Metrics().prometheus() == '\n'
@@ -0,0 +1,94 @@
+"""Pruebas del catálogo en memoria con una base de datos falsa"""
+
+from src.place_catalog import PlaceCatalog
+
+COLUMNS = ('id', 'nombre', 'categoria', 'updated_at')
+
+
+class FakeDatabase:
+    """Tablas locaciones y locacion_imagenes en memoria; cuenta las consultas"""
+
+    def __init__(self):
+        self.places = [(1, 'Parque Uno', 'Parque', 10), (2, 'Plaza Dos', 'Plaza', 11)]
+        self.images = [(1, 'uno.jpg', 'foto')]
+        self.queries = []
+        self.available = True
+
+    def connect(self):
+        return FakeConnection(self) if self.available else None
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        query = ' '.join(query.split())
+        self.db.queries.append(query)
+        if query == 'DESCRIBE locaciones':
+            self.result = [(c,) for c in COLUMNS]
+        elif query.startswith('SELECT COUNT(*), MAX(updated_at)'):
+            self.result = [(len(self.db.places), max(p[3] for p in self.db.places))]
+        elif query.startswith('SELECT COUNT(*), MAX(id)'):
+            self.result = [(len(self.db.images), max(i[0] for i in self.db.images))]
+        elif query.startswith('SELECT * FROM locaciones'):
+            self.result = sorted(self.db.places, key=lambda p: p[1])
+        elif query.startswith('SELECT locacion_id'):
+            self.result = list(self.db.images)
+        else:
+            raise AssertionError(query)
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+    def close(self):
+        pass
+
+
+def loads(db):
+    return sum(q.startswith('SELECT * FROM locaciones') for q in db.queries)
+
+
+def test_first_read_loads_and_later_reads_do_not_query():
+    db = FakeDatabase()
+    catalog = PlaceCatalog(db.connect, refresh_interval=0)
+    snapshot = catalog.snapshot()
+    assert snapshot.available and snapshot.names == ('Parque Uno', 'Plaza Dos')
+    assert snapshot.images[1] == (('uno.jpg', 'foto'),)
+    queries = len(db.queries)
+    assert catalog.snapshot() is snapshot
+    assert len(db.queries) == queries
+
+
+def test_reload_only_when_watermark_changes():
+    db = FakeDatabase()
+    catalog = PlaceCatalog(db.connect, refresh_interval=0)
+    first = catalog.snapshot()
+    assert catalog.refresh() is False
+    assert loads(db) == 1
+
+    db.places.append((3, 'Mirador Tres', 'Mirador', 12))
+    published = []
+    catalog.on_refresh(published.append)
+    assert catalog.refresh() is True
+    second = catalog.snapshot()
+    assert second.version != first.version and len(second.places) == 3
+    assert published == [second]
+    # La foto anterior no cambia: los lectores que la tienen siguen viendo sus datos
+    assert len(first.places) == 2
+
+
+def test_without_mysql():
+    db = FakeDatabase()
+    db.available = False
+    catalog = PlaceCatalog(db.connect, refresh_interval=0)
+    assert catalog.snapshot().status == 'sin_mysql'
+    db.available = True
+    assert catalog.refresh() is True and catalog.snapshot().available
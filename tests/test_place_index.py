@@ -0,0 +1,62 @@
+"""Pruebas del índice tipado de lugares"""
+
+from src.place_index import PlaceIndex, PlaceRecord
+
+ROWS = [
+    {'id': 1, 'nombre': 'Catedral de Huancayo', 'categoria': 'Iglesia', 'descripcion': 'Templo',
+     'latitud': -12.068, 'longitud': -75.21},
+    {'id': 2, 'nombre': 'Parque de la Identidad', 'categoria': 'Parque', 'descripcion': None,
+     'latitud': None, 'longitud': -75.2},
+    {'id': 3, 'nombre': 'PARQUE DE LA IDENTIDAD', 'categoria': 'parque'},
+    {'id': 4, 'nombre': '', 'categoria': 'Parque'},
+    {'id': 5, 'nombre': 'Museo Salesiano', 'categoria': 'Museo'},
+]
+
+
+def test_record_normalizes_fields():
+    record = PlaceRecord(7, 'Túpac Amaru ', 'Parqué')
+    assert record.nombre_norm == 'tupac amaru'
+    assert record.categoria_norm == 'parque'
+    assert PlaceRecord(8, 'Sin categoría').categoria_norm == ''
+
+
+def test_record_from_row():
+    record = PlaceRecord.from_row(ROWS[0], [('https://img/1.jpg', 'fachada')])
+    assert (record.id, record.nombre, record.categoria, record.descripcion) == (1, 'Catedral de Huancayo', 'Iglesia', 'Templo')
+    assert record.imagenes == (('https://img/1.jpg', 'fachada'),)
+    assert PlaceRecord.from_row({'id': 9}).nombre == ''
+
+
+def test_ubicacion():
+    index = PlaceIndex.from_rows(ROWS)
+    assert index.get(1).ubicacion == '-12.068, -75.21'
+    assert index.get(2).ubicacion is None  # Falta la latitud
+
+
+def test_from_rows_skips_unnamed_and_attaches_images():
+    index = PlaceIndex.from_rows(ROWS, {1: (('https://img/1.jpg', None),)})
+    assert [r.id for r in index] == [1, 2, 3, 5]
+    assert index.get(1).imagenes == (('https://img/1.jpg', None),)
+    assert index.get(5).imagenes == ()
+    assert index.get(4) is None
+
+
+def test_find_ignores_accents_and_case_first_wins():
+    index = PlaceIndex.from_rows(ROWS)
+    assert index.find('catedral de huancayo').id == 1
+    assert index.find('  Parque de la Identidad').id == 2  # El primero en el orden del catálogo
+    assert index.find('Plaza Constitución') is None
+    assert 'CATEDRAL DE HUANCAYO' in index and 'Plaza' not in index and 1 not in index
+
+
+def test_in_category():
+    index = PlaceIndex.from_rows(ROWS)
+    assert [r.id for r in index.in_category('PARQUE')] == [2, 3]
+    assert index.in_category('Playa') == ()
+
+
+def test_names_len_bool():
+    index = PlaceIndex.from_rows(ROWS)
+    assert index.names == ['Catedral de Huancayo', 'Parque de la Identidad', 'PARQUE DE LA IDENTIDAD', 'Museo Salesiano']
+    assert len(index) == 4 and index
+    assert not PlaceIndex() and len(PlaceIndex()) == 0
@@ -0,0 +1,88 @@
+"""Pruebas del buscador de nombres de lugares (Aho-Corasick por palabras)"""
+
+import pytest
+
+from src.place_matcher import AhoCorasick, PlaceMatcher, StreamMatcher
+
+NAMES = ['Plaza Vea', 'Plaza Constitución', 'Real Plaza', 'Parque de la Identidad', 'Torre Torre', 'Café & Bar']
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return PlaceMatcher(NAMES)
+
+
+def test_find_all_in_order_without_repeats(matcher):
+    text = 'Visita la plaza constitucion, luego el PARQUE DE LA IDENTIDAD y otra vez la Plaza Constitución.'
+    assert matcher.find_all(text) == ['Plaza Constitución', 'Parque de la Identidad']
+
+
+def test_whole_words_only(matcher):
+    assert matcher.find_all('Plaza Veana y Realplaza') == []
+    assert matcher.find_all('en la Plaza Vea.') == ['Plaza Vea']
+
+
+def test_overlapping_names(matcher):
+    # "Real Plaza Vea" contiene dos nombres que comparten la palabra "plaza"
+    assert matcher.find_all('Real Plaza Vea') == ['Real Plaza', 'Plaza Vea']
+    assert matcher.find_all('torre torre torre') == ['Torre Torre']
+
+
+def test_punctuation_inside_names(matcher):
+    assert matcher.find_all('el cafe bar del centro') == ['Café & Bar']
+
+
+def test_find_first(matcher):
+    assert matcher.find_first('¿Dónde queda Real Plaza o Plaza Vea?') == 'Real Plaza'
+    assert matcher.find_first('ningún lugar') is None
+    assert PlaceMatcher([]).find_first('Plaza Vea') is None
+
+
+def test_duplicates_and_empty_names():
+    matcher = PlaceMatcher(['Plaza Vea', 'plaza vea', '', None])
+    assert matcher.size == 1
+
+
+def test_automaton_matches_every_occurrence():
+    automaton = AhoCorasick([(('a', 'b'), 'ab'), (('b',), 'b'), (('b', 'c', 'd'), 'bcd')])
+    matches = list(automaton.iter_matches(['a', 'b', 'c', 'd', 'b']))
+    assert matches == [(0, 2, 'ab'), (1, 2, 'b'), (1, 4, 'bcd'), (4, 5, 'b')]
+
+
+STREAM_TEXTS = [
+    'Visita la plaza constitucion, luego el PARQUE DE LA IDENTIDAD y otra vez la Plaza Constitución.',
+    'Real Plaza Vea',
+    'Plaza Veana y Realplaza, pero sí la Plaza Vea',
+    'el Café & Bar y la Torre Torre',
+    'Torre',
+]
+
+
+def stream(matcher, chunks):
+    streamer = StreamMatcher(matcher)
+    found = []
+    for chunk in chunks:
+        found += streamer.feed(chunk)
+    return found + streamer.close()
+
+
+@pytest.mark.parametrize('text', STREAM_TEXTS)
+def test_stream_every_split_point_matches_find_all(matcher, text):
+    expected = matcher.find_all(text)
+    for i in range(len(text) + 1):
+        assert stream(matcher, [text[:i], text[i:]]) == expected, i
+    assert stream(matcher, list(text)) == expected
+
+
+def test_stream_reports_a_name_as_soon_as_it_ends(matcher):
+    streamer = StreamMatcher(matcher)
+    assert streamer.feed('Te recomiendo la Plaza Ve') == []
+    assert streamer.feed('a') == []  # "Vea" podría seguir ("Veana")
+    assert streamer.feed(' y luego la Plaza Vea') == ['Plaza Vea']  # El espacio cierra "Vea"; la segunda vez no se repite
+    assert streamer.close() == []
+
+
+def test_stream_name_at_the_end_needs_close(matcher):
+    streamer = StreamMatcher(matcher)
+    assert streamer.feed('Conoce Torre Torre') == []
+    assert streamer.close() == ['Torre Torre']
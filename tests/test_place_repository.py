@@ -0,0 +1,41 @@
+"""Pruebas de la consulta de lugares con su imagen principal"""
+
+from src.place_repository import fetch_places, format_ubicacion
+
+
+class RecordingCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, query, params=()):
+        self.executed.append((' '.join(query.split()), list(params)))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_one_query_with_primary_image():
+    cursor = RecordingCursor([('Plaza Constitución', 'Centro', 'plaza.jpg'), ('Parque', None, None)])
+    places = fetch_places(cursor, columns=('nombre', 'descripcion'), where='l.categoria LIKE %s', params=['%plaza%'])
+    assert len(cursor.executed) == 1
+    query, params = cursor.executed[0]
+    assert query.startswith('SELECT l.nombre, l.descripcion, img.url_imagen FROM locaciones l LEFT JOIN')
+    assert 'MIN(id) AS primera_id' in query
+    assert query.endswith('WHERE l.categoria LIKE %s ORDER BY l.nombre')
+    assert params == ['%plaza%']
+    assert places == [
+        {'nombre': 'Plaza Constitución', 'descripcion': 'Centro', 'imagen_url': 'plaza.jpg'},
+        {'nombre': 'Parque', 'descripcion': None, 'imagen_url': None},
+    ]
+
+
+def test_without_where_or_order():
+    cursor = RecordingCursor([])
+    assert fetch_places(cursor, columns=('nombre',), order_by=None) == []
+    assert 'WHERE' not in cursor.executed[0][0] and 'ORDER BY' not in cursor.executed[0][0]
+
+
+def test_format_ubicacion():
+    assert format_ubicacion(-12.06, -75.21) == '-12.06, -75.21'
+    assert format_ubicacion(None, -75.21) is None
@@ -0,0 +1,104 @@
+"""Pruebas de la recuperación de lugares para el contexto del prompt"""
+
+import pytest
+
+from src.place_index import PlaceIndex, PlaceRecord
+from src.place_retrieval import PlaceRetriever, estimate_tokens
+
+RECORDS = [
+    PlaceRecord(1, 'Parque de la Identidad', 'Parque', 'Parque temático con esculturas wancas',
+                -12.06, -75.21, (('https://img/1a.jpg', None), ('https://img/1b.jpg', None), ('https://img/1c.jpg', None))),
+    PlaceRecord(2, 'Catedral de Huancayo', 'Iglesia', 'Templo neoclásico frente a la Plaza Constitución', -12.068, -75.21),
+    PlaceRecord(3, 'Museo Salesiano', 'Museo', 'Colección de fauna y arqueología'),
+    PlaceRecord(4, 'Parque Túpac Amaru', 'Parque', 'Parque con anfiteatro'),
+    PlaceRecord(5, 'Torre Torre', 'Mirador', 'Formaciones de arcilla ' * 40),
+]
+
+
+@pytest.fixture(scope='module')
+def retriever():
+    return PlaceRetriever(PlaceIndex(RECORDS))
+
+
+def names(context):
+    return [record.nombre for record in context.index]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('abcd') == 1
+    assert estimate_tokens('abcde') == 2
+
+
+def test_named_place_ranks_first(retriever):
+    context = retriever.build_context('¿qué hay en el museo salesiano?')
+    assert names(context)[0] == 'Museo Salesiano'
+    # Con una coincidencia clara no se rellena con lugares sin relación
+    assert 'Catedral de Huancayo' not in names(context)
+
+
+def test_boost_name(retriever):
+    scores = retriever.scores('lugares para visitar', boost_name='catedral de huancayo')
+    assert int(scores.argmax()) == 1
+
+
+def test_category_filter_and_header(retriever):
+    context = retriever.build_context('parques', category='parque')
+    assert sorted(names(context)) == ['Parque Túpac Amaru', 'Parque de la Identidad']
+    assert context.total_places == 2
+    assert context.text.startswith('BASE DE DATOS HUANCAYO - 2 de 2 lugares más relevantes:')
+
+
+def test_no_results_for_category(retriever):
+    context = retriever.build_context('playas', category='playa')
+    assert len(context.index) == 0
+    assert 'No se encontraron lugares' in context.text and '(Búsqueda: playa)' in context.text
+
+
+def test_top_k_and_stable_order(retriever):
+    context = retriever.build_context('', top_k=3)
+    # Sin consulta todos puntúan igual: se respeta el orden del catálogo
+    assert names(context) == ['Parque de la Identidad', 'Catedral de Huancayo', 'Museo Salesiano']
+    assert names(retriever.build_context('', top_k=None)) == [r.nombre for r in RECORDS]
+
+
+def test_token_budget(retriever):
+    context = retriever.build_context('', top_k=None, max_tokens=60)
+    assert 0 < len(context.index) < len(RECORDS)
+    assert context.tokens < retriever.full_tokens
+    assert context.full_tokens == retriever.full_tokens
+    # Siempre se incluye al menos un lugar aunque supere el presupuesto
+    assert len(retriever.build_context('torre', max_tokens=1).index) == 1
+
+
+def test_rendered_line(retriever):
+    text = retriever.build_context('parque de la identidad', top_k=1).text
+    line = text.splitlines()[2]
+    assert line.startswith('LUGAR: Parque de la Identidad | CATEGORÍA: Parque | DESCRIPCIÓN: ')
+    assert 'UBICACIÓN: -12.06, -75.21' in line
+    assert 'IMÁGENES: https://img/1a.jpg ; https://img/1b.jpg' in line and '1c.jpg' not in line
+
+
+def test_long_description_is_shortened():
+    retriever = PlaceRetriever(PlaceIndex(RECORDS), description_chars=30)
+    line = retriever.build_context('torre', top_k=1).text.splitlines()[2]
+    description = line.split('DESCRIPCIÓN: ')[1].split(' | ')[0]
+    assert description.endswith('…') and len(description) <= 31
+
+
+def test_nearby_context(retriever):
+    anchor = RECORDS[1]
+    context = retriever.build_nearby_context(anchor, [(RECORDS[0], 890.0), (RECORDS[2], 1530.0)])
+    assert names(context) == ['Catedral de Huancayo', 'Parque de la Identidad', 'Museo Salesiano']
+    assert context.total_places == 3
+    assert context.text.startswith('BASE DE DATOS HUANCAYO - Catedral de Huancayo y 2 lugares cercanos')
+    lines = context.text.splitlines()
+    assert 'UBICACIÓN' not in lines[2]
+    assert 'DISTANCIA: 890 m de Catedral de Huancayo' in lines[3]
+    assert 'DISTANCIA: 1.5 km de Catedral de Huancayo' in lines[4]
+
+
+def test_empty_catalog():
+    retriever = PlaceRetriever(PlaceIndex())
+    assert retriever.scores('parques').shape == (0,)
+    assert len(retriever.build_context('parques').index) == 0
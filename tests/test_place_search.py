@@ -0,0 +1,94 @@
+"""Pruebas del índice de /api/places: mismos resultados que los LIKE '%x%' de MySQL"""
+
+import pytest
+
+from src.place_index import PlaceIndex, PlaceRecord
+from src import place_search
+from src.place_search import PlaceSearchIndex, category_candidates
+from src.text_normalization import normalize_text
+
+RECORDS = [
+    PlaceRecord(1, 'Centro Comercial Realplaza', 'Centro Comercial', 'Tiendas y cines'),
+    PlaceRecord(2, 'Parque de la Identidad', 'Parque', 'Parque temático wanka'),
+    PlaceRecord(3, 'Plaza Constitución', 'Plaza', 'Plaza principal de Huancayo'),
+    PlaceRecord(4, 'Plazuela Santa Isabel', None, 'Pequeña plaza del barrio'),
+    PlaceRecord(5, 'Mirador Cerrito de la Libertad', 'Mirador', 'Vista panorámica de la ciudad'),
+    PlaceRecord(6, 'Parque Túpac Amaru', None, None),
+]
+
+
+@pytest.fixture(scope='module')
+def search():
+    return PlaceSearchIndex(PlaceIndex(RECORDS))
+
+
+def names(result):
+    return sorted(record.nombre for record in result.records)
+
+
+def like_scan(query, category=None):
+    """Filtro anterior en MySQL: categoria LIKE '%c%' y (nombre LIKE '%q%' OR descripcion LIKE '%q%')"""
+    needle = normalize_text(query)
+    candidates = category_candidates(category)
+    found = []
+    for record in RECORDS:
+        if candidates and not any(c in normalize_text(record.categoria) for c in candidates):
+            continue
+        if needle and needle not in normalize_text(record.nombre) and needle not in normalize_text(record.descripcion):
+            continue
+        found.append(record.nombre)
+    return sorted(found)
+
+
+def test_match_inside_a_word(search):
+    assert 'Centro Comercial Realplaza' in names(search.search('plaza'))
+    assert names(search.search('lplaz')) == ['Centro Comercial Realplaza']
+
+
+def test_whole_text_must_appear_in_one_field(search):
+    assert names(search.search('constitución pl')) == []
+    assert names(search.search('plaza constitu')) == ['Plaza Constitución']
+    # Las palabras sueltas en otro orden no bastan, igual que LIKE
+    assert names(search.search('principal plaza')) == []
+
+
+def test_category_filter_uses_database_column(search):
+    # Sin categoría en la BD no pasan el filtro, aunque la inferida sea "Plazas"
+    assert names(search.search('', 'plazas')) == ['Plaza Constitución']
+    assert names(search.search('', 'parques')) == ['Parque de la Identidad']
+    # Sin filtro se listan con la categoría inferida por el nombre
+    result = search.search('plazuela')
+    assert result.categories == ['Plazas']
+
+
+def test_category_is_not_searched_as_text(search):
+    assert names(search.search('mirador')) == ['Mirador Cerrito de la Libertad']
+    assert names(search.search('comercial')) == ['Centro Comercial Realplaza']
+    assert names(search.search('naturaleza')) == []
+
+
+@pytest.mark.parametrize('query', ['p', 'pl', 'pla', 'plaz', 'plaza', 'a', 'de la', 'ú', 'tupac', 'x', '-',
+                                   'PARQUE', 'panoramica', 'ciudad', 'wanka', 'par te'])
+@pytest.mark.parametrize('category', [None, 'parques', 'plazas', 'centros-comerciales', 'todos'])
+def test_same_results_as_like_scan(search, query, category):
+    assert names(search.search(query, category)) == like_scan(query, category)
+
+
+@pytest.mark.parametrize('fraction', [1, 10 ** 6])
+@pytest.mark.parametrize('query', ['plaza constitu', 'de la', 'la ciudad', 'parque de', 'e l', 'a&b'])
+def test_multi_word_paths_agree(search, monkeypatch, query, fraction):
+    # Verificación lugar por lugar (fracción 1) o recorrido del texto unido (fracción enorme)
+    monkeypatch.setattr(place_search, 'SELECTIVE_FRACTION', fraction)
+    assert names(search.search(query)) == like_scan(query)
+
+
+def test_exact_words_rank_before_mid_word_matches(search):
+    result = search.search('plaza')
+    assert result.records[-1].nombre == 'Centro Comercial Realplaza'
+    assert result.total == 3
+
+
+def test_pagination(search):
+    page = search.search('', offset=2, limit=2)
+    assert [record.id for record in page.records] == [3, 4]
+    assert page.total == len(RECORDS)
@@ -0,0 +1,121 @@
+"""Pruebas de las cuotas de Gemini: cubetas de tokens por minuto y topes diarios"""
+
+import pytest
+
+from src import quota, state_backend
+from src.quota import QuotaExceededError, QuotaManager
+from src.state_backend import LocalBackend, _bucket_take, bucket_level
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.day = '2024-06-01'
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(quota, 'time', clock)
+    monkeypatch.setattr(state_backend, 'time', clock)
+    monkeypatch.setattr(QuotaManager, '_today', staticmethod(lambda: clock.day))
+    return clock
+
+
+@pytest.fixture
+def manager(clock):
+    return QuotaManager(LocalBackend(), daily_limit=10, per_minute=6, user_daily_limit=5, user_per_minute=2)
+
+
+def test_bucket_level():
+    assert bucket_level(None, 5, 1.0, 100.0) == 5
+    assert bucket_level('basura', 5, 1.0, 100.0) == 5
+    assert bucket_level('1.0:100.0', 5, 0.5, 104.0) == 3.0
+    assert bucket_level('1.0:100.0', 5, 0.5, 200.0) == 5  # Nunca supera la capacidad
+    assert bucket_level('1.0:100.0', 5, 0.5, 90.0) == 1.0  # Reloj hacia atrás: no recarga
+
+
+def test_bucket_take():
+    allowed, tokens, raw = _bucket_take('0.5:100.0', 5, 0.1, 1, 102.0)
+    assert not allowed and tokens == pytest.approx(0.7)
+    assert raw == '0.700000:102.000000'
+    allowed, tokens, _ = _bucket_take('0.5:100.0', 5, 0.1, 1, 105.0)
+    assert allowed and tokens == pytest.approx(0.0)
+    # Un costo negativo devuelve tokens sin superar la capacidad
+    assert _bucket_take('4.5:100.0', 5, 0.1, -1, 100.0)[:2] == (True, 5)
+
+
+def test_user_minute_bucket_refills(manager, clock):
+    manager.acquire('ana')
+    manager.acquire('ana')
+    with pytest.raises(QuotaExceededError) as error:
+        manager.acquire('ana')
+    assert error.value.reason == 'user_minute' and 'quota' in str(error.value)
+    assert manager.check('ana').reason == 'user_minute'
+
+    clock.now += 29  # 2 por minuto: un token cada 30 s
+    assert not manager.check('ana').allowed
+    clock.now += 1
+    assert manager.check('ana').allowed
+    manager.acquire('ana')
+    # Otro usuario tiene su propia cubeta
+    manager.acquire('luis')
+
+
+def test_denied_acquire_returns_what_it_took(manager, clock):
+    for user in ('a', 'b', 'c'):
+        manager.acquire(user)
+        manager.acquire(user)
+    # La cubeta global (6 por minuto) está vacía; la del usuario "d" no
+    with pytest.raises(QuotaExceededError) as error:
+        manager.acquire('d')
+    assert error.value.reason == 'global_minute'
+    assert manager.used_today('d') == 0
+    snapshot = manager.snapshot('d')
+    assert snapshot['user']['minute_tokens'] == 2
+    assert snapshot['granted'] == 6 and snapshot['denied'] == 1
+
+
+def test_daily_limits_reset_with_the_date(manager, clock):
+    for _ in range(5):
+        manager.acquire('ana')
+        clock.now += 60
+    with pytest.raises(QuotaExceededError) as error:
+        manager.acquire('ana')
+    assert error.value.reason == 'user_day'
+    assert manager.used_today('ana') == 5 and manager.used_today() == 5
+
+    clock.day = '2024-06-02'
+    assert manager.check('ana').allowed
+    manager.acquire('ana')
+    assert manager.used_today('ana') == 1
+
+
+def test_global_day_and_low_balance(manager, clock):
+    assert not manager.check('x').low
+    for i in range(10):
+        manager.acquire(f'usuario{i}')
+        clock.now += 10
+    decision = manager.check('nuevo')
+    assert not decision.allowed and decision.reason == 'global_day'
+    assert decision.low and decision.remaining_day == 0
+
+
+def test_check_does_not_consume(manager):
+    for _ in range(5):
+        assert manager.check('ana').allowed
+    assert manager.used_today('ana') == 0
+    assert manager.snapshot()['global']['minute_tokens'] == 6
+
+
+def test_record_degraded(manager):
+    manager.record_degraded('cache')
+    manager.record_degraded('cache')
+    manager.record_degraded('refused')
+    assert manager.snapshot()['degraded'] == {'cache': 2, 'refused': 1}
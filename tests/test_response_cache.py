@@ -0,0 +1,89 @@
+"""Pruebas de la caché LRU con TTL y límite de bytes"""
+
+import pytest
+
+from src import response_cache
+from src.response_cache import LRUTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache, 'time', clock)
+    return clock
+
+
+def test_lru_eviction_by_entries(clock):
+    cache = LRUTTLCache(max_entries=2, max_bytes=0, ttl=None)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # "a" pasa a ser la más reciente
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_eviction_by_bytes(clock):
+    cache = LRUTTLCache(max_entries=100, max_bytes=10, ttl=None)
+    cache.set('a', 'xxxx')   # 5 bytes
+    cache.set('b', 'yyyy')   # 10 en total
+    cache.set('c', 'z')      # 12: sale "a"
+    assert cache.get('a') is None and len(cache) == 2
+    assert cache.stats()['bytes'] == 7
+    # Una entrada que sola supera el límite se rechaza sin desalojar nada
+    assert cache.set('grande', 'x' * 20) is False
+    assert len(cache) == 2 and cache.stats()['rejected'] == 1
+
+
+def test_multibyte_text_counts_utf8_bytes(clock):
+    cache = LRUTTLCache(max_entries=10, max_bytes=0, ttl=None)
+    cache.set('k', 'ñandú')
+    assert cache.stats()['bytes'] == 1 + len('ñandú'.encode('utf-8'))
+
+
+def test_ttl_expiration(clock):
+    cache = LRUTTLCache(max_entries=10, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=600)
+    clock.now += 61
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_expired_entries_leave_before_live_ones(clock):
+    cache = LRUTTLCache(max_entries=2, ttl=10)
+    cache.set('viejo', 1)
+    clock.now += 11
+    cache.set('b', 2)
+    cache.set('c', 3)
+    assert cache.stats()['evictions'] == 0 and cache.stats()['expirations'] == 1
+    assert cache.get('b') == 2 and cache.get('c') == 3
+
+
+def test_purge_and_items(clock):
+    cache = LRUTTLCache(max_entries=10, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=100)
+    assert [key for key, _, _ in cache.items()] == ['b', 'a']
+    clock.now += 20
+    assert [key for key, _, _ in cache.items()] == ['b']
+    assert cache.purge_expired() == 1 and len(cache) == 1
+
+
+def test_overwrite_updates_bytes(clock):
+    cache = LRUTTLCache(max_entries=10, ttl=None)
+    cache.set('a', 'xxxx')
+    cache.set('a', 'x')
+    assert cache.stats()['bytes'] == 2 and len(cache) == 1
+    assert cache.delete('a') and not cache.delete('a')
+    assert cache.stats()['bytes'] == 0
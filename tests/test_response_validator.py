@@ -0,0 +1,66 @@
+"""Pruebas del validador de respuestas de Gemini contra el catálogo"""
+
+import pytest
+
+from src.place_index import PlaceIndex, PlaceRecord
+from src.response_validator import ResponseValidator
+
+CATALOG = ['Plaza Constitución', 'Parque de la Identidad', 'Laguna de Paca - Mirador', 'Catedral de Huancayo']
+
+
+@pytest.fixture(scope='module')
+def validator():
+    return ResponseValidator(CATALOG + ['', None])
+
+
+def context(*names):
+    return PlaceIndex(PlaceRecord(i, name) for i, name in enumerate(names))
+
+
+def test_clean_response(validator):
+    text = 'Te recomiendo la [[Plaza Constitución]] y el [[parque de la identidad]].'
+    result = validator.validate(text, context('Plaza Constitución', 'Parque de la Identidad'))
+    assert result.problems == []
+    assert result.text == 'Te recomiendo la Plaza Constitución y el parque de la identidad.'
+
+
+def test_text_without_markers_is_returned_as_is(validator):
+    text = 'Hola, ¿en qué te ayudo?'
+    result = validator.validate(text, context())
+    assert result.problems == [] and result.text is text
+
+
+def test_technical_and_generic_phrases(validator):
+    result = validator.validate('Tengo PROBLEMAS DE CONEXIÓN, pero te doy ideas generales.', context())
+    assert result.problems == ['problemas_tecnicos', 'generico_sin_datos']
+    assert validator.validate('No puedo acceder a la base de datos', context()).problems == ['problemas_tecnicos']
+
+
+def test_marker_outside_context_or_invented(validator):
+    text = 'Visita la [[Catedral de Huancayo]] y el [[Museo Inventado]]. [[]]'
+    result = validator.validate(text, context('Plaza Constitución'))
+    assert result.problems == ['lugar_fuera_de_contexto: Catedral de Huancayo', 'lugar_inventado: Museo Inventado']
+    assert result.text == 'Visita la Catedral de Huancayo y el Museo Inventado. '
+
+
+def test_marker_ignores_accents_and_case(validator):
+    result = validator.validate('La [[PLAZA CONSTITUCION]]', context('Plaza Constitución'))
+    assert result.problems == [] and result.text == 'La PLAZA CONSTITUCION'
+
+
+def test_common_places_only_if_in_context(validator):
+    text = 'Cerca está la Laguna de Paca y el pueblo de Concepción.'
+    result = validator.validate(text, context('Laguna de Paca - Mirador'))
+    assert result.problems == ['lugar_inventado: concepción']
+
+    result = validator.validate(text, context('Plaza Constitución'))
+    assert result.problems == ['lugar_inventado: laguna de paca', 'lugar_inventado: concepción']
+    # Un lugar del contexto que incluye el nombre (sin importar tildes) lo habilita
+    assert validator.validate('Visita Concepción', context('Convento de Concepcion')).problems == []
+
+
+def test_catalog_names_are_normalized(validator):
+    assert validator.names == frozenset({'plaza constitucion', 'parque de la identidad',
+                                         'laguna de paca - mirador', 'catedral de huancayo'})
+    empty = ResponseValidator()
+    assert empty.validate('El [[Parque Nuevo]]', context()).problems == ['lugar_inventado: Parque Nuevo']
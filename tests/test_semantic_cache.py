@@ -0,0 +1,101 @@
+"""Pruebas de la caché semántica de respuestas"""
+
+import pytest
+
+from src import semantic_cache
+from src.semantic_cache import SemanticCache, normalize_question, scoped_question
+
+RELAXED = 0.75  # Umbral relajado que usa la app cuando queda poca cuota
+PLACE = (None, 'Nevado Huaytapallana')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(semantic_cache, 'time', clock)
+    return clock
+
+
+def test_normalize_question():
+    assert normalize_question('¿Qué parques hay?') == normalize_question('que parque')
+    assert normalize_question('¿Qué?') == ''
+
+
+def test_scoped_question_drops_scope_words():
+    assert scoped_question('¿Cuál es el horario del Nevado Huaytapallana?', PLACE) == 'horario'
+    # Si solo queda el nombre del lugar se usa la pregunta completa
+    assert scoped_question('Nevado Huaytapallana', PLACE) == 'nevado huaytapallana'
+    assert scoped_question('horario', None) == 'horario'
+
+
+def test_equivalent_phrasing_hits(clock):
+    cache = SemanticCache(max_entries=10)
+    cache.set('¿Qué parques hay?', 'parques', ('Parque', None))
+    assert cache.get('que parques hay', ('Parque', None)) == 'parques'
+    assert cache.lookup('Muéstrame los parques', ('Parque', None)) == ('parques', 1.0)
+    assert cache.stats()['exact_hits'] == 2
+
+
+@pytest.mark.parametrize('place', ['Nevado Huaytapallana', 'Catedral de Huancayo'])
+def test_different_question_same_place_misses(clock, place):
+    scope = (None, place)
+    cache = SemanticCache(max_entries=10)
+    cache.set(f'¿Cuál es el horario del {place}?', 'horario', scope)
+    for question in (f'¿Cuál es el precio para visitar el {place}?', f'precio de la {place}',
+                     f'¿Cómo llego al {place}?'):
+        assert cache.get(question, scope, RELAXED) is None
+    assert cache.get(f'horarios del {place}', scope) == 'horario'
+
+
+def test_scopes_never_share(clock):
+    cache = SemanticCache(max_entries=10)
+    cache.set('¿Cuál es el horario?', 'nevado', PLACE)
+    assert cache.get('¿Cuál es el horario?', (None, 'Catedral de Huancayo'), 0.0) is None
+    assert cache.get('¿Cuál es el horario?', None, 0.0) is None
+    assert cache.get('¿Cuál es el horario?', PLACE) == 'nevado'
+
+
+def test_similar_question_above_threshold(clock):
+    cache = SemanticCache(max_entries=10, threshold=0.7)
+    cache.set('horario del Nevado Huaytapallana', 'horario', PLACE)
+    match = cache.lookup('¿qué horario tiene el Nevado Huaytapallana?', PLACE)
+    assert match is not None and match[0] == 'horario' and 0.7 <= match[1] < 1.0
+    assert cache.get('¿qué horario tiene el Nevado Huaytapallana?', PLACE, 0.9) is None
+
+
+def test_ttl_expiry(clock):
+    cache = SemanticCache(max_entries=10, ttl=60)
+    cache.set('¿Qué museos hay?', 'museos', 'Museo')
+    clock.now += 59
+    assert cache.get('museos', 'Museo') == 'museos'
+    clock.now += 2
+    assert cache.get('museos', 'Museo') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_ring_replaces_oldest(clock):
+    cache = SemanticCache(max_entries=2)
+    cache.set('parques', 1, 'a')
+    cache.set('museos', 2, 'a')
+    cache.set('parques', 10, 'a')  # Misma pregunta: reemplaza en su lugar
+    assert len(cache) == 2
+    cache.set('iglesias', 3, 'b')  # Sale la más antigua ("parques")
+    assert len(cache) == 2
+    assert cache.get('parques', 'a') is None
+    assert cache.get('museos', 'a') == 2
+    assert cache.get('iglesias', 'b') == 3
+
+
+def test_clear(clock):
+    cache = SemanticCache(max_entries=4)
+    cache.set('parques', 1, 'a')
+    cache.clear()
+    assert len(cache) == 0 and cache.get('parques', 'a') is None
@@ -0,0 +1,188 @@
+"""Pruebas de la coalescencia de llamadas en curso (hilos y asyncio)"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.quota import QuotaExceededError
+from src.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def _run_concurrently(*targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+
+def _release_when_joined(flights, release, calls=2):
+    """Soltar al líder cuando la segunda petición ya se unió a su llamada"""
+    def wait():
+        deadline = time.monotonic() + 5
+        while flights.stats()['calls'] < calls and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+    threading.Thread(target=wait).start()
+
+
+def test_do_shares_one_call():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'respuesta'
+
+    def leader():
+        results.append(flights.do('k', slow))
+
+    def follower():
+        started.wait(5)
+        _release_when_joined(flights, release)
+        results.append(flights.do('k', lambda: 'otra'))
+
+    _run_concurrently(leader, follower)
+    assert len(calls) == 1
+    assert sorted(results) == [('respuesta', False), ('respuesta', True)]
+    assert flights.stats()['coalesced'] == 1 and flights.stats()['in_flight'] == 0
+
+
+def test_do_waiter_retries_after_leader_quota_error():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def exhausted():
+        started.set()
+        release.wait(5)
+        raise QuotaExceededError('user')
+
+    def leader():
+        with pytest.raises(QuotaExceededError):
+            flights.do('k', exhausted, retry_on=(QuotaExceededError,))
+
+    def follower():
+        started.wait(5)
+        _release_when_joined(flights, release)
+        results.append(flights.do('k', lambda: 'con mi cuota', retry_on=(QuotaExceededError,)))
+
+    _run_concurrently(leader, follower)
+    assert results == [('con mi cuota', False)]
+    assert flights.stats()['retried'] == 1
+
+
+def test_do_other_errors_reach_every_waiter():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('gemini caído')
+
+    def call(fn):
+        try:
+            flights.do('k', fn, retry_on=(QuotaExceededError,))
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    def follower():
+        started.wait(5)
+        _release_when_joined(flights, release)
+        call(lambda: 'no se usa')
+
+    _run_concurrently(lambda: call(failing), follower)
+    assert errors == ['gemini caído', 'gemini caído']
+
+
+def test_stream_waiter_retries_after_leader_quota_error():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def exhausted():
+        release.wait(5)
+        raise QuotaExceededError('user')
+        yield  # pragma: no cover
+
+    leader = flights.stream('k', exhausted, retry_on=(QuotaExceededError,))
+    follower = flights.stream('k', lambda: iter(['a', 'b']), retry_on=(QuotaExceededError,))
+    release.set()
+    with pytest.raises(QuotaExceededError):
+        list(leader)
+    assert list(follower) == ['a', 'b']
+
+
+def test_stream_error_after_chunks_is_not_retried():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def partial():
+        yield 'a'
+        release.wait(5)
+        raise QuotaExceededError('user')
+
+    leader = flights.stream('k', partial, retry_on=(QuotaExceededError,))
+    follower = flights.stream('k', lambda: iter(['otra']), retry_on=(QuotaExceededError,))
+    release.set()
+    for consumer in (leader, follower):
+        received = []
+        with pytest.raises(QuotaExceededError):
+            for chunk in consumer:
+                received.append(chunk)
+        assert received == ['a']
+
+
+def test_async_do_waiter_retries_after_leader_quota_error():
+    async def main():
+        flights = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def exhausted():
+            await release.wait()
+            raise QuotaExceededError('user')
+
+        async def mine():
+            return 'con mi cuota'
+
+        leader = asyncio.ensure_future(flights.do('k', exhausted, retry_on=(QuotaExceededError,)))
+        follower = asyncio.ensure_future(flights.do('k', mine, retry_on=(QuotaExceededError,)))
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(QuotaExceededError):
+            await leader
+        assert await follower == ('con mi cuota', False)
+        assert flights.stats()['retried'] == 1
+
+    asyncio.run(main())
+
+
+def test_async_stream_waiter_retries_after_leader_quota_error():
+    async def main():
+        flights = AsyncSingleFlight()
+
+        async def exhausted():
+            await asyncio.sleep(0.01)
+            raise QuotaExceededError('user')
+            yield  # pragma: no cover
+
+        async def chunks():
+            for chunk in ('a', 'b'):
+                yield chunk
+
+        async def collect(stream):
+            return [chunk async for chunk in stream]
+
+        leader = flights.stream('k', exhausted, retry_on=(QuotaExceededError,))
+        follower = flights.stream('k', chunks, retry_on=(QuotaExceededError,))
+        with pytest.raises(QuotaExceededError):
+            await collect(leader)
+        assert await collect(follower) == ['a', 'b']
+
+    asyncio.run(main())
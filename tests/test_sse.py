@@ -0,0 +1,113 @@
+"""Pruebas de la escritura de eventos SSE: agrupación y cortes que no parten HTML"""
+
+import json
+import random
+import re
+
+import pytest
+
+from src import sse
+from src.markdown_render import render_markdown
+from src.sse import SSEWriter, _split_point, encode_event, text_event
+
+_TAG = re.compile(r'<[^<>]*>')
+_ENTITY = re.compile(r'&(?:[a-z]+|#[0-9]+);')
+
+
+def whole(piece):
+    """True si el fragmento no tiene etiquetas ni entidades a medias"""
+    rest = _ENTITY.sub('', _TAG.sub('', piece))
+    return not any(char in rest for char in '<>&')
+
+
+def chunks(output):
+    events = [json.loads(frame[len('data: '):]) for frame in output.split('\n\n') if frame]
+    return [event['chunk'] for event in events if 'chunk' in event]
+
+
+HTML = render_markdown(
+    '## Lugares\n* **Plaza Constitución** & alrededores ![Plaza](https://img/plaza.jpg?a=1&b=2)\n'
+    '* Parque de la Identidad <wanka> "esculturas"\n' * 6
+)
+
+
+def test_events():
+    assert encode_event({'lugar': 'Plaza Constitución'}) == 'data: {"lugar": "Plaza Constitución"}\n\n'
+    assert json.loads(text_event('a "b"\n')[len('data: '):]) == {'chunk': 'a "b"\n', 'done': False}
+
+
+# Posiciones de HTML donde puede empezar un texto (nunca dentro de una etiqueta o entidad)
+STARTS = [i for i in range(len(HTML)) if whole(HTML[:i])]
+
+
+@pytest.mark.parametrize('limit', range(1, 120))
+def test_split_point_never_cuts_a_tag_or_entity(limit):
+    for start in STARTS[::5]:
+        text = HTML[start:]
+        cut = _split_point(text, limit)
+        assert 0 < cut <= max(limit, len(text))
+        assert whole(text[:cut]), (start, limit, text[:cut])
+        assert cut <= limit or text.startswith('<') or text.startswith('&')
+
+
+def test_split_point_cases():
+    assert _split_point('abc<strong>def', 6) == 3
+    assert _split_point('abc<b>def', 6) == 6
+    assert _split_point('a&amp;b', 3) == 1
+    assert _split_point('a&amp;b', 6) == 6
+    # Una etiqueta inicial más larga que el límite se envía entera
+    assert _split_point('<img src="x" alt="y">z', 5) == 21
+    assert _split_point('&amp;z', 2) == 5
+
+
+@pytest.mark.parametrize('max_chars', [64, 100, 333])
+def test_writer_splits_long_text_on_safe_points(max_chars):
+    writer = SSEWriter(max_chars=max_chars)
+    writer.text(HTML)
+    pieces = chunks(writer.flush())
+    assert ''.join(pieces) == HTML
+    assert len(pieces) > 1 and all(pieces)
+    for piece in pieces:
+        assert whole(piece), piece
+        assert len(piece) <= max_chars or piece.startswith('<img')
+
+
+def test_writer_random_html():
+    rng = random.Random(21)
+    words = ['**Plaza**', '![a](https://img/x.jpg?a=1&b=2)', '&', '<b>', '* ', '\n', '## ', 'Huancayo ', 'ñandú ']
+    for _ in range(100):
+        html = render_markdown(''.join(rng.choice(words) for _ in range(rng.randint(1, 60))))
+        writer = SSEWriter(max_chars=64)
+        writer.text(html)
+        pieces = chunks(writer.flush())
+        assert ''.join(pieces) == html
+        assert all(whole(piece) for piece in pieces)
+
+
+def test_writer_coalesces_text_and_keeps_event_order():
+    writer = SSEWriter()
+    writer.text('Hola ')
+    writer.text('')
+    writer.text('mundo')
+    writer.event({'place': 'Plaza Vea'})
+    writer.text('fin')
+    out = writer.flush()
+    assert out == text_event('Hola mundo') + encode_event({'place': 'Plaza Vea'}) + text_event('fin')
+    assert writer.flush() == ''
+
+
+def test_writer_ready_by_size_or_delay(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(sse.time, 'monotonic', lambda: now[0])
+    writer = SSEWriter(max_chars=64, max_delay=0.05)
+    assert not writer.ready() and writer.drain() == ''
+    writer.text('a' * 10)
+    assert writer.drain() == ''
+    now[0] += 0.06
+    assert writer.drain() == text_event('a' * 10)
+    writer.text('b' * 64)
+    assert writer.ready()
+
+    immediate = SSEWriter(max_delay=0)
+    immediate.event({'done': True})
+    assert immediate.drain() == encode_event({'done': True})
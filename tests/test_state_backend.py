@@ -0,0 +1,185 @@
+"""Pruebas de RedisBackend contra el servidor RESP en proceso y del respaldo local"""
+
+import threading
+
+import pytest
+
+from fake_redis import FakeRedis
+from src.state_backend import (FailoverBackend, LocalBackend, RedisBackend, SQLiteBackend, StateBackend,
+                               StateBackendError)
+
+
+@pytest.fixture
+def server():
+    with FakeRedis() as fake:
+        yield fake
+
+
+@pytest.fixture
+def backend(server):
+    return RedisBackend(server.url, timeout=1.0)
+
+
+def test_get_set_delete(backend):
+    assert backend.get('a') is None
+    backend.set('a', 'uno')
+    assert backend.get('a') == 'uno'
+    backend.set_json('j', {'lugar': 'Plaza Constitución'})
+    assert backend.get_json('j') == {'lugar': 'Plaza Constitución'}
+    backend.delete('a')
+    assert backend.get('a') is None
+
+
+def test_set_with_ttl(backend, server):
+    backend.set('t', 'x', ttl=60)
+    assert 0 < server.execute(['PTTL', 't']) <= 60000
+
+
+def test_incr_sets_ttl_only_on_creation(backend, server):
+    assert backend.incr('c', ttl=60) == 1
+    assert backend.incr('c', 2, ttl=60) == 3
+    assert backend.incr('c', -1, ttl=60) == 2
+    assert 0 < server.execute(['PTTL', 'c']) <= 60000
+    assert backend.incr('sin_ttl') == 1
+    assert server.execute(['PTTL', 'sin_ttl']) == -1
+
+
+def test_incr_key_expires_even_if_connection_drops_before_incrby(backend, server):
+    # La clave se crea con su TTL antes del incremento: un corte entre ambos no la deja inmortal
+    # SET NX se reintenta una vez; con dos cortes el INCRBY nunca llega a enviarse
+    server.drop_next_reply(2)
+    with pytest.raises(StateBackendError):
+        backend.incr('diario', ttl=60)
+    assert 'INCRBY' not in server.commands
+    assert 0 < server.execute(['PTTL', 'diario']) <= 60000
+    assert backend.incr('diario', ttl=60) == 1
+
+
+def test_take_tokens(backend):
+    results = [backend.take_tokens('bucket', capacity=2, rate=0.001)[0] for _ in range(3)]
+    assert results == [True, True, False]
+    allowed, tokens = backend.take_tokens('bucket', capacity=2, rate=0.001, cost=-1)
+    assert allowed and tokens == pytest.approx(1, abs=0.01)
+    assert backend.take_tokens('bucket', capacity=2, rate=0.001)[0]
+
+
+def test_clear_by_prefix(backend):
+    backend.set('resp:1', 'a')
+    backend.set('resp:2', 'b')
+    backend.set('quota:1', 'c')
+    backend.clear('resp:')
+    assert backend.get('resp:1') is None and backend.get('resp:2') is None
+    assert backend.get('quota:1') == 'c'
+
+
+def test_reconnects_after_server_closes_idle_connection(backend, server):
+    backend.set('k', 'v')
+    server.close_clients()
+    assert backend.get('k') == 'v'
+    server.close_clients()
+    # Un comando no idempotente también funciona: la conexión cerrada se detecta antes de enviarlo
+    assert backend.incr('n') == 1
+
+
+def test_idempotent_command_retried_after_lost_reply(backend, server):
+    backend.set('k', 'v')
+    server.drop_next_reply()
+    assert backend.get('k') == 'v'
+
+
+def test_incr_not_retried_after_lost_reply(backend, server):
+    backend.incr('n')
+    server.drop_next_reply()
+    with pytest.raises(StateBackendError):
+        backend.incr('n')
+    # Aplicado una sola vez, aunque el cliente no vio la respuesta
+    assert backend.get('n') == '2'
+
+
+def test_take_tokens_not_retried_after_lost_reply(backend, server):
+    server.drop_next_reply()
+    with pytest.raises(StateBackendError):
+        backend.take_tokens('bucket', capacity=5, rate=0.001)
+    assert server.commands.count('EVAL') == 1
+
+
+def test_update_json(backend, server):
+    assert backend.update_json('u', lambda value: (value or []) + ['a'], ttl=60) == ['a']
+    assert backend.update_json('u', lambda value: value + ['b'], ttl=60) == ['a', 'b']
+    assert backend.get_json('u') == ['a', 'b']
+    assert 0 < server.execute(['PTTL', 'u']) <= 60000
+
+
+def test_update_retries_when_another_writer_wins(backend, server):
+    calls = []
+
+    def append(value):
+        calls.append(value)
+        if len(calls) == 1:
+            # Otro worker escribe la clave entre la lectura y la escritura
+            server.execute(['SET', 'u', '["otro"]'])
+        return (value or []) + ['mio']
+
+    backend.update_json('u', append)
+    assert calls == [None, ['otro']]
+    assert backend.get_json('u') == ['otro', 'mio']
+
+
+@pytest.fixture(params=['local', 'sqlite', 'redis'])
+def any_backend(request, tmp_path):
+    if request.param == 'local':
+        yield LocalBackend
+    elif request.param == 'sqlite':
+        path = str(tmp_path / 'state.db')
+        yield lambda: SQLiteBackend(path)
+    else:
+        with FakeRedis() as fake:
+            yield lambda: RedisBackend(fake.url, timeout=2.0)
+
+
+def test_concurrent_updates_are_not_lost(any_backend):
+    # Cada hilo con su propia instancia (como workers distintos), salvo en memoria local
+    shared = any_backend()
+    backends = [shared if isinstance(shared, LocalBackend) else any_backend() for _ in range(4)]
+
+    def worker(backend, n):
+        for i in range(25):
+            backend.update_json('lista', lambda value: (value or []) + [f'{n}-{i}'])
+
+    threads = [threading.Thread(target=worker, args=(backend, n)) for n, backend in enumerate(backends)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert len(shared.get_json('lista')) == 100
+
+
+def test_failover_uses_local_backend_while_primary_is_down():
+    primary = RedisBackend('redis://127.0.0.1:1/0', timeout=0.2)
+    backend = FailoverBackend(primary, LocalBackend(), retry_after=60)
+    assert backend.shared
+    backend.set('k', 'v')
+    assert backend.get('k') == 'v'
+    assert backend.incr('n', ttl=60) == 1
+    assert backend.take_tokens('b', capacity=1, rate=0.001) == (True, 0.0)
+    assert backend.failures == 1
+    assert 'memoria local' in backend.describe()
+
+
+def test_failover_returns_to_primary(server):
+    backend = FailoverBackend(RedisBackend(server.url, timeout=1.0), LocalBackend(), retry_after=0)
+    backend.set('k', 'v')
+    assert server.execute(['GET', 'k']) == 'v'
+    assert backend.failures == 0
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+
+    class Partial(StateBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()